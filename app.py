@@ -1,13 +1,19 @@
 import streamlit as st
-import tempfile
-import os
 
-from src.graph.workflow import build_graph
+from src.graph.state import initial_state
+from src.graph.workflow import MAX_REFLECTIONS, build_graph
 
 
 st.set_page_config(page_title="Document Extraction Pipeline", layout="wide")
 st.title("Document Extraction Pipeline")
 
+
+@st.cache_resource
+def get_graph():
+    """One compiled graph shared by every session and rerun."""
+    return build_graph()
+
+
 # --- Mode Selection ---
 mode = st.radio("Select mode:", ["Resume Only", "JD Only", "Both"], horizontal=True)
 
@@ -29,6 +35,8 @@ if mode in ("JD Only", "Both"):
             "Upload Job Description (PDF/DOCX)", type=["pdf", "docx"], key="jd"
         )
 
+SOURCE_LABELS = {"resume": "Resume", "jd": "JD"}
+
 # --- Extract Button ---
 if st.button("Extract", type="primary"):
     # Validate inputs
@@ -39,70 +47,72 @@ if st.button("Extract", type="primary"):
         st.error("Please upload a job description file.")
         st.stop()
 
-    # Save uploaded files to temp paths
-    resume_path = None
-    jd_path = None
-
-    if resume_file:
-        suffix = os.path.splitext(resume_file.name)[1]
-        with tempfile.NamedTemporaryFile(delete=False, suffix=suffix) as tmp:
-            tmp.write(resume_file.read())
-            resume_path = tmp.name
-
-    if jd_file:
-        suffix = os.path.splitext(jd_file.name)[1]
-        with tempfile.NamedTemporaryFile(delete=False, suffix=suffix) as tmp:
-            tmp.write(jd_file.read())
-            jd_path = tmp.name
-
     mode_map = {"Resume Only": "resume_only", "JD Only": "jd_only", "Both": "both"}
+    sources = {"resume_only": ["resume"], "jd_only": ["jd"], "both": ["resume", "jd"]}[mode_map[mode]]
 
-    graph = build_graph()
-
-    with st.spinner("Processing..."):
-        result = graph.invoke({
-            "mode": mode_map[mode],
-            "reflection_loop": 0,
-            "resume_file_path": resume_path,
-            "jd_file_path": jd_path,
-            "resume_markdown": None,
-            "jd_markdown": None,
-            "resume_data": None,
-            "jd_data": None,
-            "judge_results": [],
-        })
-
-    # --- Display Results ---
-    st.divider()
+    # Uploads go to the OCR stage straight from memory
+    state = initial_state(
+        mode_map[mode],
+        resume_upload=(resume_file.name, resume_file.getvalue()) if resume_file else None,
+        jd_upload=(jd_file.name, jd_file.getvalue()) if jd_file else None,
+    )
 
-    if result.get("resume_data"):
-        st.subheader("Resume Extraction")
-        st.json(result["resume_data"].model_dump())
-
-    if result.get("jd_data"):
-        st.subheader("JD Extraction")
-        st.json(result["jd_data"].model_dump())
+    st.divider()
 
-    # --- Judge Results ---
-    judge_results = result.get("judge_results", [])
-    retried = result.get("reflection_loop", 0) > 0
+    # One placeholder per source and stage, filled in as each node finishes
+    columns = dict(zip(sources, st.columns(len(sources))))
+    slots = {}
+    for source, column in columns.items():
+        with column:
+            st.subheader(f"{SOURCE_LABELS[source]} Extraction")
+            slots[source] = {"markdown": st.empty(), "data": st.empty()}
 
     st.subheader("Judge Results")
+    judge_slot = st.container()
+
+    judge_results = []
+    reflection_loop = 0
+
+    with st.status("Processing...", expanded=True) as status:
+        for update in get_graph().stream(state, stream_mode="updates"):
+            for node, values in update.items():
+                values = values or {}
+                source = node.rsplit("_", 1)[-1] if node.endswith(("_resume", "_jd")) else None
+
+                if node.startswith("ocr_"):
+                    st.write(f"OCR finished for {SOURCE_LABELS[source]}: {len(values[f'{source}_pages'])} page(s)")
+                elif node.startswith("compact_"):
+                    stats = values["compaction_stats"][0]
+                    with slots[source]["markdown"].container():
+                        with st.expander("OCR markdown", expanded=False):
+                            st.markdown(values[f"{source}_markdown"])
+                    st.write(f"Compacted {SOURCE_LABELS[source]} markdown: {stats['tokens_saved']} tokens saved ({stats['saved_pct']}%)")
+                elif node.startswith("parse_"):
+                    slots[source]["data"].json(values[f"{source}_data"].model_dump())
+                    if match := values.get(f"{source}_duplicate_of"):
+                        st.write(f"{SOURCE_LABELS[source]} is a near-duplicate ({match['similarity']:.0%}) of "
+                                 f"{match['document']}: earlier extraction {'reused' if match['action'] == 'reuse' else 'patched'}")
+                    else:
+                        st.write(f"Parsed {SOURCE_LABELS[source]}")
+                elif node == "llm_as_judge":
+                    reflection_loop = values["reflection_loop"]
+                    judge_results += values["judge_results"]
+                    for jr in values["judge_results"]:
+                        st.write(f"Judge ({jr['judge']}): {SOURCE_LABELS[jr['source']]} {jr['grade']}")
+                        if jr["grade"].upper() == "FAIL" and values[f"{jr['source']}_reflection_loop"] <= MAX_REFLECTIONS:
+                            st.write(f"Re-parsing {SOURCE_LABELS[jr['source']]} with the judge feedback...")
+        status.update(label="Done", state="complete", expanded=False)
 
-    if retried:
-        st.info("Judge detected issues on the first pass. The pipeline re-processed and re-evaluated.")
-
-    # Show only the final judge verdict per source (last occurrence wins)
-    final_verdicts = {}
-    for jr in judge_results:
-        final_verdicts[jr["source"]] = jr
-
-    for source, jr in final_verdicts.items():
-        icon = "✅" if jr["grade"].upper() == "PASS" else "❌"
-        st.write(f"{icon} **{source.upper()}**: {jr['grade']} — {jr['summary']}")
-
-    # Cleanup temp files
-    if resume_path and os.path.exists(resume_path):
-        os.unlink(resume_path)
-    if jd_path and os.path.exists(jd_path):
-        os.unlink(jd_path)
+    # --- Judge Results ---
+    with judge_slot:
+        if reflection_loop > 1:
+            st.info("Judge detected issues on the first pass. The pipeline re-parsed with the judge feedback and re-evaluated.")
+
+        # Show only the final judge verdict per source (last occurrence wins)
+        final_verdicts = {}
+        for jr in judge_results:
+            final_verdicts[jr["source"]] = jr
+
+        for source, jr in final_verdicts.items():
+            icon = "✅" if jr["grade"].upper() == "PASS" else "❌"
+            st.write(f"{icon} **{source.upper()}**: {jr['grade']} — {jr['summary']}")
@@ -0,0 +1,277 @@
+"""
+Batch resume / job description extraction.
+
+Usage:
+    python batch.py --kind resume --input data/ --output output/resumes/ --workers 8
+    python batch.py --kind jd --input "data/Job Description/Data Science/" --output output/jd/
+    python batch.py --kind resume --input data/ --output output/resumes/ --workers 200 --async
+    python batch.py --kind resume --input data/ --output output/resumes/ --only-failed
+    python batch.py --kind resume --input data/ --output output/resumes/ --since 2026-10-01
+"""
+
+import argparse
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from pathlib import Path
+
+from src.chains.llm_cache import llm_cache_stats
+from src.dedup import dedup_stats
+from src.graph.state import initial_state
+from src.graph.workflow import build_graph
+from src.manifest import Manifest, file_sha256, pipeline_version
+from src.metrics import DocumentProfiler, RunProfile
+from src.ocr import ocr_stats
+from src.ratelimit import rate_limit_stats
+from src.sinks import SINK_NAMES, Sinks, document_record, open_sinks
+
+SUPPORTED_EXTENSIONS = {".pdf", ".docx"}
+
+# kind -> (graph mode, initial_state kwarg, result key)
+KINDS = {
+    "resume": ("resume_only", "resume_file_path", "resume_data"),
+    "jd": ("jd_only", "jd_file_path", "jd_data"),
+}
+
+
+def _outcome(record: dict) -> dict:
+    retried = bool(record["output"]) and record["output"]["reflection_loop"] > 1
+    return {"verdict": record["status"], "retried": retried, "error": record["error"]}
+
+
+def _profiled(config: dict | None, profiler: DocumentProfiler | None) -> dict | None:
+    if profiler is None:
+        return config
+    return {**(config or {}), "callbacks": [profiler]}
+
+
+def _finish(record: dict, sinks: Sinks, profile: RunProfile | None, profiler: DocumentProfiler | None,
+            on_written=None) -> dict:
+    if profile is not None:
+        record["metrics"] = profile.add(record["file"], record["status"], profiler, record["duration_s"])
+    outcome = _outcome(record)
+    try:
+        sinks.write(record, None if on_written is None else lambda: on_written(outcome))
+    except Exception as e:
+        outcome = {**outcome, "verdict": "ERROR", "error": f"writing results failed: {e}"}
+        if on_written is not None:
+            on_written(outcome)
+    return outcome
+
+
+def process_file(graph, kind: str, file: Path, sinks: Sinks, config: dict | None = None,
+                 profile: RunProfile | None = None, on_written=None) -> dict:
+    """Run one document through the graph and hand its record to the sinks.
+
+    Never raises on a pipeline or sink failure: it is recorded as an ERROR so
+    one bad file cannot take down the rest of the batch. `on_written(outcome)`
+    runs once the record is on disk in every sink (immediately for an ERROR
+    while writing).
+    """
+    mode, path_arg, _ = KINDS[kind]
+    profiler = DocumentProfiler() if profile is not None else None
+    started_at = time.time()
+    try:
+        result = graph.invoke(initial_state(mode, **{path_arg: str(file)}), config=_profiled(config, profiler))
+        record = document_record(kind, file, started_at, result=result)
+    except Exception as e:
+        record = document_record(kind, file, started_at, error=e)
+    return _finish(record, sinks, profile, profiler, on_written)
+
+
+async def aprocess_file(graph, kind: str, file: Path, sinks: Sinks, limit: asyncio.Semaphore,
+                        config: dict | None = None, profile: RunProfile | None = None, on_written=None) -> dict:
+    """Async process_file(); `limit` bounds the number of documents in flight."""
+    mode, path_arg, _ = KINDS[kind]
+    profiler = DocumentProfiler() if profile is not None else None
+    async with limit:
+        started_at = time.time()
+        try:
+            result = await graph.ainvoke(initial_state(mode, **{path_arg: str(file)}), config=_profiled(config, profiler))
+            record = document_record(kind, file, started_at, result=result)
+        except Exception as e:
+            record = document_record(kind, file, started_at, error=e)
+    return _finish(record, sinks, profile, profiler, on_written)
+
+
+def _report(i: int, total: int, file: Path, outcome: dict):
+    line = f"[{i:>3}/{total}] {file.name:<50}"
+    if outcome["verdict"] == "ERROR":
+        print(f"{line}  ERROR: {outcome['error']}", flush=True)
+    else:
+        print(f"{line}  {outcome['verdict']}" + (" (retried)" if outcome["retried"] else ""), flush=True)
+
+
+def _run_threads(graph, kind: str, files: list[Path], sinks: Sinks, workers: int, config: dict,
+                 on_done, profile: RunProfile | None) -> list[dict]:
+    def work(file: Path) -> dict:
+        return process_file(graph, kind, file, sinks, config, profile, lambda outcome: on_done(file, outcome))
+
+    outcomes = []
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        # map() yields in input order, so progress lines stay ordered even
+        # though documents finish out of order
+        results = pool.map(work, files)
+        for i, (file, outcome) in enumerate(zip(files, results), 1):
+            _report(i, len(files), file, outcome)
+            outcomes.append(outcome)
+    return outcomes
+
+
+async def _run_async(graph, kind: str, files: list[Path], sinks: Sinks, workers: int, config: dict,
+                     on_done, profile: RunProfile | None) -> list[dict]:
+    limit = asyncio.Semaphore(workers)
+
+    async def work(file: Path) -> dict:
+        return await aprocess_file(graph, kind, file, sinks, limit, config, profile,
+                                   lambda outcome: on_done(file, outcome))
+
+    tasks = [asyncio.create_task(work(f)) for f in files]
+    outcomes = []
+    for i, (file, task) in enumerate(zip(files, tasks), 1):
+        outcome = await task
+        _report(i, len(files), file, outcome)
+        outcomes.append(outcome)
+    return outcomes
+
+
+def _print_profile(run_profile: RunProfile, report_path: Path, prometheus: str | None):
+    report = run_profile.write(report_path)
+    print("Stage timings (s):")
+    for stage, stats in report["stages"].items():
+        print(f"  {stage:<16} p50 {stats['p50']:>7.2f}  p95 {stats['p95']:>7.2f}  p99 {stats['p99']:>7.2f}  (n={stats['count']})")
+    tokens_in = sum(c["input"] for c in report["tokens"].values())
+    tokens_out = sum(c["output"] for c in report["tokens"].values())
+    print(f"Tokens: {tokens_in} in / {tokens_out} out  |  Retries: {report['retries']}  |  "
+          f"Reflections: {report['reflections']}  |  OCR: {report['ocr_pages']} pages, {report['bytes_uploaded']} bytes sent")
+    print(f"Estimated cost: ${report['cost_usd']['total']:.4f}  (p50/doc ${report['cost_usd']['p50']:.4f})")
+    print(f"Profile report: {report_path.resolve()}")
+    if prometheus:
+        run_profile.write_prometheus(Path(prometheus))
+        print(f"Prometheus textfile: {Path(prometheus).resolve()}")
+
+
+def select_files(files: list[Path], manifest: Manifest, version: str, only_failed: bool = False,
+                 since: datetime | None = None, force: bool = False) -> tuple[list[Path], dict[str, str]]:
+    """Pick the files this run must process; return them with every file's content hash.
+
+    By default a file is skipped when its hash and the pipeline version match
+    the manifest and its last status was PASS/FAIL. `only_failed` narrows the
+    run to files last recorded as FAIL/ERROR; `since` to files modified at or
+    after that time; `force` reprocesses everything that passes those filters.
+    """
+    hashes = {f.name: file_sha256(f) for f in files}
+    selected = []
+    for f in files:
+        if since is not None and datetime.fromtimestamp(f.stat().st_mtime) < since:
+            continue
+        entry = manifest.get(f.name)
+        if only_failed and not (entry and entry["status"] in ("FAIL", "ERROR")):
+            continue
+        if not force and not only_failed and manifest.is_done(f.name, hashes[f.name], version):
+            continue
+        selected.append(f)
+    return selected, hashes
+
+
+def run(kind: str, input_folder: str, output_folder: str, workers: int = 4, use_async: bool = False,
+        llm_cache: bool = True, only_failed: bool = False, since: datetime | None = None, force: bool = False,
+        sink_names: tuple[str, ...] = ("json",), profile: bool = False, prometheus: str | None = None):
+    input_path = Path(input_folder)
+    output_path = Path(output_folder)
+    output_path.mkdir(parents=True, exist_ok=True)
+
+    found = sorted(f for f in input_path.iterdir() if f.suffix.lower() in SUPPORTED_EXTENSIONS)
+
+    if not found:
+        print(f"No PDF/DOCX files found in: {input_path.resolve()}")
+        return
+
+    manifest = Manifest(output_path)
+    version = pipeline_version()
+    files, hashes = select_files(found, manifest, version, only_failed, since, force)
+
+    print(f"Input  : {input_path.resolve()}")
+    print(f"Output : {output_path.resolve()}")
+    print(f"Files  : {len(files)} to process, {len(found) - len(files)} skipped (pipeline {version})")
+    print(f"Workers: {workers}" + (" (async)" if use_async else ""))
+    print(f"Sinks  : {', '.join(sink_names)}")
+    print("-" * 60)
+
+    if not files:
+        print("Nothing to do: every file is unchanged since its last run.")
+        return
+
+    # Runs once the document's record is on disk in every sink, so rows lost in a crash are redone
+    def on_done(file: Path, outcome: dict):
+        manifest.record(file.name, hashes[file.name], version, outcome["verdict"], outcome["error"])
+
+    graph = build_graph()
+    config = {"configurable": {"llm_cache_bypass": not llm_cache}}
+    run_id = time.strftime("%Y%m%dT%H%M%S")
+    sinks = open_sinks(sink_names, kind, output_path, run_id)
+    run_profile = RunProfile() if profile or prometheus else None
+    try:
+        if use_async:
+            outcomes = asyncio.run(_run_async(graph, kind, files, sinks, workers, config, on_done, run_profile))
+        else:
+            outcomes = _run_threads(graph, kind, files, sinks, workers, config, on_done, run_profile)
+    finally:
+        sinks.close()
+
+    counts = {"PASS": 0, "FAIL": 0, "ERROR": 0}
+    for outcome in outcomes:
+        counts[outcome["verdict"]] += 1
+
+    print("-" * 60)
+    print(f"Total: {len(files)}  |  PASS: {counts['PASS']}  |  FAIL: {counts['FAIL']}  |  ERROR: {counts['ERROR']}"
+          f"  |  SKIPPED: {len(found) - len(files)}")
+    ocr = ocr_stats()
+    print(f"OCR: {ocr['local']} local  |  {ocr['hits']} cache hits  |  {ocr['misses']} Mistral calls")
+    llm = llm_cache_stats()
+    print(f"LLM cache: {llm['hits']} hits  |  {llm['misses']} misses")
+    dedup = dedup_stats()
+    if dedup["reused"] or dedup["patched"] or dedup["unpatchable"]:
+        print(f"Near-duplicates: {dedup['reused']} reused  |  {dedup['patched']} patched  |  "
+              f"{dedup['unpatchable']} re-parsed (could not patch)")
+    for name, limit in rate_limit_stats().items():
+        if limit["retries"]:
+            print(f"Rate limit {name}: {limit['retries']} retries ({limit['throttled']} x 429), "
+                  f"concurrency now {limit['concurrency_limit']}")
+    if run_profile is not None:
+        _print_profile(run_profile, output_path / f"profile-{run_id}.json", prometheus)
+    print(f"Output saved to: {output_path.resolve()}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Batch resume / job description extraction.")
+    parser.add_argument("--kind", required=True, choices=sorted(KINDS), help="Document type in the input folder")
+    parser.add_argument("--input", required=True, help="Folder containing PDFs/DOCXs")
+    parser.add_argument("--output", required=True, help="Folder to save extracted JSON results")
+    parser.add_argument("--workers", type=int, default=4, help="Documents processed concurrently (default: 4)")
+    parser.add_argument("--async", dest="use_async", action="store_true",
+                        help="Drive all documents from one event loop via graph.ainvoke instead of a thread pool")
+    parser.add_argument("--no-llm-cache", dest="llm_cache", action="store_false",
+                        help="Ignore cached LLM responses for this run (fresh responses are still cached)")
+    parser.add_argument("--only-failed", action="store_true",
+                        help="Only reprocess files whose last recorded status was FAIL or ERROR")
+    parser.add_argument("--since", type=datetime.fromisoformat,
+                        help="Only consider files modified at or after this ISO date/time (e.g. 2026-10-01)")
+    parser.add_argument("--force", action="store_true",
+                        help="Reprocess files even if the manifest says they are unchanged and done")
+    parser.add_argument("--sink", default="json",
+                        help=f"Comma-separated output sinks: {', '.join(SINK_NAMES)} (default: json)")
+    parser.add_argument("--profile", action="store_true",
+                        help="Record per-node wall time, retries, tokens, OCR bytes and estimated cost; "
+                             "writes profile-<run id>.json to the output folder")
+    parser.add_argument("--prometheus", metavar="PATH",
+                        help="Also write the profile as a Prometheus textfile (implies --profile)")
+    args = parser.parse_args()
+
+    sink_names = tuple(name.strip() for name in args.sink.split(",") if name.strip())
+    if unknown := set(sink_names) - set(SINK_NAMES):
+        parser.error(f"unknown sink(s): {', '.join(sorted(unknown))}")
+
+    run(args.kind, args.input, args.output, args.workers, args.use_async, args.llm_cache,
+        args.only_failed, args.since, args.force, sink_names, args.profile, args.prometheus)
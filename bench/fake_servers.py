@@ -0,0 +1,406 @@
+"""
+Local stand-ins for the Mistral (files + OCR) and OpenRouter (chat completions) APIs.
+
+Only the endpoints the pipeline uses are served. Each response waits a
+configurable, log-normally distributed latency and fails with 429/500/503 at a
+configurable rate. Chat completions answer structured-output requests
+(`response_format: json_schema` or a forced tool call) with an object
+generated from the requested JSON schema, optionally overridden per schema
+name with canned outputs.
+
+Run standalone to point the app or batch.py at it:
+
+    python -m bench.fake_servers --mistral-port 8801 --openrouter-port 8802
+    MISTRAL_SERVER_URL=http://127.0.0.1:8801 OPENROUTER_BASE_URL=http://127.0.0.1:8802/api/v1 \\
+        LOCAL_EXTRACTION=0 python batch.py --kind resume --input data/ --output /tmp/out
+"""
+
+import argparse
+import json
+import math
+import random
+import re
+import threading
+import time
+import uuid
+from dataclasses import dataclass, field
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Names the canned markdown contains, so the rule pre-judge can verify them
+FIXED_STRINGS = {
+    "full_name": "Alex Doe",
+    "first_name": "Alex",
+    "last_name": "Doe",
+    "role_title": "Data Scientist",
+    "grade_summary": "looks good",
+}
+
+PAGE_TEMPLATE = """# Alex Doe
+
+Data Scientist
+
+## Experience
+
+{filler}
+
+| Skill | Years |
+|-------|-------|
+| Python | 5 |
+"""
+
+FILLER = "Built forecasting models and data pipelines; mentored analysts; shipped dashboards. "
+
+
+@dataclass
+class Latency:
+    """Log-normal latency around `median` seconds; `sigma` controls the tail."""
+
+    median: float = 0.0
+    sigma: float = 0.0
+
+    @classmethod
+    def parse(cls, text: str) -> "Latency":
+        median, _, sigma = text.partition(",")
+        return cls(float(median), float(sigma or 0))
+
+    def sample(self, rng: random.Random) -> float:
+        if self.median <= 0:
+            return 0.0
+        return rng.lognormvariate(math.log(self.median), self.sigma) if self.sigma else self.median
+
+
+@dataclass
+class FakeConfig:
+    ocr_latency: Latency = field(default_factory=Latency)
+    ocr_latency_per_page: float = 0.0
+    files_latency: Latency = field(default_factory=Latency)
+    chat_latency: Latency = field(default_factory=Latency)
+    error_rate: float = 0.0
+    pages: int = 2
+    page_chars: int = 2500
+    judge_fail_rate: float = 0.0
+    # schema name -> object returned instead of the generated one
+    canned: dict = field(default_factory=dict)
+    seed: int = 0
+
+
+############## Structured output from a JSON schema #####################
+
+def _resolve(schema: dict, root: dict) -> dict:
+    while "$ref" in schema:
+        schema = root["$defs"][schema["$ref"].rsplit("/", 1)[-1]]
+    return schema
+
+
+def generate(schema: dict, root: dict | None = None, name: str = ""):
+    """Smallest valid instance of `schema`: nullable fields are null, lists empty."""
+    root = root or schema
+    schema = _resolve(schema, root)
+
+    if "anyOf" in schema:
+        options = [_resolve(s, root) for s in schema["anyOf"]]
+        if any(o.get("type") == "null" for o in options):
+            return None
+        return generate(options[0], root, name)
+
+    types = schema.get("type", "object")
+    if isinstance(types, list):
+        if "null" in types:
+            return None
+        types = types[0]
+
+    if types == "object":
+        return {key: generate(sub, root, key) for key, sub in schema.get("properties", {}).items()}
+    if types == "array":
+        return []
+    if types == "string":
+        return schema["enum"][0] if "enum" in schema else FIXED_STRINGS.get(name, "n/a")
+    if types == "integer":
+        return 0
+    if types == "number":
+        return 0.0
+    if types == "boolean":
+        return False
+    return None
+
+
+def structured_answer(schema_name: str, schema: dict, config: FakeConfig, rng: random.Random) -> dict:
+    if schema_name in config.canned:
+        return config.canned[schema_name]
+    answer = generate(schema)
+    if schema_name == "judgeJson":
+        answer["grade"] = "FAIL" if rng.random() < config.judge_fail_rate else "PASS"
+    return answer
+
+
+############## HTTP #####################
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive, like the real APIs
+    server: "FakeServer"
+
+    def log_message(self, format, *args):
+        pass
+
+    def _body(self) -> bytes:
+        return self.rfile.read(int(self.headers.get("Content-Length") or 0))
+
+    def _send(self, status: int, payload: dict, headers: dict | None = None):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _serve(self, method: str):
+        body = self._body()
+        route = self.server.route(method, self.path.split("?", 1)[0])
+        if route is None:
+            self._send(404, {"error": {"message": f"no fake for {method} {self.path}"}})
+            return
+        endpoint, handler = route
+        delay, error = self.server.plan(endpoint)
+        time.sleep(delay)
+        if error:
+            headers = {"Retry-After": "1"} if error == 429 else None
+            self._send(error, {"error": {"message": "injected failure", "code": error}}, headers)
+            return
+        self._send(200, handler(self, body))
+
+    def do_GET(self):
+        self._serve("GET")
+
+    def do_POST(self):
+        self._serve("POST")
+
+    def do_DELETE(self):
+        self._serve("DELETE")
+
+
+class FakeServer(ThreadingHTTPServer):
+    daemon_threads = True
+    # Benchmarks open hundreds of connections at once
+    request_queue_size = 1024
+
+    def __init__(self, port: int, config: FakeConfig, routes: list):
+        super().__init__(("127.0.0.1", port), _Handler)
+        self.config = config
+        self.routes = [(method, re.compile(pattern), endpoint, handler) for method, pattern, endpoint, handler in routes]
+        self._rng = random.Random(config.seed)
+        self._lock = threading.Lock()
+        self.counts = {}
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.server_address[1]}"
+
+    def route(self, method: str, path: str):
+        for route_method, pattern, endpoint, handler in self.routes:
+            if route_method == method and pattern.fullmatch(path):
+                return endpoint, handler
+        return None
+
+    def rng(self) -> random.Random:
+        with self._lock:
+            return random.Random(self._rng.random())
+
+    def plan(self, endpoint: str) -> tuple[float, int | None]:
+        """Latency and injected error (if any) for one request."""
+        with self._lock:
+            latency = {
+                "ocr": self.config.ocr_latency.sample(self._rng) + self.config.ocr_latency_per_page * self.config.pages,
+                "chat": self.config.chat_latency.sample(self._rng),
+            }.get(endpoint, self.config.files_latency.sample(self._rng))
+            error = self._rng.choice((429, 500, 503)) if self._rng.random() < self.config.error_rate else None
+            stats = self.counts.setdefault(endpoint, {"requests": 0, "errors": 0})
+            stats["requests"] += 1
+            stats["errors"] += bool(error)
+        return latency, error
+
+    def start(self) -> "FakeServer":
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+
+############## Mistral #####################
+
+def _upload(handler: _Handler, body: bytes) -> dict:
+    return {
+        "id": str(uuid.uuid4()),
+        "object": "file",
+        "bytes": len(body),
+        "created_at": int(time.time()),
+        "filename": "upload",
+        "purpose": "ocr",
+        "sample_type": "ocr_input",
+        "source": "upload",
+        "num_lines": None,
+    }
+
+
+def _signed_url(handler: _Handler, body: bytes) -> dict:
+    file_id = handler.path.split("/")[3]
+    return {"url": f"{handler.server.url}/signed/{file_id}"}
+
+
+def _ocr(handler: _Handler, body: bytes) -> dict:
+    config = handler.server.config
+    filler = (FILLER * (config.page_chars // len(FILLER) + 1))[:config.page_chars]
+    pages = [
+        {
+            "index": i,
+            "markdown": PAGE_TEMPLATE.format(filler=filler) + f"\n{i + 1}\n",
+            "images": [],
+            "dimensions": {"dpi": 200, "height": 2200, "width": 1700},
+        }
+        for i in range(config.pages)
+    ]
+    return {
+        "pages": pages,
+        "model": "mistral-ocr-latest",
+        "usage_info": {"pages_processed": config.pages, "doc_size_bytes": len(body)},
+    }
+
+
+def mistral_server(port: int, config: FakeConfig) -> FakeServer:
+    return FakeServer(port, config, [
+        ("POST", r"/v1/files", "files", _upload),
+        ("GET", r"/v1/files/[^/]+/url", "files", _signed_url),
+        ("GET", r"/v1/files", "files", lambda h, b: {"data": [], "object": "list", "total": 0}),
+        ("DELETE", r"/v1/files/[^/]+", "files", lambda h, b: {"id": h.path.split("/")[3], "object": "file", "deleted": True}),
+        ("POST", r"/v1/ocr", "ocr", _ocr),
+    ])
+
+
+############## OpenRouter #####################
+
+def _chat(handler: _Handler, body: bytes) -> dict:
+    request = json.loads(body)
+    config = handler.server.config
+    rng = handler.server.rng()
+
+    message = {"role": "assistant", "content": None, "refusal": None}
+    if request.get("tools"):
+        function = request["tools"][0]["function"]
+        answer = structured_answer(function["name"], function["parameters"], config, rng)
+        message["tool_calls"] = [{
+            "id": f"call_{uuid.uuid4().hex[:12]}",
+            "type": "function",
+            "function": {"name": function["name"], "arguments": json.dumps(answer)},
+        }]
+        finish_reason, completion = "tool_calls", message["tool_calls"][0]["function"]["arguments"]
+    else:
+        response_format = request.get("response_format") or {}
+        if response_format.get("type") == "json_schema":
+            spec = response_format["json_schema"]
+            answer = structured_answer(spec["name"], spec["schema"], config, rng)
+            message["content"] = json.dumps(answer)
+        else:
+            message["content"] = "ok"
+        finish_reason, completion = "stop", message["content"]
+
+    prompt_tokens = len(json.dumps(request.get("messages", []))) // 4
+    completion_tokens = len(completion) // 4
+    return {
+        "id": f"chatcmpl-{uuid.uuid4().hex[:12]}",
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": request.get("model", "fake"),
+        "choices": [{"index": 0, "message": message, "finish_reason": finish_reason, "logprobs": None}],
+        "usage": {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "total_tokens": prompt_tokens + completion_tokens,
+        },
+    }
+
+
+def openrouter_server(port: int, config: FakeConfig) -> FakeServer:
+    return FakeServer(port, config, [
+        ("POST", r"/api/v1/chat/completions", "chat", _chat),
+    ])
+
+
+class FakeServers:
+    """Both stand-ins on free (or given) ports; use as a context manager."""
+
+    def __init__(self, config: FakeConfig, mistral_port: int = 0, openrouter_port: int = 0):
+        self.mistral = mistral_server(mistral_port, config).start()
+        self.openrouter = openrouter_server(openrouter_port, config).start()
+
+    def env(self) -> dict:
+        """Environment that points the pipeline at these servers."""
+        return {
+            "MISTRAL_SERVER_URL": self.mistral.url,
+            "OPENROUTER_BASE_URL": f"{self.openrouter.url}/api/v1",
+            "MISTRAL_API_KEY": "fake",
+            "OPENROUTER_API_KEY": "fake",
+        }
+
+    def counts(self) -> dict:
+        return {**self.mistral.counts, **self.openrouter.counts}
+
+    def close(self):
+        for server in (self.mistral, self.openrouter):
+            server.shutdown()
+            server.server_close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def add_config_arguments(parser: argparse.ArgumentParser):
+    parser.add_argument("--ocr-latency", type=Latency.parse, default=Latency(0.5, 0.3),
+                        help="OCR latency as 'median[,sigma]' seconds (default: 0.5,0.3)")
+    parser.add_argument("--ocr-latency-per-page", type=float, default=0.0, help="Extra OCR seconds per page")
+    parser.add_argument("--files-latency", type=Latency.parse, default=Latency(0.05, 0.2),
+                        help="Files API latency as 'median[,sigma]' seconds (default: 0.05,0.2)")
+    parser.add_argument("--chat-latency", type=Latency.parse, default=Latency(0.4, 0.4),
+                        help="Chat completion latency as 'median[,sigma]' seconds (default: 0.4,0.4)")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Share of requests failing with 429/500/503")
+    parser.add_argument("--pages", type=int, default=2, help="Pages per OCR'd document")
+    parser.add_argument("--page-chars", type=int, default=2500, help="Filler characters per page")
+    parser.add_argument("--judge-fail-rate", type=float, default=0.0, help="Share of LLM judge calls answering FAIL")
+    parser.add_argument("--canned", help="JSON file mapping schema name (e.g. ResumeData) to the object to return")
+    parser.add_argument("--seed", type=int, default=0)
+
+
+def config_from_args(args) -> FakeConfig:
+    canned = {}
+    if args.canned:
+        with open(args.canned, encoding="utf-8") as f:
+            canned = json.load(f)
+    return FakeConfig(
+        ocr_latency=args.ocr_latency,
+        ocr_latency_per_page=args.ocr_latency_per_page,
+        files_latency=args.files_latency,
+        chat_latency=args.chat_latency,
+        error_rate=args.error_rate,
+        pages=args.pages,
+        page_chars=args.page_chars,
+        judge_fail_rate=args.judge_fail_rate,
+        canned=canned,
+        seed=args.seed,
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve fake Mistral and OpenRouter endpoints.")
+    parser.add_argument("--mistral-port", type=int, default=8801)
+    parser.add_argument("--openrouter-port", type=int, default=8802)
+    add_config_arguments(parser)
+    args = parser.parse_args()
+
+    servers = FakeServers(config_from_args(args), args.mistral_port, args.openrouter_port)
+    for key, value in servers.env().items():
+        print(f"{key}={value}")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        servers.close()
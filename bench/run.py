@@ -0,0 +1,185 @@
+"""
+Offline throughput benchmark.
+
+Starts the fake Mistral/OpenRouter servers, writes a synthetic corpus and
+runs the batch runners (thread pool and asyncio) against `build_graph()` at
+several concurrency levels. Each run happens in a fresh subprocess, so peak
+memory and connection pools are measured per configuration.
+
+    python -m bench.run --docs 50 --concurrency 1,8,32 --runners threads,async
+    python -m bench.run --docs 200 --concurrency 64 --chat-latency 1.0,0.5 --error-rate 0.02 --json bench.json
+
+Local extraction and the OCR/LLM/upload caches are disabled in the
+subprocesses so every document exercises OCR, parse and judge. Other settings
+(e.g. RESUME_EXTRACTION_MODE, RULE_JUDGE) are inherited from the environment.
+"""
+
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from bench.fake_servers import FakeServers, add_config_arguments, config_from_args
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+
+# Every document goes through the remote path on every run
+BENCH_ENV = {
+    "LOCAL_EXTRACTION": "0",
+    "OCR_CACHE_DIR": "",
+    "OCR_UPLOAD_REGISTRY": "",
+    "LLM_CACHE_PATH": "",
+    "DEDUP_INDEX_PATH": "",
+}
+
+
+def write_corpus(folder: Path, docs: int, doc_bytes: int) -> list[Path]:
+    """Opaque stand-in documents; the fake OCR ignores their content."""
+    files = []
+    for i in range(docs):
+        path = folder / f"doc_{i:05d}.pdf"
+        path.write_bytes(b"%PDF-1.4\n" + os.urandom(max(doc_bytes - 9, 0)))
+        files.append(path)
+    return files
+
+
+############## Child: one runner at one concurrency level #####################
+
+class _Collect:
+    """Sink that keeps the records in memory for the latency numbers."""
+
+    def __init__(self):
+        self.records = []
+
+    def write(self, record: dict, on_written=None):
+        self.records.append(record)
+        if on_written is not None:
+            on_written()
+
+    def close(self):
+        pass
+
+
+def _rss_mb() -> float:
+    # ru_maxrss is in KiB on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def run_child(kind: str, input_folder: str, runner: str, workers: int) -> dict:
+    import batch
+    from src.graph.workflow import build_graph
+    from src.metrics import percentile
+
+    files = sorted(Path(input_folder).iterdir())
+    graph = build_graph()
+    sink = _Collect()
+    baseline_mb = _rss_mb()
+
+    started = time.perf_counter()
+    # The runners print a progress line per document
+    with contextlib.redirect_stdout(io.StringIO()):
+        if runner == "async":
+            outcomes = asyncio.run(batch._run_async(graph, kind, files, sink, workers, {}, lambda f, o: None, None))
+        else:
+            outcomes = batch._run_threads(graph, kind, files, sink, workers, {}, lambda f, o: None, None)
+    elapsed = time.perf_counter() - started
+
+    latencies = [r["duration_s"] for r in sink.records]
+    # Outcomes, not sink records: a failing sink turns the document into an ERROR without storing it
+    errors = [o for o in outcomes if o["verdict"] == "ERROR"]
+    return {
+        "runner": runner,
+        "workers": workers,
+        "docs": len(outcomes),
+        "errors": len(errors),
+        "first_error": errors[0]["error"] if errors else None,
+        "elapsed_s": round(elapsed, 3),
+        "docs_per_s": round(len(outcomes) / elapsed, 3) if elapsed else 0.0,
+        "p50_s": round(percentile(latencies, 0.5), 3),
+        "p95_s": round(percentile(latencies, 0.95), 3),
+        "p99_s": round(percentile(latencies, 0.99), 3),
+        "baseline_rss_mb": round(baseline_mb, 1),
+        "peak_rss_mb": round(_rss_mb(), 1),
+    }
+
+
+############## Parent: servers, corpus, sweep #####################
+
+def _run_level(servers: FakeServers, kind: str, corpus: Path, runner: str, workers: int) -> dict:
+    env = {**os.environ, **servers.env(), **BENCH_ENV}
+    proc = subprocess.run(
+        [sys.executable, "-m", "bench.run", "--child", "--kind", kind, "--input", str(corpus),
+         "--runner", runner, "--workers", str(workers)],
+        cwd=REPO_ROOT, env=env, capture_output=True, text=True,
+    )
+    if proc.returncode != 0:
+        raise RuntimeError(f"{runner} x{workers} failed:\n{proc.stderr}")
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+
+def _print_table(results: list[dict]):
+    header = f"{'runner':<8} {'workers':>7} {'docs':>5} {'errors':>6} {'docs/s':>8} {'p50 s':>7} {'p95 s':>7} {'p99 s':>7} {'peak MB':>8}"
+    print(header)
+    print("-" * len(header))
+    for r in results:
+        print(f"{r['runner']:<8} {r['workers']:>7} {r['docs']:>5} {r['errors']:>6} {r['docs_per_s']:>8.2f} "
+              f"{r['p50_s']:>7.2f} {r['p95_s']:>7.2f} {r['p99_s']:>7.2f} {r['peak_rss_mb']:>8.1f}")
+
+
+def run_sweep(args) -> dict:
+    config = config_from_args(args)
+    results = []
+    with tempfile.TemporaryDirectory() as tmp, FakeServers(config) as servers:
+        corpus = Path(tmp)
+        write_corpus(corpus, args.docs, args.doc_bytes)
+        for runner in args.runners:
+            for workers in args.concurrency:
+                result = _run_level(servers, args.kind, corpus, runner, workers)
+                results.append(result)
+                print(f"{runner} x{workers}: {result['docs_per_s']:.2f} docs/s, p95 {result['p95_s']:.2f}s"
+                      + (f", {result['errors']} errors ({result['first_error']})" if result["errors"] else ""),
+                      flush=True)
+        requests = servers.counts()
+
+    print()
+    _print_table(results)
+    print(f"Fake API requests: {json.dumps(requests)}")
+    return {"config": {k: str(v) for k, v in vars(args).items()}, "results": results, "requests": requests}
+
+
+def _int_list(text: str) -> list[int]:
+    return [int(x) for x in text.split(",") if x.strip()]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Offline throughput benchmark against fake Mistral/OpenRouter servers.")
+    parser.add_argument("--kind", default="resume", choices=["resume", "jd"])
+    parser.add_argument("--docs", type=int, default=40, help="Documents in the synthetic corpus")
+    parser.add_argument("--doc-bytes", type=int, default=200_000, help="Size of each synthetic document")
+    parser.add_argument("--concurrency", type=_int_list, default=[1, 8, 32], help="Comma-separated worker counts")
+    parser.add_argument("--runners", type=lambda s: s.split(","), default=["threads", "async"],
+                        help="Comma-separated: threads, async")
+    parser.add_argument("--json", help="Also write the results to this file")
+    add_config_arguments(parser)
+    # Internal: a single measurement, run in a subprocess by the sweep
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--input", help=argparse.SUPPRESS)
+    parser.add_argument("--runner", help=argparse.SUPPRESS)
+    parser.add_argument("--workers", type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(run_child(args.kind, args.input, args.runner, args.workers)))
+    else:
+        report = run_sweep(args)
+        if args.json:
+            with open(args.json, "w", encoding="utf-8") as f:
+                json.dump(report, f, indent=4)
@@ -0,0 +1,347 @@
+"""
+Headless HTTP extraction service.
+
+Usage:
+    python service.py --host 0.0.0.0 --port 8000
+    curl -F resume=@cv.pdf -F jd=@role.docx http://localhost:8000/jobs          # -> 202 {"job_id": ...}
+    curl http://localhost:8000/jobs/<job_id>?wait=30                             # poll (long-poll up to 30s)
+    curl -N http://localhost:8000/jobs/<job_id>/events                           # stream stage updates (SSE)
+
+Uploads are queued on a bounded in-process queue and served by a fixed pool
+of async workers sharing one compiled graph. A full queue answers 429 with
+Retry-After; a job that is not finished by its deadline is expired (and
+cancelled if running).
+"""
+
+import argparse
+import asyncio
+import json
+import time
+import uuid
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
+
+from fastapi import FastAPI, File, Form, HTTPException, UploadFile
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
+
+from src.chains.llm_cache import llm_cache_stats
+from src.config import (
+    SERVICE_WORKERS,
+    SERVICE_QUEUE_SIZE,
+    SERVICE_DEADLINE_SECONDS,
+    SERVICE_JOB_TTL_SECONDS,
+    SERVICE_MAX_UPLOAD_BYTES,
+)
+from src.dedup import dedup_stats
+from src.graph.state import initial_state
+from src.graph.workflow import build_graph
+from src.metrics import percentile
+from src.ocr import ocr_stats
+
+FINISHED = ("done", "failed", "expired")
+
+# Job durations kept for the /metrics quantiles
+DURATION_WINDOW = 1000
+
+
+@dataclass
+class Job:
+    id: str
+    mode: str
+    state: dict
+    deadline: float
+    created: float = field(default_factory=time.time)
+    status: str = "queued"
+    started: float | None = None
+    finished: float | None = None
+    result: dict | None = None
+    error: str | None = None
+    events: list[dict] = field(default_factory=list)
+    changed: asyncio.Event = field(default_factory=asyncio.Event)
+
+    def publish(self, event: dict):
+        self.events.append(event)
+        # Wake every waiter, then re-arm for the next event
+        self.changed.set()
+        self.changed = asyncio.Event()
+
+    def view(self) -> dict:
+        return {
+            "job_id": self.id,
+            "mode": self.mode,
+            "status": self.status,
+            "created": self.created,
+            "started": self.started,
+            "finished": self.finished,
+            "result": self.result,
+            "error": self.error,
+        }
+
+
+############## Stage events #####################
+
+def _event(node: str, values: dict | None) -> dict:
+    """Compact, JSON-safe summary of one node's state update."""
+    values = values or {}
+    event = {"node": node, "at": time.time()}
+    for key, value in values.items():
+        if key.endswith("_pages"):
+            event["pages"] = len(value)
+        elif key.endswith("_data") and value is not None:
+            event[key] = value.model_dump()
+        elif key in ("judge_results", "compaction_stats", "reflection_loop") or key.endswith("_duplicate_of"):
+            event[key] = value
+    return event
+
+
+def _result(final: dict) -> dict:
+    return {
+        "resume_data": final["resume_data"].model_dump() if final.get("resume_data") else None,
+        "jd_data": final["jd_data"].model_dump() if final.get("jd_data") else None,
+        "judge_results": final.get("judge_results", []),
+        "reflection_loop": final.get("reflection_loop", 0),
+        "compaction_stats": final.get("compaction_stats", []),
+        "resume_duplicate_of": final.get("resume_duplicate_of"),
+        "jd_duplicate_of": final.get("jd_duplicate_of"),
+    }
+
+
+############## Queue + workers #####################
+
+class JobService:
+    def __init__(self, workers: int, queue_size: int):
+        self.graph = build_graph()
+        self.queue: asyncio.Queue[Job] = asyncio.Queue(maxsize=queue_size)
+        self.jobs: dict[str, Job] = {}
+        self.worker_count = workers
+        self.tasks: list[asyncio.Task] = []
+        self.counts = {"accepted": 0, "rejected": 0, "done": 0, "failed": 0, "expired": 0}
+        self.durations: list[float] = []
+
+    def start(self):
+        self.tasks = [asyncio.create_task(self._worker()) for _ in range(self.worker_count)]
+        self.tasks.append(asyncio.create_task(self._reaper()))
+
+    async def stop(self):
+        for task in self.tasks:
+            task.cancel()
+        await asyncio.gather(*self.tasks, return_exceptions=True)
+
+    def submit(self, job: Job) -> bool:
+        try:
+            self.queue.put_nowait(job)
+        except asyncio.QueueFull:
+            self.counts["rejected"] += 1
+            return False
+        self.jobs[job.id] = job
+        self.counts["accepted"] += 1
+        job.publish({"node": "queued", "at": job.created})
+        return True
+
+    def _finish(self, job: Job, status: str, error: str | None = None):
+        job.status, job.error, job.finished = status, error, time.time()
+        self.counts[status] += 1
+        if job.started:
+            self.durations = (self.durations + [job.finished - job.started])[-DURATION_WINDOW:]
+        # Uploads are no longer needed once the job is settled
+        job.state = {}
+        job.publish({"node": status, "at": job.finished, "error": error})
+
+    async def _run(self, job: Job):
+        final = dict(job.state)
+        async for update in self.graph.astream(job.state, stream_mode="updates"):
+            for node, values in update.items():
+                for key, value in (values or {}).items():
+                    # Reducer fields accumulate, everything else is replaced
+                    final[key] = final.get(key, []) + value if key in ("judge_results", "compaction_stats") else value
+                job.publish(_event(node, values))
+        return _result(final)
+
+    async def _worker(self):
+        while True:
+            job = await self.queue.get()
+            try:
+                remaining = job.deadline - time.time()
+                if remaining <= 0:
+                    self._finish(job, "expired", "deadline passed while queued")
+                    continue
+                job.status, job.started = "running", time.time()
+                job.publish({"node": "running", "at": job.started})
+                try:
+                    job.result = await asyncio.wait_for(self._run(job), timeout=remaining)
+                    self._finish(job, "done")
+                except asyncio.TimeoutError:
+                    self._finish(job, "expired", "deadline exceeded while running")
+                except Exception as e:
+                    self._finish(job, "failed", str(e))
+            finally:
+                self.queue.task_done()
+
+    async def _reaper(self):
+        """Forget finished jobs after SERVICE_JOB_TTL_SECONDS."""
+        while True:
+            await asyncio.sleep(min(60, SERVICE_JOB_TTL_SECONDS))
+            cutoff = time.time() - SERVICE_JOB_TTL_SECONDS
+            for job_id in [j.id for j in self.jobs.values() if j.finished and j.finished < cutoff]:
+                del self.jobs[job_id]
+
+    def healthy(self) -> bool:
+        workers = self.tasks[:self.worker_count]
+        return bool(workers) and not any(task.done() for task in workers)
+
+    def prometheus(self, prefix: str = "extraction_service") -> str:
+        running = sum(1 for j in self.jobs.values() if j.status == "running")
+        lines = [
+            f"# TYPE {prefix}_queue_depth gauge", f"{prefix}_queue_depth {self.queue.qsize()}",
+            f"# TYPE {prefix}_queue_capacity gauge", f"{prefix}_queue_capacity {self.queue.maxsize}",
+            f"# TYPE {prefix}_jobs_running gauge", f"{prefix}_jobs_running {running}",
+            f"# TYPE {prefix}_workers gauge", f"{prefix}_workers {self.worker_count}",
+            f"# TYPE {prefix}_jobs_total counter",
+        ]
+        lines += [f'{prefix}_jobs_total{{outcome="{k}"}} {v}' for k, v in self.counts.items()]
+        lines += [f"# TYPE {prefix}_job_seconds summary"]
+        for q in (0.5, 0.95, 0.99):
+            lines.append(f'{prefix}_job_seconds{{quantile="{q}"}} {percentile(self.durations, q):.3f}')
+        lines += [f"{prefix}_job_seconds_count {len(self.durations)}"]
+        ocr, llm = ocr_stats(), llm_cache_stats()
+        lines += [f"# TYPE {prefix}_ocr_documents_total counter"]
+        lines += [f'{prefix}_ocr_documents_total{{path="{k}"}} {v}' for k, v in ocr.items()]
+        lines += [f"# TYPE {prefix}_llm_cache_total counter"]
+        lines += [f'{prefix}_llm_cache_total{{result="{k}"}} {v}' for k, v in llm.items()]
+        lines += [f"# TYPE {prefix}_near_duplicates_total counter"]
+        lines += [f'{prefix}_near_duplicates_total{{outcome="{k}"}} {v}' for k, v in dedup_stats().items()]
+        return "\n".join(lines) + "\n"
+
+
+############## HTTP #####################
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    app.state.service = JobService(SERVICE_WORKERS, SERVICE_QUEUE_SIZE)
+    app.state.service.start()
+    yield
+    await app.state.service.stop()
+
+
+app = FastAPI(title="Document Extraction Service", lifespan=lifespan)
+
+
+def _service() -> JobService:
+    return app.state.service
+
+
+def _job(job_id: str) -> Job:
+    job = _service().jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="unknown job")
+    return job
+
+
+async def _upload(file: UploadFile | None) -> tuple[str, bytes] | None:
+    if file is None:
+        return None
+    too_large = HTTPException(status_code=413, detail=f"{file.filename} exceeds {SERVICE_MAX_UPLOAD_BYTES} bytes")
+    # Reject on the declared size before pulling the spooled upload into memory, and never read past the cap
+    if file.size is not None and file.size > SERVICE_MAX_UPLOAD_BYTES:
+        raise too_large
+    data = await file.read(SERVICE_MAX_UPLOAD_BYTES + 1)
+    if len(data) > SERVICE_MAX_UPLOAD_BYTES:
+        raise too_large
+    return file.filename or "upload.pdf", data
+
+
+def _queue_full() -> JSONResponse:
+    return JSONResponse(
+        status_code=429,
+        content={"detail": "queue full, retry later"},
+        headers={"Retry-After": "5"},
+    )
+
+
+@app.post("/jobs", status_code=202)
+async def create_job(
+    resume: UploadFile | None = File(None),
+    jd: UploadFile | None = File(None),
+    deadline_seconds: float | None = Form(None, gt=0),
+):
+    """Queue a resume and/or JD; the mode follows from which files are sent."""
+    if resume is None and jd is None:
+        raise HTTPException(status_code=422, detail="send a 'resume' and/or 'jd' file")
+    service = _service()
+    if service.queue.full():
+        service.counts["rejected"] += 1
+        return _queue_full()
+    mode = "both" if resume and jd else "resume_only" if resume else "jd_only"
+    deadline = min(deadline_seconds or SERVICE_DEADLINE_SECONDS, SERVICE_DEADLINE_SECONDS)
+
+    job = Job(
+        id=uuid.uuid4().hex,
+        mode=mode,
+        state=initial_state(mode, resume_upload=await _upload(resume), jd_upload=await _upload(jd)),
+        deadline=time.time() + deadline,
+    )
+    # The queue can still fill up while the uploads are read
+    if not service.submit(job):
+        return _queue_full()
+    return {"job_id": job.id, "status": job.status, "deadline": job.deadline}
+
+
+@app.get("/jobs/{job_id}")
+async def get_job(job_id: str, wait: float = 0):
+    """Job status and, once done, its result. `wait` long-polls up to that many seconds."""
+    job = _job(job_id)
+    give_up = time.time() + min(wait, 60)
+    while job.status not in FINISHED and time.time() < give_up:
+        try:
+            await asyncio.wait_for(job.changed.wait(), timeout=give_up - time.time())
+        except asyncio.TimeoutError:
+            break
+    return job.view()
+
+
+@app.get("/jobs/{job_id}/events")
+async def job_events(job_id: str):
+    """Server-sent events: one per finished node, then the final status."""
+    job = _job(job_id)
+
+    async def stream():
+        sent = 0
+        while True:
+            changed = job.changed
+            while sent < len(job.events):
+                yield f"data: {json.dumps(job.events[sent])}\n\n"
+                sent += 1
+            if job.status in FINISHED:
+                yield f"event: result\ndata: {json.dumps(job.view())}\n\n"
+                return
+            await changed.wait()
+
+    return StreamingResponse(stream(), media_type="text/event-stream")
+
+
+@app.get("/healthz")
+async def healthz():
+    service = _service()
+    body = {
+        "status": "ok" if service.healthy() else "degraded",
+        "queue_depth": service.queue.qsize(),
+        "queue_capacity": service.queue.maxsize,
+        "workers": service.worker_count,
+    }
+    return JSONResponse(status_code=200 if service.healthy() else 503, content=body)
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    return _service().prometheus()
+
+
+if __name__ == "__main__":
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description="HTTP extraction service.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    args = parser.parse_args()
+
+    uvicorn.run(app, host=args.host, port=args.port)
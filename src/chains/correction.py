@@ -0,0 +1,17 @@
+from langchain_core.messages import HumanMessage
+
+
+def correction_messages(feedback: str | None) -> list:
+    """Turn the judge's FAIL summary into extra context for a re-parse."""
+    if not feedback:
+        return []
+    return [
+        HumanMessage(
+            content=(
+                "A QA review rejected your previous extraction of this document:\n"
+                f"<judge_feedback>\n{feedback}\n</judge_feedback>\n"
+                "Re-extract the data from the markdown above and fix these issues. "
+                "Keep every field that was already correct."
+            )
+        )
+    ]
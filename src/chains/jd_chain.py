@@ -1,8 +1,12 @@
+from functools import lru_cache
+
 from langchain_core.prompts import (
     ChatPromptTemplate,
     SystemMessagePromptTemplate,
     HumanMessagePromptTemplate,
+    MessagesPlaceholder,
 )
+from src.chains.llm_cache import cached_structured_chain
 from src.config import get_extraction_llm
 from src.validation_models.jd import JobDescription
 
@@ -31,9 +35,13 @@ human_prompt = HumanMessagePromptTemplate.from_template(
 """
 )
 
-prompt_template = ChatPromptTemplate.from_messages([system_prompt, human_prompt])
+# "correction" carries the judge's feedback on a reflection retry (see correction.py)
+prompt_template = ChatPromptTemplate.from_messages(
+    [system_prompt, human_prompt, MessagesPlaceholder("correction", optional=True)]
+)
 
 
+@lru_cache(maxsize=1)
 def get_jd_chain():
     llm = get_extraction_llm()
-    return prompt_template | llm.with_structured_output(JobDescription)
+    return cached_structured_chain(prompt_template, llm, JobDescription)
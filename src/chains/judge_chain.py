@@ -1,8 +1,11 @@
+from functools import lru_cache
+
 from langchain_core.prompts import (
     ChatPromptTemplate,
     SystemMessagePromptTemplate,
     HumanMessagePromptTemplate,
 )
+from src.chains.llm_cache import cached_structured_chain
 from src.config import get_judge_llm
 from src.validation_models.judge import judgeJson
 
@@ -49,6 +52,7 @@ prompt_template_judge = ChatPromptTemplate.from_messages(
 )
 
 
+@lru_cache(maxsize=1)
 def get_judge_chain():
     llm = get_judge_llm()
-    return prompt_template_judge | llm.with_structured_output(judgeJson)
+    return cached_structured_chain(prompt_template_judge, llm, judgeJson)
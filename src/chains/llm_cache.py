@@ -0,0 +1,150 @@
+"""
+Persistent SQLite cache for structured-output LLM calls.
+
+Responses are keyed by model name, prompt template hash, output schema hash
+and input hash, so a cached answer is only reused for a byte-identical
+request. Pass `{"configurable": {"llm_cache_bypass": True}}` in the run config
+(e.g. `graph.invoke(state, config=...)`) to ignore cached answers for that run;
+fresh answers are still written back.
+"""
+
+import asyncio
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from functools import lru_cache
+from pathlib import Path
+
+from langchain_core.messages import BaseMessage
+from langchain_core.runnables import RunnableLambda
+
+from src.config import LLM_CACHE_PATH, LLM_CACHE_MAX_ROWS, LLM_CACHE_MAX_AGE_DAYS
+
+# Run eviction every this many writes rather than on each one
+EVICT_EVERY = 200
+
+
+class LLMResponseCache:
+    def __init__(self, path: str, max_rows: int, max_age_days: float):
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self.max_rows = max_rows
+        self.max_age_seconds = max_age_days * 24 * 3600
+        self.hits = 0
+        self.misses = 0
+        self._writes = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS responses (
+                key TEXT PRIMARY KEY,
+                model TEXT NOT NULL,
+                response TEXT NOT NULL,
+                created REAL NOT NULL,
+                last_used REAL NOT NULL
+            )"""
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS responses_last_used ON responses (last_used)")
+        self._conn.commit()
+
+    def get(self, key: str) -> str | None:
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT response, created FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None or (self.max_age_seconds > 0 and now - row[1] > self.max_age_seconds):
+                self.misses += 1
+                return None
+            self._conn.execute("UPDATE responses SET last_used = ? WHERE key = ?", (now, key))
+            self._conn.commit()
+            self.hits += 1
+            return row[0]
+
+    def put(self, key: str, model: str, response: str):
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses (key, model, response, created, last_used) VALUES (?, ?, ?, ?, ?)",
+                (key, model, response, now, now),
+            )
+            self._conn.commit()
+            self._writes += 1
+            if self._writes % EVICT_EVERY == 0:
+                self._evict(now)
+
+    def _evict(self, now: float):
+        if self.max_age_seconds > 0:
+            self._conn.execute("DELETE FROM responses WHERE created < ?", (now - self.max_age_seconds,))
+        self._conn.execute(
+            "DELETE FROM responses WHERE key IN ("
+            " SELECT key FROM responses ORDER BY last_used DESC LIMIT -1 OFFSET ?)",
+            (self.max_rows,),
+        )
+        self._conn.commit()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses}
+
+
+@lru_cache(maxsize=1)
+def get_llm_cache() -> LLMResponseCache | None:
+    return LLMResponseCache(LLM_CACHE_PATH, LLM_CACHE_MAX_ROWS, LLM_CACHE_MAX_AGE_DAYS) if LLM_CACHE_PATH else None
+
+
+def llm_cache_stats() -> dict:
+    cache = get_llm_cache()
+    return cache.stats() if cache else {"hits": 0, "misses": 0}
+
+
+def _sha(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def _jsonable(value):
+    if isinstance(value, BaseMessage):
+        return {"type": value.type, "content": value.content}
+    return str(value)
+
+
+def _bypass(config: dict | None) -> bool:
+    return bool((config or {}).get("configurable", {}).get("llm_cache_bypass"))
+
+
+def cached_structured_chain(prompt, llm, schema):
+    """`prompt | llm.with_structured_output(schema)`, answered from the cache when possible."""
+    chain = prompt | llm.with_structured_output(schema)
+    cache = get_llm_cache()
+    if cache is None:
+        return chain
+
+    model = llm.model_name
+    prompt_hash = _sha(prompt.pretty_repr())
+    schema_hash = _sha(json.dumps(schema.model_json_schema(), sort_keys=True))
+
+    def key(inputs: dict) -> str:
+        input_hash = _sha(json.dumps(inputs, sort_keys=True, default=_jsonable))
+        return _sha(f"{model}\0{prompt_hash}\0{schema_hash}\0{input_hash}")
+
+    def run(inputs: dict, config: dict):
+        k = key(inputs)
+        hit = None if _bypass(config) else cache.get(k)
+        if hit is not None:
+            return schema.model_validate_json(hit)
+        result = chain.invoke(inputs, config)
+        cache.put(k, model, result.model_dump_json())
+        return result
+
+    async def arun(inputs: dict, config: dict):
+        k = key(inputs)
+        hit = None if _bypass(config) else await asyncio.to_thread(cache.get, k)
+        if hit is not None:
+            return schema.model_validate_json(hit)
+        result = await chain.ainvoke(inputs, config)
+        await asyncio.to_thread(cache.put, k, model, result.model_dump_json())
+        return result
+
+    return RunnableLambda(run, afunc=arun, name=f"cached_{schema.__name__}")
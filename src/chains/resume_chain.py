@@ -1,10 +1,22 @@
+from functools import lru_cache
+
+from langchain_core.messages import HumanMessage
 from langchain_core.prompts import (
     ChatPromptTemplate,
     SystemMessagePromptTemplate,
     HumanMessagePromptTemplate,
+    MessagesPlaceholder,
+)
+from langchain_core.runnables import RunnableLambda, RunnableParallel
+from src.chains.llm_cache import cached_structured_chain
+from src.config import get_extraction_llm, RESUME_EXTRACTION_MODE
+from src.validation_models.resume import (
+    ResumeData,
+    identityInfo,
+    educationList,
+    workExperienceList,
+    skillsInfo,
 )
-from src.config import get_extraction_llm
-from src.validation_models.resume import ResumeData
 
 
 system_prompt = SystemMessagePromptTemplate.from_template(
@@ -42,9 +54,63 @@ human_prompt = HumanMessagePromptTemplate.from_template(
 """
 )
 
-prompt_template = ChatPromptTemplate.from_messages([system_prompt, human_prompt])
+# "correction" carries the judge's feedback on a reflection retry (see correction.py)
+prompt_template = ChatPromptTemplate.from_messages(
+    [system_prompt, human_prompt, MessagesPlaceholder("correction", optional=True)]
+)
+
+
+########## Sectioned extraction #########
+# One smaller structured-output call per section, run concurrently and merged
+# back into ResumeData. Each section retries on its own if it fails validation.
+
+SECTIONS = {
+    "identity": (identityInfo, "the personal information and contact information"),
+    "education": (educationList, "every education entry"),
+    "work_experience": (workExperienceList, "every work experience entry"),
+    "skills": (skillsInfo, "the skills"),
+}
+
+SECTION_ATTEMPTS = 2
+
+
+def _section_prompt(description: str) -> ChatPromptTemplate:
+    instruction = HumanMessage(
+        content=f"Extract ONLY {description} of the candidate. Other sections are extracted separately."
+    )
+    return ChatPromptTemplate.from_messages(
+        [system_prompt, human_prompt, instruction, MessagesPlaceholder("correction", optional=True)]
+    )
+
+
+def _merge_sections(sections: dict) -> ResumeData:
+    return ResumeData(
+        personal_info=sections["identity"].personal_info,
+        contact_info=sections["identity"].contact_info,
+        education_info=sections["education"].education_info,
+        work_experience_info=sections["work_experience"].work_experience_info,
+        skills_info=sections["skills"],
+    )
+
+
+def get_sectioned_resume_chain():
+    llm = get_extraction_llm()
+    sections = RunnableParallel({
+        name: cached_structured_chain(_section_prompt(description), llm, model).with_retry(
+            stop_after_attempt=SECTION_ATTEMPTS
+        )
+        for name, (model, description) in SECTIONS.items()
+    })
+    return sections | RunnableLambda(_merge_sections)
+
+#########################################
 
 
+@lru_cache(maxsize=1)
 def get_resume_chain():
+    """Resume extraction chain: one ResumeData call, or per-section calls when
+    RESUME_EXTRACTION_MODE=sectioned. Both take the same inputs and return ResumeData."""
+    if RESUME_EXTRACTION_MODE == "sectioned":
+        return get_sectioned_resume_chain()
     llm = get_extraction_llm()
-    return prompt_template | llm.with_structured_output(ResumeData)
+    return cached_structured_chain(prompt_template, llm, ResumeData)
@@ -0,0 +1,133 @@
+"""
+Deterministic markdown compaction between OCR and parse.
+
+OCR markdown carries tokens the parser and judge never need: image
+placeholders, page headers/footers repeated on every page, padded table
+cells and whitespace runs. Since the same markdown goes into the extraction
+prompt and the judge prompt (and again on a reflection retry), every token
+removed here is saved several times over.
+"""
+
+import re
+from collections import Counter
+from functools import lru_cache
+
+IMAGE_PLACEHOLDER = re.compile(r"!\[[^\]]*\]\([^)]*\)")
+# "3", "- 3 -", "Page 3", "Page 3 of 7", "3 of 7", "3/7"; not "- 3" (a list item)
+PAGE_NUMBER = re.compile(
+    r"^\s*(?:page\s*\d{1,3}(?:\s*(?:of|/)\s*\d{1,3})?|\d{1,3}\s*(?:of|/)\s*\d{1,3}|[-–—]\s*\d{1,3}\s*[-–—]|\d{1,3})\s*$",
+    re.IGNORECASE,
+)
+# Date ranges and years ("2016 - 2018", "Mar 2024") must never be collapsed into one footer key
+DATE_LIKE = re.compile(
+    r"\b(?:19|20)\d{2}\b|\b(?:jan|feb|mar|apr|may|jun|jul|aug|sep|oct|nov|dec)[a-z]*\.?\s+\d{2,4}\b"
+    r"|\b\d{1,2}[/.-]\d{1,2}[/.-]\d{2,4}\b",
+    re.IGNORECASE,
+)
+TABLE_SEPARATOR_CELL = re.compile(r"^:?-+:?$")
+INLINE_WHITESPACE = re.compile(r"[ \t ]+")
+BLANK_RUNS = re.compile(r"\n{3,}")
+
+# Lines within this many non-empty lines of a page edge are header/footer candidates
+EDGE_LINES = 2
+
+
+def _edge_key(line: str) -> str | None:
+    """Digit-masked key, so "Page 3 of 7" and "Page 4 of 7" count as the same
+    footer. None for lines that are mostly digits or carry a date."""
+    line = line.strip().lower()
+    alnum = [c for c in line if c.isalnum()]
+    if not alnum or DATE_LIKE.search(line) or sum(c.isdigit() for c in alnum) * 2 >= len(alnum):
+        return None
+    return re.sub(r"\d+", "#", line)
+
+
+def _edge_indices(lines: list[str]) -> set[int]:
+    """Indices of the first and last EDGE_LINES non-empty lines."""
+    filled = [i for i, line in enumerate(lines) if line.strip()]
+    return set(filled[:EDGE_LINES] + filled[-EDGE_LINES:])
+
+
+def _repeated_edges(pages: list[str]) -> set[str]:
+    """Header/footer lines that appear at the edge of most pages."""
+    if len(pages) < 2:
+        return set()
+
+    counts = Counter()
+    for page in pages:
+        lines = page.splitlines()
+        keys = {_edge_key(lines[i]) for i in _edge_indices(lines)}
+        counts.update(keys - {None})
+
+    threshold = max(2, (len(pages) + 1) // 2)
+    return {key for key, n in counts.items() if n >= threshold}
+
+
+def _compact_table_row(line: str) -> str:
+    cells = [cell.strip() for cell in line.strip().strip("|").split("|")]
+    cells = ["---" if TABLE_SEPARATOR_CELL.match(cell) else cell for cell in cells]
+    return "| " + " | ".join(cells) + " |"
+
+
+def compact_page(page: str, repeated: set[str] = frozenset(), seen: set[str] | None = None) -> str:
+    """Compact one page. Page numbers and repeated header/footer lines are only
+    looked for at the page edges; the latter are kept the first time they are
+    `seen` (a running header is often the candidate's name)."""
+    page = IMAGE_PLACEHOLDER.sub("", page)
+    seen = set() if seen is None else seen
+
+    raw = page.splitlines()
+    edges = _edge_indices(raw)
+    lines = []
+    for i, line in enumerate(raw):
+        if i in edges:
+            if PAGE_NUMBER.match(line):
+                continue
+            key = _edge_key(line)
+            if key in repeated:
+                if key in seen:
+                    continue
+                seen.add(key)
+        if line.lstrip().startswith("|"):
+            line = _compact_table_row(line)
+        lines.append(INLINE_WHITESPACE.sub(" ", line).strip())
+
+    return BLANK_RUNS.sub("\n\n", "\n".join(lines)).strip()
+
+
+def compact_pages(pages: list[str]) -> list[str]:
+    repeated, seen = _repeated_edges(pages), set()
+    return [compact_page(page, repeated, seen) for page in pages]
+
+
+@lru_cache(maxsize=1)
+def _encoding():
+    try:
+        import tiktoken
+
+        return tiktoken.get_encoding("cl100k_base")
+    except Exception:  # not installed / encoding file unavailable offline
+        return None
+
+
+def estimate_tokens(text: str) -> int:
+    encoding = _encoding()
+    if encoding is None:
+        return (len(text) + 3) // 4
+    return len(encoding.encode(text, disallowed_special=()))
+
+
+def compact_markdown(pages: list[str]) -> tuple[list[str], str, dict]:
+    """Compact OCR pages; return (pages, joined markdown, token stats)."""
+    compacted = compact_pages(pages)
+    markdown = "\n\n".join(page for page in compacted if page)
+
+    before = estimate_tokens(" ".join(pages))
+    after = estimate_tokens(markdown)
+    stats = {
+        "tokens_before": before,
+        "tokens_after": after,
+        "tokens_saved": before - after,
+        "saved_pct": round(100 * (before - after) / before, 1) if before else 0.0,
+    }
+    return compacted, markdown, stats
@@ -1,4 +1,7 @@
 import os
+from functools import lru_cache
+
+import httpx
 from dotenv import load_dotenv
 from langchain_openai import ChatOpenAI
 from mistralai import Mistral
@@ -8,21 +11,176 @@ load_dotenv()
 OPENROUTER_API_KEY = os.getenv("OPENROUTER_API_KEY")
 MISTRAL_API_KEY = os.getenv("MISTRAL_API_KEY")
 
+OCR_MODEL = "mistral-ocr-latest"
+
+# --- API endpoints (override to point at local stand-ins, e.g. bench/fake_servers.py) ---
+OPENROUTER_BASE_URL = os.getenv("OPENROUTER_BASE_URL", "https://openrouter.ai/api/v1")
+MISTRAL_SERVER_URL = os.getenv("MISTRAL_SERVER_URL") or None
+
+# --- OCR cache (set OCR_CACHE_DIR="" to disable) ---
+OCR_CACHE_DIR = os.getenv("OCR_CACHE_DIR", ".cache/ocr")
+OCR_CACHE_MAX_BYTES = int(os.getenv("OCR_CACHE_MAX_BYTES", str(512 * 1024 * 1024)))
+OCR_CACHE_MAX_AGE_DAYS = float(os.getenv("OCR_CACHE_MAX_AGE_DAYS", "30"))
+
+# --- OCR images: only requested when a spill directory is set ---
+OCR_IMAGE_DIR = os.getenv("OCR_IMAGE_DIR", "")
+
+# --- OCR submission: inline data URL for small files, reusable uploads for the rest ---
+OCR_INLINE_MAX_BYTES = int(os.getenv("OCR_INLINE_MAX_BYTES", str(4 * 1024 * 1024)))
+OCR_SIGNED_URL_HOURS = int(os.getenv("OCR_SIGNED_URL_HOURS", "24"))
+OCR_UPLOAD_REGISTRY = os.getenv("OCR_UPLOAD_REGISTRY", ".cache/uploads.json")
+
+# --- Local text extraction (DOCX / text-layer PDF) before remote OCR ---
+LOCAL_EXTRACTION = os.getenv("LOCAL_EXTRACTION", "1") == "1"
+LOCAL_MIN_CHARS_PER_PAGE = int(os.getenv("LOCAL_MIN_CHARS_PER_PAGE", "200"))
+LOCAL_MAX_GARBAGE_RATIO = float(os.getenv("LOCAL_MAX_GARBAGE_RATIO", "0.02"))
+
+# --- Rule-based pre-judge (clear PASS/FAIL skips the LLM judge) ---
+RULE_JUDGE = os.getenv("RULE_JUDGE", "1") == "1"
+RULE_JUDGE_MIN_SKILL_GROUNDING = float(os.getenv("RULE_JUDGE_MIN_SKILL_GROUNDING", "1.0"))
+
+# --- Resume extraction: "single" (one ResumeData call) or "sectioned" (concurrent per-section calls) ---
+RESUME_EXTRACTION_MODE = os.getenv("RESUME_EXTRACTION_MODE", "single")
+
+# --- Map-reduce extraction for long documents (overlapping page windows) ---
+CHUNK_MIN_PAGES = int(os.getenv("CHUNK_MIN_PAGES", "8"))
+CHUNK_MIN_TOKENS = int(os.getenv("CHUNK_MIN_TOKENS", "12000"))
+CHUNK_PAGES = int(os.getenv("CHUNK_PAGES", "4"))
+CHUNK_OVERLAP_PAGES = int(os.getenv("CHUNK_OVERLAP_PAGES", "1"))
+
+# --- LLM response cache for parse/judge calls (set LLM_CACHE_PATH="" to disable) ---
+LLM_CACHE_PATH = os.getenv("LLM_CACHE_PATH", ".cache/llm.sqlite")
+LLM_CACHE_MAX_ROWS = int(os.getenv("LLM_CACHE_MAX_ROWS", "100000"))
+LLM_CACHE_MAX_AGE_DAYS = float(os.getenv("LLM_CACHE_MAX_AGE_DAYS", "30"))
+
+# --- Near-duplicate detection over compacted markdown (opt-in: the index stores document text) ---
+DEDUP_INDEX_PATH = os.getenv("DEDUP_INDEX_PATH", "")
+DEDUP_THRESHOLD = float(os.getenv("DEDUP_THRESHOLD", "0.9"))
+# "patch": carry the changed words into the earlier extraction (else parse); "reuse": take it as is
+DEDUP_ACTION = os.getenv("DEDUP_ACTION", "patch")
+DEDUP_NUM_PERM = int(os.getenv("DEDUP_NUM_PERM", "128"))
+DEDUP_SHINGLE_WORDS = int(os.getenv("DEDUP_SHINGLE_WORDS", "5"))
+
+# --- Batch output: records buffered per JSONL append / Parquet file ---
+SINK_BUFFER_ROWS = int(os.getenv("SINK_BUFFER_ROWS", "200"))
+
+# --- HTTP service (service.py): worker pool, bounded queue, deadlines ---
+SERVICE_WORKERS = int(os.getenv("SERVICE_WORKERS", "8"))
+SERVICE_QUEUE_SIZE = int(os.getenv("SERVICE_QUEUE_SIZE", "100"))
+SERVICE_DEADLINE_SECONDS = float(os.getenv("SERVICE_DEADLINE_SECONDS", "600"))
+SERVICE_JOB_TTL_SECONDS = float(os.getenv("SERVICE_JOB_TTL_SECONDS", "3600"))
+SERVICE_MAX_UPLOAD_BYTES = int(os.getenv("SERVICE_MAX_UPLOAD_BYTES", str(20 * 1024 * 1024)))
+
+# --- Multi-process work queue (worker.py): SQLite file, lease length, attempts per job ---
+JOBQUEUE_PATH = os.getenv("JOBQUEUE_PATH", ".cache/jobs.sqlite")
+JOBQUEUE_LEASE_SECONDS = float(os.getenv("JOBQUEUE_LEASE_SECONDS", "300"))
+JOBQUEUE_MAX_ATTEMPTS = int(os.getenv("JOBQUEUE_MAX_ATTEMPTS", "3"))
+# WAL for a local file; DELETE when the queue lives on NFS/SMB shared storage
+JOBQUEUE_JOURNAL_MODE = os.getenv("JOBQUEUE_JOURNAL_MODE", "WAL")
+
+# --- Resume <-> JD matching (src/matching.py): score weights, results per JD, JDs scored per block ---
+MATCH_MANDATORY_WEIGHT = float(os.getenv("MATCH_MANDATORY_WEIGHT", "0.8"))
+MATCH_OPTIONAL_WEIGHT = float(os.getenv("MATCH_OPTIONAL_WEIGHT", "0.2"))
+MATCH_TOP_K = int(os.getenv("MATCH_TOP_K", "20"))
+MATCH_JD_BLOCK = int(os.getenv("MATCH_JD_BLOCK", "128"))
+
+# --- Cost estimates for --profile: USD per 1M tokens (input, output) and per 1000 OCR pages ---
+MODEL_PRICES = {
+    "mistralai/ministral-14b-2512": (0.20, 0.20),
+    "microsoft/phi-4": (0.06, 0.14),
+}
+OCR_PRICE_PER_1K_PAGES = float(os.getenv("OCR_PRICE_PER_1K_PAGES", "1.0"))
+
+# --- HTTP connection pools (one per provider, shared process-wide) ---
+HTTP_MAX_CONNECTIONS = int(os.getenv("HTTP_MAX_CONNECTIONS", "100"))
+HTTP_MAX_KEEPALIVE_CONNECTIONS = int(os.getenv("HTTP_MAX_KEEPALIVE_CONNECTIONS", "20"))
+HTTP_KEEPALIVE_EXPIRY = float(os.getenv("HTTP_KEEPALIVE_EXPIRY", "60"))
+HTTP_TIMEOUT = float(os.getenv("HTTP_TIMEOUT", "300"))
+
+# --- Rate limiting: one limiter per (provider, model or route), shared process-wide (RATE_LIMIT=0 disables) ---
+RATE_LIMIT = os.getenv("RATE_LIMIT", "1") == "1"
+RATE_LIMITS = {
+    "openrouter": {
+        "rps": float(os.getenv("OPENROUTER_RPS", "20")),
+        "tpm": float(os.getenv("OPENROUTER_TPM", "0")),  # 0 = no tokens/min limit
+    },
+    "mistral": {
+        "rps": float(os.getenv("MISTRAL_RPS", "6")),
+        "tpm": 0,
+    },
+}
+RATE_LIMIT_CONCURRENCY_INITIAL = int(os.getenv("RATE_LIMIT_CONCURRENCY_INITIAL", "8"))
+RATE_LIMIT_CONCURRENCY_MAX = int(os.getenv("RATE_LIMIT_CONCURRENCY_MAX", "64"))
+RATE_LIMIT_MAX_RETRIES = int(os.getenv("RATE_LIMIT_MAX_RETRIES", "6"))
+RATE_LIMIT_BACKOFF_BASE = float(os.getenv("RATE_LIMIT_BACKOFF_BASE", "0.5"))
+RATE_LIMIT_BACKOFF_MAX = float(os.getenv("RATE_LIMIT_BACKOFF_MAX", "60"))
+
+
+def _pool_limits() -> httpx.Limits:
+    return httpx.Limits(
+        max_connections=HTTP_MAX_CONNECTIONS,
+        max_keepalive_connections=HTTP_MAX_KEEPALIVE_CONNECTIONS,
+        keepalive_expiry=HTTP_KEEPALIVE_EXPIRY,
+    )
+
+
+@lru_cache(maxsize=None)
+def get_http_client(provider: str) -> httpx.Client:
+    """Keep-alive HTTP client shared by every sync call to `provider`."""
+    transport = httpx.HTTPTransport(limits=_pool_limits())
+    if RATE_LIMIT:
+        from src.ratelimit import RateLimitedTransport
+
+        transport = RateLimitedTransport(provider, transport)
+    return httpx.Client(transport=transport, timeout=HTTP_TIMEOUT)
+
+
+@lru_cache(maxsize=None)
+def get_async_http_client(provider: str) -> httpx.AsyncClient:
+    """Keep-alive async HTTP client shared by every async call to `provider`.
+
+    Bound to the first event loop that uses it, which is fine for our entry
+    points (one loop per process).
+    """
+    transport = httpx.AsyncHTTPTransport(limits=_pool_limits())
+    if RATE_LIMIT:
+        from src.ratelimit import AsyncRateLimitedTransport
+
+        transport = AsyncRateLimitedTransport(provider, transport)
+    return httpx.AsyncClient(transport=transport, timeout=HTTP_TIMEOUT)
+
+
+@lru_cache(maxsize=1)
 def get_mistral_client() -> Mistral:
-    return Mistral(api_key=MISTRAL_API_KEY)
+    return Mistral(
+        api_key=MISTRAL_API_KEY,
+        server_url=MISTRAL_SERVER_URL,
+        client=get_http_client("mistral"),
+        async_client=get_async_http_client("mistral"),
+    )
 
 
+@lru_cache(maxsize=1)
 def get_extraction_llm() -> ChatOpenAI:
     return ChatOpenAI(
-        base_url="https://openrouter.ai/api/v1",
+        base_url=OPENROUTER_BASE_URL,
         api_key=OPENROUTER_API_KEY,
         model="mistralai/ministral-14b-2512",
+        http_client=get_http_client("openrouter"),
+        http_async_client=get_async_http_client("openrouter"),
+        # Retries happen in the rate-limited transport; don't stack the SDK's on top
+        max_retries=0 if RATE_LIMIT else None,
     )
 
 
+@lru_cache(maxsize=1)
 def get_judge_llm() -> ChatOpenAI:
     return ChatOpenAI(
-        base_url="https://openrouter.ai/api/v1",
+        base_url=OPENROUTER_BASE_URL,
         api_key=OPENROUTER_API_KEY,
         model="microsoft/phi-4",
+        http_client=get_http_client("openrouter"),
+        http_async_client=get_async_http_client("openrouter"),
+        # Retries happen in the rate-limited transport; don't stack the SDK's on top
+        max_retries=0 if RATE_LIMIT else None,
     )
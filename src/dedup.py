@@ -0,0 +1,319 @@
+"""
+Near-duplicate detection over compacted OCR markdown.
+
+Each document is reduced to word shingles (DEDUP_SHINGLE_WORDS words) and a
+MinHash signature of DEDUP_NUM_PERM permutations. Signatures are split into
+LSH bands persisted in SQLite (DEDUP_INDEX_PATH), so a lookup only compares
+against documents that share at least one band. Candidates are then checked
+with the exact shingle Jaccard similarity against DEDUP_THRESHOLD.
+
+Only extractions that passed the judge are indexed, and only for the current
+pipeline version. A byte-identical document takes the earlier extraction and
+its verdict. Any other match is used according to DEDUP_ACTION, and the
+result still goes through the judge (derived fields such as is_current_role
+or first_name are not patched along):
+
+- "reuse": the earlier extraction is returned unchanged
+- "patch": the words that changed between the two documents are carried into
+  the earlier extraction (a new phone number, a corrected date string). If a
+  change cannot be mapped onto an extracted value, or new content appeared,
+  the document is parsed normally.
+"""
+
+import difflib
+import hashlib
+import json
+import re
+import sqlite3
+import threading
+import time
+import zlib
+from functools import lru_cache
+from pathlib import Path
+
+import numpy as np
+from pydantic import BaseModel
+
+from src.config import (
+    DEDUP_INDEX_PATH,
+    DEDUP_THRESHOLD,
+    DEDUP_ACTION,
+    DEDUP_NUM_PERM,
+    DEDUP_SHINGLE_WORDS,
+)
+from src.validation_models.jd import JobDescription
+from src.validation_models.resume import ResumeData
+
+MODELS = {"resume": ResumeData, "jd": JobDescription}
+
+# Universal hashing (a * x + b) mod p over 32-bit shingle hashes; a, b < 2^32 keep a * x + b inside uint64
+MERSENNE_PRIME = np.uint64((1 << 61) - 1)
+_rng = np.random.RandomState(20261018)
+_A = _rng.randint(1, 1 << 32, size=DEDUP_NUM_PERM, dtype=np.uint64)
+_B = _rng.randint(0, 1 << 31, size=DEDUP_NUM_PERM, dtype=np.uint64)
+
+WORD = re.compile(r"\w+")
+
+
+############## MinHash + LSH #####################
+
+def shingles(markdown: str, words: int = DEDUP_SHINGLE_WORDS) -> np.ndarray:
+    """Sorted unique 32-bit hashes of the document's word n-grams."""
+    tokens = WORD.findall(markdown.lower())
+    if len(tokens) < words:
+        grams = [" ".join(tokens)]
+    else:
+        grams = (" ".join(tokens[i:i + words]) for i in range(len(tokens) - words + 1))
+    return np.unique(np.fromiter((zlib.crc32(g.encode("utf-8")) for g in grams), dtype=np.uint64))
+
+
+def minhash(hashes: np.ndarray) -> np.ndarray:
+    """One minimum per permutation over all shingles: (DEDUP_NUM_PERM,) uint64."""
+    return ((np.outer(hashes, _A) + _B) % MERSENNE_PRIME).min(axis=0)
+
+
+def jaccard(a: np.ndarray, b: np.ndarray) -> float:
+    union = len(np.union1d(a, b))
+    return len(np.intersect1d(a, b, assume_unique=True)) / union if union else 1.0
+
+
+def lsh_bands(num_perm: int, threshold: float) -> tuple[int, int]:
+    """(bands, rows) whose S-curve midpoint (1/b)^(1/r) sits just below the threshold.
+
+    Erring low lets more candidates through; the exact Jaccard check drops the extras.
+    """
+    options = [(num_perm // r, r) for r in range(1, num_perm + 1) if num_perm % r == 0]
+    below = [(b, r) for b, r in options if (1 / b) ** (1 / r) <= threshold]
+    return min(below or options, key=lambda br: abs(threshold - (1 / br[0]) ** (1 / br[1])))
+
+
+def band_keys(signature: np.ndarray, bands: int, rows: int) -> list[tuple[int, int]]:
+    return [
+        (band, int.from_bytes(hashlib.blake2b(signature[band * rows:(band + 1) * rows].tobytes(),
+                                              digest_size=8).digest(), "big", signed=True))
+        for band in range(bands)
+    ]
+
+
+class DedupIndex:
+    def __init__(self, path: str, threshold: float, num_perm: int = DEDUP_NUM_PERM):
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self.threshold = threshold
+        self.bands, self.rows = lsh_bands(num_perm, threshold)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS documents (
+                id INTEGER PRIMARY KEY,
+                kind TEXT NOT NULL,
+                version TEXT NOT NULL,
+                label TEXT,
+                markdown_sha TEXT NOT NULL,
+                markdown TEXT NOT NULL,
+                data TEXT NOT NULL,
+                created REAL NOT NULL,
+                UNIQUE (kind, version, markdown_sha)
+            )"""
+        )
+        # Band layout is part of the key, so changing the threshold starts a fresh set of buckets
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS buckets (
+                kind TEXT NOT NULL,
+                layout TEXT NOT NULL,
+                band INTEGER NOT NULL,
+                key INTEGER NOT NULL,
+                doc_id INTEGER NOT NULL
+            )"""
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS buckets_lookup ON buckets (kind, layout, band, key)")
+        self._conn.commit()
+
+    @property
+    def _layout(self) -> str:
+        return f"{self.bands}x{self.rows}"
+
+    def add(self, kind: str, version: str, label: str | None, markdown: str, data: BaseModel):
+        keys = band_keys(minhash(shingles(markdown)), self.bands, self.rows)
+        sha = hashlib.sha256(markdown.encode("utf-8")).hexdigest()
+        with self._lock:
+            cursor = self._conn.execute(
+                "INSERT OR IGNORE INTO documents (kind, version, label, markdown_sha, markdown, data, created)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (kind, version, label, sha, markdown, data.model_dump_json(), time.time()),
+            )
+            if cursor.rowcount:
+                self._conn.executemany(
+                    "INSERT INTO buckets (kind, layout, band, key, doc_id) VALUES (?, ?, ?, ?, ?)",
+                    [(kind, self._layout, band, key, cursor.lastrowid) for band, key in keys],
+                )
+            self._conn.commit()
+
+    def find(self, kind: str, version: str, markdown: str) -> dict | None:
+        """Most similar indexed document at or above the threshold, or None."""
+        hashes = shingles(markdown)
+        keys = band_keys(minhash(hashes), self.bands, self.rows)
+        with self._lock:
+            ids = {row[0] for band, key in keys for row in self._conn.execute(
+                "SELECT doc_id FROM buckets WHERE kind = ? AND layout = ? AND band = ? AND key = ?",
+                (kind, self._layout, band, key),
+            )}
+            rows = self._conn.execute(
+                f"SELECT id, label, markdown, data FROM documents WHERE version = ? AND id IN ({','.join('?' * len(ids))})",
+                (version, *ids),
+            ).fetchall() if ids else []
+
+        best = None
+        for doc_id, label, old_markdown, data in rows:
+            similarity = jaccard(hashes, shingles(old_markdown))
+            if similarity >= self.threshold and (best is None or similarity > best["similarity"]):
+                best = {"id": doc_id, "label": label, "similarity": round(similarity, 4),
+                        "markdown": old_markdown, "data": json.loads(data)}
+        return best
+
+
+@lru_cache(maxsize=1)
+def get_dedup_index() -> DedupIndex | None:
+    return DedupIndex(DEDUP_INDEX_PATH, DEDUP_THRESHOLD) if DEDUP_INDEX_PATH else None
+
+
+@lru_cache(maxsize=1)
+def _version() -> str:
+    from src.manifest import pipeline_version
+
+    return pipeline_version()
+
+
+# Lookups by outcome: reused / patched extraction, match that could not be patched, no match
+_counts = {"reused": 0, "patched": 0, "unpatchable": 0, "new": 0}
+_counts_lock = threading.Lock()
+
+
+def _count(outcome: str):
+    with _counts_lock:
+        _counts[outcome] += 1
+
+
+def dedup_stats() -> dict:
+    with _counts_lock:
+        return dict(_counts)
+
+
+############## Patch #####################
+
+def _normalize(text: str) -> str:
+    return re.sub(r"\s+", " ", text.lower()).strip()
+
+
+def _word_changes(old_line: str, new_line: str) -> list[tuple[str, str]] | None:
+    """(old, new) word runs replaced within a line; None if words were only added."""
+    old_words, new_words = old_line.split(), new_line.split()
+    changes = []
+    for tag, i1, i2, j1, j2 in difflib.SequenceMatcher(None, old_words, new_words, autojunk=False).get_opcodes():
+        if tag == "insert":
+            return None
+        if tag == "replace":
+            old, new = " ".join(old_words[i1:i2]), " ".join(new_words[j1:j2])
+            # Punctuation / case only: nothing to carry over
+            if WORD.findall(old.lower()) != WORD.findall(new.lower()):
+                changes.append((old, new))
+    return changes
+
+
+def _line_changes(old_markdown: str, new_markdown: str) -> list[tuple[str, str, str, str]] | None:
+    """(old line, new line, old words, new words) per change; None when content was added."""
+    old_lines = [line for line in old_markdown.splitlines() if line.strip()]
+    new_lines = [line for line in new_markdown.splitlines() if line.strip()]
+    changes = []
+    for tag, i1, i2, j1, j2 in difflib.SequenceMatcher(None, old_lines, new_lines, autojunk=False).get_opcodes():
+        if tag == "insert" or (tag == "replace" and i2 - i1 != j2 - j1):
+            return None
+        if tag != "replace":
+            # Deleted lines are fine as long as nothing extracted came from them (checked below)
+            continue
+        for old_line, new_line in zip(old_lines[i1:i2], new_lines[j1:j2]):
+            words = _word_changes(old_line, new_line)
+            if words is None:
+                return None
+            changes += [(old_line, new_line, old, new) for old, new in words]
+    return changes
+
+
+def patch_extraction(kind: str, old_markdown: str, new_markdown: str, data: dict) -> BaseModel | None:
+    """Carry the edits between two near-identical documents into the earlier extraction.
+
+    Every changed word run must land in at least one extracted string whose
+    old value sat on the changed line, and every extracted string that was
+    grounded in the old markdown must still be grounded in the new one.
+    Anything else returns None, and the document is parsed normally.
+    """
+    changes = _line_changes(old_markdown, new_markdown)
+    if changes is None:
+        return None
+    applied = [False] * len(changes)
+
+    def patch(value):
+        if isinstance(value, dict):
+            return {k: patch(v) for k, v in value.items()}
+        if isinstance(value, list):
+            return [patch(v) for v in value]
+        if not isinstance(value, str):
+            return value
+        patched = value
+        for i, (old_line, new_line, old, new) in enumerate(changes):
+            if old in patched and value in old_line:
+                candidate = patched.replace(old, new)
+                if candidate in new_line:
+                    patched = candidate
+                    applied[i] = True
+        return patched
+
+    patched = patch(data)
+    if not all(applied):
+        return None
+
+    old_text, new_text = _normalize(old_markdown), _normalize(new_markdown)
+
+    def grounded(value) -> bool:
+        if isinstance(value, dict):
+            return all(grounded(v) for v in value.values())
+        if isinstance(value, list):
+            return all(grounded(v) for v in value)
+        if isinstance(value, str) and _normalize(value) in old_text:
+            return _normalize(value) in new_text
+        return True
+
+    if not grounded(patched):
+        return None
+    return MODELS[kind].model_validate(patched)
+
+
+############## Pipeline entry points #####################
+
+def find_duplicate(source: str, markdown: str) -> tuple[dict, BaseModel] | None:
+    """(match record, extraction) for a near-duplicate of an indexed PASS, or None."""
+    index = get_dedup_index()
+    if index is None:
+        return None
+    match = index.find(source, _version(), markdown)
+    if match is None:
+        _count("new")
+        return None
+
+    identical = match["markdown"] == markdown
+    record = {"document": match["label"], "similarity": match["similarity"], "action": "reuse", "identical": identical}
+    if DEDUP_ACTION == "reuse" or identical:
+        _count("reused")
+        return record, MODELS[source].model_validate(match["data"])
+    data = patch_extraction(source, match["markdown"], markdown, match["data"])
+    if data is None:
+        _count("unpatchable")
+        return None
+    _count("patched")
+    return {**record, "action": "patch"}, data
+
+
+def index_extraction(source: str, label: str | None, markdown: str, data: BaseModel):
+    index = get_dedup_index()
+    if index is not None:
+        index.add(source, _version(), label, markdown, data)
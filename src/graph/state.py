@@ -8,15 +8,69 @@ from src.validation_models.jd import JobDescription
 class GraphState(TypedDict):
     # --- Inputs (set at invocation) ---
     mode: str  # "resume_only" | "jd_only" | "both"
-    reflection_loop: int
+    reflection_loop: int  # judge passes over the whole run
+    # Judge passes per branch; each branch is retried independently
+    resume_reflection_loop: int
+    jd_reflection_loop: int
     resume_file_path: Optional[str]
     jd_file_path: Optional[str]
-    # --- Intermediate: OCR markdown ---
+    # In-memory uploads (e.g. from the UI); take precedence over the file paths
+    resume_file_name: Optional[str]
+    resume_file_bytes: Optional[bytes]
+    jd_file_name: Optional[str]
+    jd_file_bytes: Optional[bytes]
+    # --- Intermediate: OCR pages (compacted in place by compact_*) + compacted markdown ---
+    resume_pages: Optional[list[str]]
+    jd_pages: Optional[list[str]]
     resume_markdown: Optional[str]
     jd_markdown: Optional[str]
+    # Each entry: {"source": ..., "tokens_before": ..., "tokens_after": ..., "tokens_saved": ..., "saved_pct": ...}
+    compaction_stats: Annotated[list[dict], operator.add]
     # --- Extraction results ---
     resume_data: ResumeData | None
     jd_data: JobDescription | None
+    # Set when the extraction came from a near-duplicate (src/dedup.py):
+    # {"document": ..., "similarity": ..., "action": "reuse"|"patch", "identical": bool}
+    resume_duplicate_of: Optional[dict]
+    jd_duplicate_of: Optional[dict]
     # --- Judge results (reducer for parallel merge) ---
-    # Each entry: {"source": "resume"|"jd", "grade": "Pass"|"Fail", "summary": "..."}
+    # Each entry: {"source": "resume"|"jd", "grade": "Pass"|"Fail", "summary": "...", "judge": "rules"|"llm"|"dedup"}
     judge_results: Annotated[list[dict], operator.add]
+    # --- Judge feedback for the next re-parse (None once the source passes) ---
+    resume_feedback: Optional[str]
+    jd_feedback: Optional[str]
+
+
+def initial_state(mode: str, resume_file_path: str | None = None, jd_file_path: str | None = None,
+                  resume_upload: tuple[str, bytes] | None = None,
+                  jd_upload: tuple[str, bytes] | None = None) -> GraphState:
+    """Build the invocation state for a run in the given mode.
+
+    Documents come from disk (`*_file_path`) or memory (`*_upload` as (file name, bytes)).
+    """
+    resume_name, resume_bytes = resume_upload or (None, None)
+    jd_name, jd_bytes = jd_upload or (None, None)
+    return {
+        "mode": mode,
+        "reflection_loop": 0,
+        "resume_reflection_loop": 0,
+        "jd_reflection_loop": 0,
+        "resume_file_path": resume_file_path,
+        "jd_file_path": jd_file_path,
+        "resume_file_name": resume_name,
+        "resume_file_bytes": resume_bytes,
+        "jd_file_name": jd_name,
+        "jd_file_bytes": jd_bytes,
+        "resume_pages": None,
+        "jd_pages": None,
+        "resume_markdown": None,
+        "jd_markdown": None,
+        "compaction_stats": [],
+        "resume_data": None,
+        "jd_data": None,
+        "resume_duplicate_of": None,
+        "jd_duplicate_of": None,
+        "judge_results": [],
+        "resume_feedback": None,
+        "jd_feedback": None,
+    }
@@ -1,8 +1,9 @@
+import asyncio
+from functools import lru_cache
+
 from langgraph.graph import StateGraph, START, END
 from langgraph.types import Send
-from PIL import Image
-from langchain_core.runnables.graph import MermaidDrawMethod
-import io
+from langchain_core.runnables import RunnableLambda
 
 from src.graph.state import GraphState
 
@@ -27,23 +28,142 @@ def router_node(state:GraphState) -> dict:
 
     return {}
 
+################# OCR (shared by both branches) #####################
+
+def _ocr(state: GraphState, source: str) -> list[str]:
+    """Pages of the source document: in-memory upload if present, else the file on disk."""
+    from src.ocr import ocr_document, ocr_file
+
+    if state.get(f"{source}_file_bytes") is not None:
+        return ocr_document(state[f"{source}_file_bytes"], state[f"{source}_file_name"])
+    return ocr_file(state[f"{source}_file_path"])
+
+
+async def _aocr(state: GraphState, source: str) -> list[str]:
+    from src.ocr import aocr_document, aocr_file
+
+    if state.get(f"{source}_file_bytes") is not None:
+        return await aocr_document(state[f"{source}_file_bytes"], state[f"{source}_file_name"])
+    return await aocr_file(state[f"{source}_file_path"])
+
+################# Compaction (shared by both branches) #####################
+
+def _compact(state: GraphState, source: str) -> dict:
+    """Deterministic OCR markdown clean-up; both the parser and the judge read its output."""
+    from src.compact import compact_markdown
+
+    pages, markdown, stats = compact_markdown(state[f"{source}_pages"])
+    return {
+        f"{source}_pages": pages,
+        f"{source}_markdown": markdown,
+        "compaction_stats": [{"source": source, **stats}],
+    }
+
+################# Parsing (shared by both branches) #####################
+
+# Prompt variable holding the markdown in each extraction chain
+MARKDOWN_INPUTS = {"resume": "resume_markdown", "jd": "job_description_markdown"}
+
+
+def _parse_inputs(state: GraphState, source: str) -> list[dict]:
+    """One chain input per extraction window (a single one unless the document is long)."""
+    from src.chains.correction import correction_messages
+    from src.map_reduce import extraction_windows
+
+    correction = correction_messages(state.get(f"{source}_feedback"))
+    return [
+        {MARKDOWN_INPUTS[source]: text, "correction": correction}
+        for text in extraction_windows(state.get(f"{source}_pages"), state[f"{source}_markdown"])
+    ]
+
+
+def _parse(state: GraphState, source: str, chain):
+    from src.map_reduce import failed_windows, merge_extractions
+
+    inputs = _parse_inputs(state, source)
+    if len(inputs) == 1:
+        return chain.invoke(inputs[0])
+    results = chain.batch(inputs, return_exceptions=True)
+    if failed := failed_windows(results):
+        # One more pass for the failed windows before the document is failed
+        retried = chain.batch([inputs[i] for i in failed], return_exceptions=True)
+        for i, result in zip(failed, retried):
+            results[i] = result
+    return merge_extractions(source, results, len(state[f"{source}_pages"]))
+
+
+async def _aparse(state: GraphState, source: str, chain):
+    from src.map_reduce import failed_windows, merge_extractions
+
+    inputs = _parse_inputs(state, source)
+    if len(inputs) == 1:
+        return await chain.ainvoke(inputs[0])
+    results = await chain.abatch(inputs, return_exceptions=True)
+    if failed := failed_windows(results):
+        retried = await chain.abatch([inputs[i] for i in failed], return_exceptions=True)
+        for i, result in zip(failed, retried):
+            results[i] = result
+    return merge_extractions(source, results, len(state[f"{source}_pages"]))
+
+
+def _duplicate_update(source: str, found: tuple | None) -> dict | None:
+    if found is None:
+        return None
+    match, data = found
+    return {f"{source}_data": data, f"{source}_duplicate_of": match}
+
+
+def _near_duplicate(state: GraphState, source: str) -> dict | None:
+    """First pass only: the earlier extraction of a near-duplicate document, reused or patched."""
+    from src.config import DEDUP_INDEX_PATH
+    from src.dedup import find_duplicate
+
+    if not DEDUP_INDEX_PATH or state[f"{source}_reflection_loop"] > 0:
+        return None
+    return _duplicate_update(source, find_duplicate(source, state[f"{source}_markdown"]))
+
+
+async def _anear_duplicate(state: GraphState, source: str) -> dict | None:
+    """Async _near_duplicate(); the MinHash and SQLite lookup run in a worker thread."""
+    from src.config import DEDUP_INDEX_PATH
+    from src.dedup import find_duplicate
+
+    if not DEDUP_INDEX_PATH or state[f"{source}_reflection_loop"] > 0:
+        return None
+    return _duplicate_update(source, await asyncio.to_thread(find_duplicate, source, state[f"{source}_markdown"]))
+
+
+def _document_label(state: GraphState, source: str) -> str | None:
+    return state.get(f"{source}_file_path") or state.get(f"{source}_file_name")
+
 ########## Resume Branch Nodes #########
 
 def ocr_resume(state: GraphState) -> dict:
-    from src.ocr import upload_file, get_ocr_response
+    return {"resume_pages": _ocr(state, "resume")}
+
+
+async def aocr_resume(state: GraphState) -> dict:
+    return {"resume_pages": await _aocr(state, "resume")}
+
 
-    url = upload_file(state["resume_file_path"])
-    ocr_response = get_ocr_response(url)
-    markdown = " ".join(page.markdown for page in ocr_response.pages)
-    return {"resume_markdown": markdown}
+def compact_resume(state: GraphState) -> dict:
+    return _compact(state, "resume")
 
 
 def parse_resume(state: GraphState) -> dict:
     from src.chains.resume_chain import get_resume_chain
 
-    chain = get_resume_chain()
-    result = chain.invoke({"resume_markdown": state["resume_markdown"]})
-    return {"resume_data": result}
+    if (duplicate := _near_duplicate(state, "resume")) is not None:
+        return duplicate
+    return {"resume_data": _parse(state, "resume", get_resume_chain())}
+
+
+async def aparse_resume(state: GraphState) -> dict:
+    from src.chains.resume_chain import get_resume_chain
+
+    if (duplicate := await _anear_duplicate(state, "resume")) is not None:
+        return duplicate
+    return {"resume_data": await _aparse(state, "resume", get_resume_chain())}
 
 #####################################################
 
@@ -65,134 +185,241 @@ def parse_resume(state: GraphState) -> dict:
 ############## JD Branch Nodes #####################
 
 def ocr_jd(state: GraphState) -> dict:
-    from src.ocr import upload_file, get_ocr_response
+    return {"jd_pages": _ocr(state, "jd")}
 
-    url = upload_file(state["jd_file_path"])
-    ocr_response = get_ocr_response(url)
-    markdown = " ".join(page.markdown for page in ocr_response.pages)
-    return {"jd_markdown": markdown}
+
+async def aocr_jd(state: GraphState) -> dict:
+    return {"jd_pages": await _aocr(state, "jd")}
+
+
+def compact_jd(state: GraphState) -> dict:
+    return _compact(state, "jd")
 
 
 def parse_jd(state: GraphState) -> dict:
     from src.chains.jd_chain import get_jd_chain
 
-    chain = get_jd_chain()
-    result = chain.invoke({"job_description_markdown": state["jd_markdown"]})
-    return {"jd_data": result}
+    if (duplicate := _near_duplicate(state, "jd")) is not None:
+        return duplicate
+    return {"jd_data": _parse(state, "jd", get_jd_chain())}
+
+
+async def aparse_jd(state: GraphState) -> dict:
+    from src.chains.jd_chain import get_jd_chain
+
+    if (duplicate := await _anear_duplicate(state, "jd")) is not None:
+        return duplicate
+    return {"jd_data": await _aparse(state, "jd", get_jd_chain())}
 #################################################################
 
-def llm_as_judge(state: GraphState) -> dict:
-    from src.chains.judge_chain import get_judge_chain
+# Re-parses allowed per source after a judge FAIL
+MAX_REFLECTIONS = 1
 
-    chain = get_judge_chain()
-
-    new_loop = state["reflection_loop"] + 1
-
-    if state['mode'] == 'resume_only':
-        result = chain.invoke({
-            "markdown": state["resume_markdown"],
-            "jsondata": state["resume_data"].model_dump_json(indent=4),
-        })
-        return {
-            "reflection_loop": new_loop,
-            "judge_results": [
-                {"source": "resume", "grade": result.grade, "summary": result.grade_summary}
-            ]
-        }
-    elif state['mode'] == 'jd_only':
-        result = chain.invoke({
-            "markdown": state["jd_markdown"],
-            "jsondata": state["jd_data"].model_dump_json(indent=4),
-        })
-        return {
-            "reflection_loop": new_loop,
-            "judge_results": [
-                {"source": "jd", "grade": result.grade, "summary": result.grade_summary}
-            ]
-        }
-    else:
-        result_resume = chain.invoke({
-            "markdown": state["resume_markdown"],
-            "jsondata": state["resume_data"].model_dump_json(indent=4),
-        })
 
+def _mode_sources(state: GraphState) -> list[str]:
+    """Sources handled in this mode, in the order their results are reported."""
+    return {"resume_only": ["resume"], "jd_only": ["jd"]}.get(state["mode"], ["jd", "resume"])
 
-        result_jd = chain.invoke({
-            "markdown": state["jd_markdown"],
-            "jsondata": state["jd_data"].model_dump_json(indent=4),
-        })
-        return {
-            "reflection_loop": new_loop,
-            "judge_results": [
-                {"source": "jd", "grade": result_jd.grade, "summary": result_jd.grade_summary},
-                {"source": "resume", "grade": result_resume.grade, "summary": result_resume.grade_summary}
-            ]
-        }
 
+def _latest_grade(state: GraphState, source: str) -> str | None:
+    for jr in reversed(state["judge_results"]):
+        if jr["source"] == source:
+            return jr["grade"]
+    return None
 
 
-# --- Convergence ---
+def _judge_sources(state: GraphState) -> list[str]:
+    """Sources with a fresh extraction: never judged yet, or re-parsed after a FAIL.
 
-# def aggregate_results(state: GraphState) -> dict:
-#     """Convergence node. State already contains all results via reducers."""
-#     return {}
+    In "both" mode a retry of one branch must not re-judge the branch that passed.
+    """
+    return [
+        source for source in _mode_sources(state)
+        if state[f"{source}_reflection_loop"] == 0 or _latest_grade(state, source) == "FAIL"
+    ]
+
+
+def _judge_inputs(state: GraphState, source: str) -> dict:
+    return {
+        "markdown": state[f"{source}_markdown"],
+        "jsondata": state[f"{source}_data"].model_dump_json(indent=4),
+    }
+
+
+def _feedback(result) -> str | None:
+    """Judge summary to hand back to the parser on FAIL, None on PASS."""
+    return result.grade_summary if result.grade == "FAIL" else None
+
+
+def _judge_update(state: GraphState, results: dict, judged_by: dict[str, str]) -> dict:
+    """`judged_by` names the judge for sources not decided by the LLM ("rules", "dedup")."""
+    update = {
+        "reflection_loop": state["reflection_loop"] + 1,
+        "judge_results": [
+            {
+                "source": source,
+                "grade": result.grade,
+                "summary": result.grade_summary,
+                "judge": judged_by.get(source, "llm"),
+            }
+            for source, result in results.items()
+        ],
+    }
+    for source, result in results.items():
+        update[f"{source}_feedback"] = _feedback(result)
+        update[f"{source}_reflection_loop"] = state[f"{source}_reflection_loop"] + 1
+    return update
+
+
+def _to_index(state: GraphState, results: dict, judged_by: dict[str, str]) -> list[tuple]:
+    """index_extraction() arguments for the judged passes: near-duplicate candidates for later documents."""
+    from src.config import DEDUP_INDEX_PATH
+
+    if not DEDUP_INDEX_PATH:
+        return []
+    return [
+        (source, _document_label(state, source), state[f"{source}_markdown"], state[f"{source}_data"])
+        for source, result in results.items()
+        if result.grade.upper() == "PASS" and judged_by.get(source) != "dedup"
+    ]
+
+
+def _dedup_verdicts(state: GraphState, sources: list[str]) -> dict:
+    """Extractions reused for a byte-identical document inherit the earlier PASS.
+
+    Reused or patched extractions of merely similar documents are judged like
+    any other: a patch does not update derived fields.
+    """
+    from src.validation_models.judge import judgeJson
+
+    verdicts = {}
+    for source in sources:
+        match = state.get(f"{source}_duplicate_of")
+        if match and match.get("identical") and state[f"{source}_reflection_loop"] == 0:
+            verdicts[source] = judgeJson(
+                grade="PASS",
+                grade_summary=f"Identical to {match['document']}; earlier extraction reused.",
+            )
+    return verdicts
+
+
+def _rule_verdicts(state: GraphState, sources: list[str]) -> dict:
+    """Sources the deterministic pre-judge could decide on its own."""
+    from src.config import RULE_JUDGE
+    from src.rule_judge import rule_judge
+
+    if not RULE_JUDGE:
+        return {}
+    verdicts = {}
+    for source in sources:
+        verdict = rule_judge(source, state[f"{source}_markdown"], state[f"{source}_data"])
+        if verdict is not None:
+            verdicts[source] = verdict
+    return verdicts
+
+
+def _decided_verdicts(state: GraphState, sources: list[str]) -> tuple[dict, dict]:
+    """Verdicts that need no LLM call, and which judge gave each."""
+    deduped = _dedup_verdicts(state, sources)
+    ruled = _rule_verdicts(state, [source for source in sources if source not in deduped])
+    judged_by = {**dict.fromkeys(ruled, "rules"), **dict.fromkeys(deduped, "dedup")}
+    return {**deduped, **ruled}, judged_by
 
-def reflection_path(state: GraphState) -> str:
-    """Route based on judge verdict. Retry once on FAIL, then always end."""
 
-    if state['reflection_loop'] > 1:
-        return "end"
+def llm_as_judge(state: GraphState) -> dict:
+    """Judge every fresh extraction; the LLM calls for resume and JD run concurrently."""
+    from src.chains.judge_chain import get_judge_chain
+    from src.dedup import index_extraction
 
-    judge_results = state['judge_results']
-    print(judge_results)
+    sources = _judge_sources(state)
+    decided, judged_by = _decided_verdicts(state, sources)
+    pending = [source for source in sources if source not in decided]
 
-    # Get only the latest judge results (from the most recent pass)
-    if len(judge_results) == 1:
-        if judge_results[0]['grade'] == 'FAIL':
-            return judge_results[0]['source']
-        return "end"
+    llm_results = get_judge_chain().batch([_judge_inputs(state, source) for source in pending]) if pending else []
+    results = {**decided, **dict(zip(pending, llm_results))}
+    results = {source: results[source] for source in sources}
+    for args in _to_index(state, results, judged_by):
+        index_extraction(*args)
+    return _judge_update(state, results, judged_by)
+
+
+async def allm_as_judge(state: GraphState) -> dict:
+    from src.chains.judge_chain import get_judge_chain
+    from src.dedup import index_extraction
+
+    sources = _judge_sources(state)
+    decided, judged_by = _decided_verdicts(state, sources)
+    pending = [source for source in sources if source not in decided]
+
+    llm_results = await get_judge_chain().abatch([_judge_inputs(state, source) for source in pending]) if pending else []
+    results = {**decided, **dict(zip(pending, llm_results))}
+    results = {source: results[source] for source in sources}
+    for args in _to_index(state, results, judged_by):
+        await asyncio.to_thread(index_extraction, *args)
+    return _judge_update(state, results, judged_by)
 
-    elif len(judge_results) > 1:
-        # Check the last two entries (the most recent judge pass)
-        recent = judge_results[-2:]
-        if "FAIL" in [r['grade'] for r in recent]:
-            return "both"
-        return "end"
 
-    return "end"
-    
 
-        
+# --- Convergence ---
 
+# def aggregate_results(state: GraphState) -> dict:
+#     """Convergence node. State already contains all results via reducers."""
+#     return {}
 
+def reflection_path(state: GraphState) -> str | list[str]:
+    """Route based on judge verdicts, per source.
 
+    Each branch that FAILed and still has retries left re-enters at its own
+    parse step (reusing the OCR markdown in state, with the judge's summary as
+    correction context); a branch that passed is not redone. End when no
+    branch needs a retry.
+    """
+    retry = [
+        source for source in _mode_sources(state)
+        if _latest_grade(state, source) == "FAIL"
+        and state[f"{source}_reflection_loop"] <= MAX_REFLECTIONS
+    ]
+    return retry or "end"
 
 
 # --- Graph Builder ---
 
+@lru_cache(maxsize=1)
 def build_graph():
+    """Return the compiled pipeline graph.
+
+    Compiled once per process and shared: the compiled graph is stateless
+    between invocations, so every caller (UI, batch, threads, event loops)
+    can reuse it.
+    """
     graph = StateGraph(GraphState)
 
     # Add nodes
+    # Each node carries a sync and an async implementation, so the same compiled
+    # graph serves invoke()/stream() and ainvoke()/astream()
     graph.add_node("router_node",router_node)
-    graph.add_node("ocr_resume", ocr_resume)
-    graph.add_node("ocr_jd", ocr_jd)
-    graph.add_node("parse_resume", parse_resume)
-    graph.add_node("parse_jd", parse_jd)
-    graph.add_node("llm_as_judge", llm_as_judge)
+    graph.add_node("ocr_resume", RunnableLambda(ocr_resume, afunc=aocr_resume, name="ocr_resume"))
+    graph.add_node("ocr_jd", RunnableLambda(ocr_jd, afunc=aocr_jd, name="ocr_jd"))
+    graph.add_node("compact_resume", compact_resume)
+    graph.add_node("compact_jd", compact_jd)
+    graph.add_node("parse_resume", RunnableLambda(parse_resume, afunc=aparse_resume, name="parse_resume"))
+    graph.add_node("parse_jd", RunnableLambda(parse_jd, afunc=aparse_jd, name="parse_jd"))
+    graph.add_node("llm_as_judge", RunnableLambda(llm_as_judge, afunc=allm_as_judge, name="llm_as_judge"))
     #graph.add_node("judge_jd", judge_jd)
     #graph.add_node("aggregate_results", aggregate_results)
 
     # Routing from START
     graph.add_conditional_edges("router_node", route_inputs)
 
-    # Resume branch: ocr -> parse -> judge -> aggregate
-    graph.add_edge("ocr_resume", "parse_resume")
+    # Resume branch: ocr -> compact -> parse -> judge -> aggregate
+    graph.add_edge("ocr_resume", "compact_resume")
+    graph.add_edge("compact_resume", "parse_resume")
     graph.add_edge("parse_resume", "llm_as_judge")
     #graph.add_edge("judge_resume", "aggregate_results")
 
-    # JD branch: ocr -> parse -> judge -> aggregate
-    graph.add_edge("ocr_jd", "parse_jd")
+    # JD branch: ocr -> compact -> parse -> judge -> aggregate
+    graph.add_edge("ocr_jd", "compact_jd")
+    graph.add_edge("compact_jd", "parse_jd")
     graph.add_edge("parse_jd", "llm_as_judge")
     #graph.add_edge("judge_jd", "aggregate_results")
 
@@ -200,21 +427,36 @@ def build_graph():
     #graph.add_edge("llm_as_judge", END)
     graph.add_conditional_edges("llm_as_judge",reflection_path,
                                 {
-                                    "resume":"ocr_resume",
-                                    "jd":"ocr_jd",
-                                    "both":"router_node",
+                                    "resume":"parse_resume",
+                                    "jd":"parse_jd",
                                     "end":END
 
                                 })
     
     graph.set_entry_point("router_node")
-    app = graph.compile()
-    img = app.get_graph().draw_mermaid_png(draw_method=MermaidDrawMethod.API)
-    img = Image.open(io.BytesIO(img))
-    print(img.size)
-    img.save('D:\\Tvarah\\resume_extraction\\src\\graph.png')
     return graph.compile()
 
 
+def draw_graph(output_file: str):
+    """Write the graph diagram without touching the network.
+
+    `.mmd`/`.md` -> Mermaid source; `.png` -> rendered locally with Graphviz
+    (requires pygraphviz).
+    """
+    drawable = build_graph().get_graph()
+    if output_file.lower().endswith(".png"):
+        drawable.draw_png(output_file)
+    else:
+        with open(output_file, "w", encoding="utf-8") as f:
+            f.write(drawable.draw_mermaid())
+
+
 if __name__ == "__main__":
-    build_graph()
\ No newline at end of file
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Render the pipeline graph diagram (offline).")
+    parser.add_argument("--draw", default="graph.mmd", help="Output file: .mmd for Mermaid source, .png via Graphviz")
+    args = parser.parse_args()
+
+    draw_graph(args.draw)
+    print(f"Graph diagram written to: {args.draw}")
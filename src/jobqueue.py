@@ -0,0 +1,212 @@
+"""
+Durable work queue for running batch extraction across processes and hosts.
+
+Jobs live in one SQLite file (local, or on shared storage reachable by every
+worker). A worker claims jobs under a lease, renews the lease with heartbeats
+while the documents are in flight and completes them when done. A worker that
+crashes or loses its host simply stops heartbeating: once its leases expire,
+the jobs are handed to the next worker that asks. A job that keeps expiring or
+erroring is given up on after JOBQUEUE_MAX_ATTEMPTS claims.
+
+Every state change is a single transaction under `BEGIN IMMEDIATE`, so
+concurrent claims never hand the same job to two workers.
+"""
+
+import sqlite3
+import threading
+import time
+from pathlib import Path
+
+from src.config import JOBQUEUE_JOURNAL_MODE, JOBQUEUE_MAX_ATTEMPTS
+
+# queued -> leased -> done (PASS / FAIL) | queued again (ERROR, expired lease) | failed (out of attempts)
+STATUSES = ("queued", "leased", "done", "failed")
+
+
+class JobQueue:
+    def __init__(self, path: str, max_attempts: int = JOBQUEUE_MAX_ATTEMPTS):
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self.max_attempts = max_attempts
+        self._lock = threading.Lock()
+        # Autocommit mode: transactions are opened explicitly with BEGIN IMMEDIATE
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=60, isolation_level=None)
+        self._conn.row_factory = sqlite3.Row
+        # WAL does not work over network filesystems; use DELETE for shared storage
+        self._conn.execute(f"PRAGMA journal_mode={JOBQUEUE_JOURNAL_MODE}")
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS jobs (
+                id INTEGER PRIMARY KEY,
+                kind TEXT NOT NULL,
+                path TEXT NOT NULL,
+                sha256 TEXT NOT NULL,
+                version TEXT NOT NULL,
+                output TEXT NOT NULL,
+                status TEXT NOT NULL DEFAULT 'queued',
+                attempts INTEGER NOT NULL DEFAULT 0,
+                lease_owner TEXT,
+                lease_expires REAL,
+                verdict TEXT,
+                error TEXT,
+                enqueued REAL NOT NULL,
+                finished REAL,
+                UNIQUE (kind, sha256, version, output)
+            )"""
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS jobs_claim ON jobs (status, lease_expires)")
+
+    def _transaction(self):
+        return _Transaction(self._conn, self._lock)
+
+    def enqueue(self, kind: str, files: list[tuple[Path, str]], version: str, output: Path) -> tuple[int, list[dict]]:
+        """Add (path, sha256) pairs; content already queued or done for this
+        version and output folder is not added again. Returns the number added
+        and, for each file skipped, the job that already covers its content
+        (`file`, `id`, `path`, `status`), so every input maps to a result."""
+        now, output = time.time(), str(Path(output).resolve())
+        added, skipped = 0, []
+        with self._transaction() as conn:
+            for p, sha in files:
+                path = str(Path(p).resolve())
+                cursor = conn.execute(
+                    "INSERT OR IGNORE INTO jobs (kind, path, sha256, version, output, enqueued) VALUES (?, ?, ?, ?, ?, ?)",
+                    (kind, path, sha, version, output, now),
+                )
+                if cursor.rowcount:
+                    added += 1
+                    continue
+                existing = conn.execute(
+                    "SELECT id, path, status FROM jobs WHERE kind = ? AND sha256 = ? AND version = ? AND output = ?",
+                    (kind, sha, version, output),
+                ).fetchone()
+                skipped.append({"file": path, **dict(existing)})
+        return added, skipped
+
+    def claim(self, owner: str, limit: int, lease_seconds: float) -> list[dict]:
+        """Lease up to `limit` jobs to `owner`, oldest first, reclaiming expired leases."""
+        now = time.time()
+        with self._transaction() as conn:
+            # Expired leases that already used their last attempt are given up on
+            conn.execute(
+                "UPDATE jobs SET status = 'failed', verdict = 'ERROR', finished = ?, lease_owner = NULL,"
+                " error = COALESCE(error, 'lease expired') || ' (out of attempts)'"
+                " WHERE status = 'leased' AND lease_expires < ? AND attempts >= ?",
+                (now, now, self.max_attempts),
+            )
+            rows = conn.execute(
+                "SELECT id FROM jobs WHERE status = 'queued' OR (status = 'leased' AND lease_expires < ?)"
+                " ORDER BY id LIMIT ?",
+                (now, limit),
+            ).fetchall()
+            ids = [row["id"] for row in rows]
+            if not ids:
+                return []
+            marks = ",".join("?" * len(ids))
+            conn.execute(
+                f"UPDATE jobs SET status = 'leased', lease_owner = ?, lease_expires = ?, attempts = attempts + 1"
+                f" WHERE id IN ({marks})",
+                (owner, now + lease_seconds, *ids),
+            )
+            return [dict(row) for row in conn.execute(f"SELECT * FROM jobs WHERE id IN ({marks}) ORDER BY id", ids)]
+
+    def heartbeat(self, owner: str, ids: list[int], lease_seconds: float) -> set[int]:
+        """Extend the leases `owner` still holds; returns the ids it lost."""
+        if not ids:
+            return set()
+        marks = ",".join("?" * len(ids))
+        with self._transaction() as conn:
+            conn.execute(
+                f"UPDATE jobs SET lease_expires = ? WHERE lease_owner = ? AND status = 'leased' AND id IN ({marks})",
+                (time.time() + lease_seconds, owner, *ids),
+            )
+            held = conn.execute(
+                f"SELECT id FROM jobs WHERE lease_owner = ? AND status = 'leased' AND id IN ({marks})", (owner, *ids)
+            ).fetchall()
+        return set(ids) - {row["id"] for row in held}
+
+    def complete(self, owner: str, job_id: int, verdict: str, error: str | None = None) -> bool:
+        """Record a finished job. PASS/FAIL are final; an ERROR is retried until
+        the attempts run out. False if the lease was lost to another worker."""
+        with self._transaction() as conn:
+            row = conn.execute(
+                "SELECT attempts FROM jobs WHERE id = ? AND lease_owner = ? AND status = 'leased'", (job_id, owner)
+            ).fetchone()
+            if row is None:
+                return False
+            if verdict != "ERROR":
+                status = "done"
+            else:
+                status = "queued" if row["attempts"] < self.max_attempts else "failed"
+            conn.execute(
+                "UPDATE jobs SET status = ?, verdict = ?, error = ?, lease_owner = NULL, lease_expires = NULL,"
+                " finished = ? WHERE id = ?",
+                (status, verdict, error, time.time() if status != "queued" else None, job_id),
+            )
+            return True
+
+    def release(self, owner: str, ids: list[int]):
+        """Hand unfinished jobs back without spending an attempt (worker told to quit)."""
+        if not ids:
+            return
+        marks = ",".join("?" * len(ids))
+        with self._transaction() as conn:
+            conn.execute(
+                f"UPDATE jobs SET status = 'queued', lease_owner = NULL, lease_expires = NULL, attempts = attempts - 1"
+                f" WHERE lease_owner = ? AND status = 'leased' AND id IN ({marks})",
+                (owner, *ids),
+            )
+
+    def requeue_failed(self) -> int:
+        """Give jobs that ran out of attempts a fresh set."""
+        with self._transaction() as conn:
+            return conn.execute(
+                "UPDATE jobs SET status = 'queued', attempts = 0, finished = NULL WHERE status = 'failed'"
+            ).rowcount
+
+    def stats(self) -> dict:
+        now = time.time()
+        with self._lock:
+            counts = dict.fromkeys(STATUSES, 0)
+            for row in self._conn.execute("SELECT status, COUNT(*) AS n FROM jobs GROUP BY status"):
+                counts[row["status"]] = row["n"]
+            verdicts = {row["verdict"]: row["n"] for row in self._conn.execute(
+                "SELECT verdict, COUNT(*) AS n FROM jobs WHERE status IN ('done', 'failed') GROUP BY verdict"
+            )}
+            expired = self._conn.execute(
+                "SELECT COUNT(*) FROM jobs WHERE status = 'leased' AND lease_expires < ?", (now,)
+            ).fetchone()[0]
+            owners = {row["lease_owner"]: row["n"] for row in self._conn.execute(
+                "SELECT lease_owner, COUNT(*) AS n FROM jobs WHERE status = 'leased' AND lease_expires >= ?"
+                " GROUP BY lease_owner", (now,)
+            )}
+        return {**counts, "expired_leases": expired, "verdicts": verdicts, "workers": owners}
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+class _Transaction:
+    """`BEGIN IMMEDIATE` ... COMMIT/ROLLBACK under the queue's thread lock.
+
+    IMMEDIATE takes the write lock up front, so two processes claiming at
+    once serialize instead of both reading the same queued rows.
+    """
+
+    def __init__(self, conn: sqlite3.Connection, lock: threading.Lock):
+        self.conn = conn
+        self.lock = lock
+
+    def __enter__(self) -> sqlite3.Connection:
+        self.lock.acquire()
+        try:
+            self.conn.execute("BEGIN IMMEDIATE")
+        except BaseException:
+            self.lock.release()
+            raise
+        return self.conn
+
+    def __exit__(self, exc_type, exc, tb):
+        try:
+            self.conn.execute("ROLLBACK" if exc_type else "COMMIT")
+        finally:
+            self.lock.release()
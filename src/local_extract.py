@@ -0,0 +1,160 @@
+"""
+Local text extraction for born-digital documents.
+
+DOCX files and PDFs with a text layer are turned into markdown on the box;
+`extract_local()` returns None when the document has no usable text (scanned
+PDFs, image-only DOCX, garbled encodings) so the caller falls back to Mistral OCR.
+"""
+
+import io
+import re
+import unicodedata
+import zipfile
+from xml.etree import ElementTree
+
+try:
+    from pypdf import PdfReader
+except ImportError:  # PDFs then always go to remote OCR
+    PdfReader = None
+
+from src.config import LOCAL_MIN_CHARS_PER_PAGE, LOCAL_MAX_GARBAGE_RATIO
+
+W = "{http://schemas.openxmlformats.org/wordprocessingml/2006/main}"
+
+# pdf text extractors emit "(cid:123)" for glyphs without a unicode mapping
+CID_PATTERN = re.compile(r"\(cid:\d+\)")
+
+
+############## DOCX #####################
+
+def _docx_paragraph(p) -> str:
+    parts = []
+    for node in p.iter():
+        if node.tag == f"{W}t":
+            parts.append(node.text or "")
+        elif node.tag == f"{W}tab":
+            parts.append(" ")
+        elif node.tag in (f"{W}br", f"{W}cr"):
+            parts.append("\n")
+    text = "".join(parts).strip()
+    if not text:
+        return ""
+
+    style = p.find(f"{W}pPr/{W}pStyle")
+    style = style.get(f"{W}val", "") if style is not None else ""
+    if style == "Title":
+        return f"# {text}"
+    if style.startswith("Heading") and style[7:].isdigit():
+        return f"{'#' * min(int(style[7:]) + 1, 6)} {text}"
+    if p.find(f"{W}pPr/{W}numPr") is not None or style.startswith("List"):
+        return f"- {text}"
+    return text
+
+
+def _docx_table(tbl) -> str:
+    rows = []
+    for tr in tbl.findall(f"{W}tr"):
+        cells = [
+            " ".join(filter(None, (_docx_paragraph(p) for p in tc.iter(f"{W}p")))).replace("|", "\\|")
+            for tc in tr.findall(f"{W}tc")
+        ]
+        rows.append("| " + " | ".join(cells) + " |")
+    if rows:
+        rows.insert(1, "|" + "---|" * rows[0].count(" | ") + "---|")
+    return "\n".join(rows)
+
+
+def _docx_blocks(element) -> list[str]:
+    """Paragraphs and tables in document order, including those nested in
+    content controls (`w:sdt`) and other wrappers; tables are not re-entered."""
+    blocks = []
+    for child in element:
+        if child.tag == f"{W}p":
+            blocks.append(_docx_paragraph(child))
+        elif child.tag == f"{W}tbl":
+            blocks.append(_docx_table(child))
+        else:
+            blocks += _docx_blocks(child)
+    return blocks
+
+
+def _header_part(name: str) -> bool:
+    return re.fullmatch(r"word/(header|footer)\d*\.xml", name) is not None
+
+
+def extract_docx(data: bytes) -> list[str]:
+    """DOCX -> single markdown "page" (DOCX has no fixed pagination).
+
+    Resume templates often keep the name and contact details in the page
+    header or footer, so those parts are included (headers first, footers
+    last, each distinct block once).
+    """
+    with zipfile.ZipFile(io.BytesIO(data)) as z:
+        root = ElementTree.fromstring(z.read("word/document.xml"))
+        parts = sorted(name for name in z.namelist() if _header_part(name))
+        edges = {name: _docx_blocks(ElementTree.fromstring(z.read(name))) for name in parts}
+
+    # First-page / even-page variants usually repeat the default header
+    headers = list(dict.fromkeys(b for name in parts if "/header" in name for b in edges[name]))
+    footers = list(dict.fromkeys(b for name in parts if "/footer" in name for b in edges[name]))
+    blocks = headers + _docx_blocks(root.find(f"{W}body")) + footers
+    return ["\n\n".join(b for b in blocks if b)]
+
+
+############## PDF #####################
+
+def extract_pdf(data: bytes) -> list[str] | None:
+    """Text layer of each PDF page, or None if pypdf is not installed."""
+    if PdfReader is None:
+        return None
+    reader = PdfReader(io.BytesIO(data))
+    return [page.extract_text() or "" for page in reader.pages]
+
+
+############## Quality gate #####################
+
+def _is_garbage(ch: str) -> bool:
+    if ch in "\n\t\r":
+        return False
+    return ch == "�" or unicodedata.category(ch) in ("Cc", "Co", "Cs", "Cn")
+
+
+def text_quality(page: str) -> dict:
+    """Text density and garbage-character ratio of one extracted page."""
+    text = CID_PATTERN.sub("�", page)
+    visible = [ch for ch in text if not ch.isspace()]
+    garbage = sum(1 for ch in text if _is_garbage(ch))
+    return {
+        "chars": len(visible),
+        "garbage_ratio": garbage / max(len(visible), 1),
+    }
+
+
+def passes_quality_gate(pages: list[str]) -> bool:
+    """Every page must pass: one scanned page in a text PDF would otherwise be lost."""
+    if not pages:
+        return False
+    for page in pages:
+        quality = text_quality(page)
+        if quality["chars"] < LOCAL_MIN_CHARS_PER_PAGE or quality["garbage_ratio"] > LOCAL_MAX_GARBAGE_RATIO:
+            return False
+    return True
+
+
+def extract_local(data: bytes, file_name: str) -> list[str] | None:
+    """Page markdown extracted locally, or None if remote OCR is needed."""
+    suffix = file_name.lower().rsplit(".", 1)[-1]
+    try:
+        if suffix == "docx":
+            pages = extract_docx(data)
+        elif suffix == "pdf":
+            pages = extract_pdf(data)
+        else:
+            return None
+    except Exception:
+        # Corrupt/unusual files are OCR's problem, not a pipeline failure
+        return None
+
+    if pages is None or not passes_quality_gate(pages):
+        return None
+    return pages
@@ -0,0 +1,96 @@
+"""
+Per-output-folder manifest for resumable, incremental batch runs.
+
+`manifest.json` maps each input file name to its content hash, the pipeline
+version that produced its output and the final status (PASS / FAIL / ERROR).
+A rerun skips files whose hash and pipeline version are unchanged and whose
+status is final, so a crashed or nightly run only processes what is new,
+changed or previously errored.
+"""
+
+import hashlib
+import json
+import os
+import threading
+import time
+from pathlib import Path
+
+MANIFEST_NAME = "manifest.json"
+
+# Statuses that mean "done" - an unchanged file with one of these is skipped
+FINAL_STATUSES = ("PASS", "FAIL")
+
+
+def file_sha256(path: Path) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def pipeline_version() -> str:
+    """Hash of everything that shapes an output: models, prompts, schemas and
+    extraction mode. Editing a prompt or switching model invalidates the manifest."""
+    from src.chains import jd_chain, judge_chain, resume_chain
+    from src.config import OCR_MODEL, RESUME_EXTRACTION_MODE, get_extraction_llm, get_judge_llm
+
+    parts = [
+        OCR_MODEL,
+        get_extraction_llm().model_name,
+        get_judge_llm().model_name,
+        RESUME_EXTRACTION_MODE,
+        resume_chain.prompt_template.pretty_repr(),
+        jd_chain.prompt_template.pretty_repr(),
+        judge_chain.prompt_template_judge.pretty_repr(),
+        json.dumps(resume_chain.ResumeData.model_json_schema(), sort_keys=True),
+        json.dumps(jd_chain.JobDescription.model_json_schema(), sort_keys=True),
+        json.dumps(judge_chain.judgeJson.model_json_schema(), sort_keys=True),
+    ]
+    if RESUME_EXTRACTION_MODE == "sectioned":
+        parts += [description for _, description in resume_chain.SECTIONS.values()]
+    return hashlib.sha256("\0".join(parts).encode("utf-8")).hexdigest()[:16]
+
+
+class Manifest:
+    """JSON-backed record of processed inputs, saved atomically after each update."""
+
+    def __init__(self, output_path: Path):
+        self.path = Path(output_path) / MANIFEST_NAME
+        self._lock = threading.Lock()
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                self._entries = json.load(f)
+        except (FileNotFoundError, ValueError):
+            self._entries = {}
+
+    def get(self, name: str) -> dict | None:
+        with self._lock:
+            entry = self._entries.get(name)
+            return dict(entry) if entry else None
+
+    def is_done(self, name: str, sha256: str, version: str) -> bool:
+        entry = self.get(name)
+        return bool(
+            entry
+            and entry["sha256"] == sha256
+            and entry["pipeline_version"] == version
+            and entry["status"] in FINAL_STATUSES
+        )
+
+    def record(self, name: str, sha256: str, version: str, status: str, error: str | None = None):
+        with self._lock:
+            self._entries[name] = {
+                "sha256": sha256,
+                "pipeline_version": version,
+                "status": status,
+                "error": error,
+                "updated_at": time.time(),
+            }
+            self._save()
+
+    def _save(self):
+        tmp = self.path.with_suffix(f".{os.getpid()}.{threading.get_ident()}.tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(self._entries, f, indent=2, sort_keys=True)
+        os.replace(tmp, self.path)
@@ -0,0 +1,155 @@
+"""
+Map-reduce extraction for long documents.
+
+Long documents are split into overlapping page windows, each window is
+extracted on its own (concurrently), and the partial ResumeData /
+JobDescription objects are merged deterministically. Overlap means an entry
+spanning a page break is seen whole at least once; the merge deduplicates
+the copies. A window that still fails after one re-run fails the document
+rather than producing a silently partial merge.
+"""
+
+import re
+
+from pydantic import BaseModel
+
+from src.compact import estimate_tokens
+from src.config import CHUNK_MIN_PAGES, CHUNK_MIN_TOKENS, CHUNK_PAGES, CHUNK_OVERLAP_PAGES
+from src.validation_models.jd import JobDescription, skillsInfo as jdSkillsInfo
+from src.validation_models.resume import ResumeData, personalInfo, contactInfo, skillsInfo
+
+MAX_RESPONSIBILITIES = 5
+
+
+############## Map: page windows #####################
+
+def window_ranges(count: int, size: int = CHUNK_PAGES, overlap: int = CHUNK_OVERLAP_PAGES) -> list[tuple[int, int]]:
+    """(first, last) 1-based page numbers of each window over `count` pages."""
+    step = max(size - overlap, 1)
+    ranges = []
+    for start in range(0, count, step):
+        ranges.append((start + 1, min(start + size, count)))
+        if start + size >= count:
+            break
+    return ranges
+
+
+def page_windows(pages: list[str], size: int = CHUNK_PAGES, overlap: int = CHUNK_OVERLAP_PAGES) -> list[str]:
+    return [
+        "\n\n".join(p for p in pages[first - 1:last] if p)
+        for first, last in window_ranges(len(pages), size, overlap)
+    ]
+
+
+def extraction_windows(pages: list[str] | None, markdown: str) -> list[str]:
+    """Texts to extract from: the whole markdown, or page windows for long documents."""
+    if not pages or len(pages) < 2:
+        return [markdown]
+    if len(pages) >= CHUNK_MIN_PAGES or estimate_tokens(markdown) >= CHUNK_MIN_TOKENS:
+        return page_windows(pages)
+    return [markdown]
+
+
+############## Reduce: deterministic merge #####################
+
+def _key(value) -> str:
+    return re.sub(r"[^a-z0-9]", "", str(value or "").lower())
+
+
+def _fill(models: list[BaseModel], model_cls):
+    """Field-wise merge: the first non-empty value of each field wins."""
+    merged = {}
+    for name in model_cls.model_fields:
+        merged[name] = next(
+            (getattr(m, name) for m in models if getattr(m, name) not in (None, "", [])),
+            getattr(models[0], name),
+        )
+    return model_cls(**merged)
+
+
+def _union(lists: list[list[str]]) -> list[str]:
+    seen, out = set(), []
+    for items in lists:
+        for item in items:
+            if _key(item) and _key(item) not in seen:
+                seen.add(_key(item))
+                out.append(item)
+    return out
+
+
+def _dedupe(entries: list[BaseModel], key_fields: tuple[str, ...]) -> list[BaseModel]:
+    """Collapse entries with the same key, filling gaps from the later copies."""
+    groups = {}
+    for entry in entries:
+        key = tuple(_key(getattr(entry, f)) for f in key_fields)
+        groups.setdefault(key, []).append(entry)
+    return [
+        group[0] if len(group) == 1 else _fill(group, type(group[0]))
+        for group in groups.values()
+    ]
+
+
+def _merge_skills(skills: list, model_cls):
+    return model_cls(**{
+        name: _union([getattr(s, name) for s in skills])
+        for name in model_cls.model_fields
+    })
+
+
+def merge_resumes(parts: list[ResumeData]) -> ResumeData:
+    return ResumeData(
+        personal_info=_fill([p.personal_info for p in parts], personalInfo),
+        contact_info=_fill([p.contact_info for p in parts], contactInfo),
+        education_info=_dedupe(
+            [e for p in parts for e in p.education_info],
+            ("institution_name", "degree"),
+        ),
+        work_experience_info=_dedupe(
+            [w for p in parts for w in p.work_experience_info],
+            ("company_name", "job_title", "start_date"),
+        ),
+        skills_info=_merge_skills([p.skills_info for p in parts], skillsInfo),
+    )
+
+
+def merge_jds(parts: list[JobDescription]) -> JobDescription:
+    years = [p.min_years_experience for p in parts if p.min_years_experience is not None]
+    merged = _fill(parts, JobDescription)
+    return merged.model_copy(update={
+        "mandatory_skills": _merge_skills([p.mandatory_skills for p in parts], jdSkillsInfo),
+        "optional_skills": _union([p.optional_skills for p in parts]),
+        "min_years_experience": max(years) if years else None,
+        "summary_responsibilities": _union([p.summary_responsibilities for p in parts])[:MAX_RESPONSIBILITIES],
+    })
+
+
+class WindowExtractionError(RuntimeError):
+    """Some page windows of a long document could not be extracted."""
+
+    def __init__(self, source: str, ranges: list[tuple[int, int]], errors: list[Exception]):
+        self.source = source
+        self.ranges = ranges
+        self.errors = errors
+        pages = ", ".join(f"{first}-{last}" if first != last else str(first) for first, last in ranges)
+        super().__init__(f"{source} extraction failed for pages {pages}: {errors[0]!r}")
+
+
+def failed_windows(results: list) -> list[int]:
+    return [i for i, r in enumerate(results) if isinstance(r, Exception)]
+
+
+def merge_extractions(source: str, results: list, page_count: int):
+    """Merge per-window results over a `page_count`-page document.
+
+    `results` comes from `chain.batch(..., return_exceptions=True)`. Any failed
+    window raises WindowExtractionError naming its page range: a merge missing
+    a window would pass for a complete extraction.
+    """
+    if failed := failed_windows(results):
+        ranges = window_ranges(page_count)
+        raise WindowExtractionError(
+            source, [ranges[i] for i in failed], [results[i] for i in failed]
+        ) from results[failed[0]]
+    if len(results) == 1:
+        return results[0]
+    return merge_resumes(results) if source == "resume" else merge_jds(results)
@@ -0,0 +1,376 @@
+"""
+Resume <-> JD matching over extracted skills.
+
+Skills from every resume and JD are normalised into one shared vocabulary and
+encoded as sparse binary matrices (documents x skills). One sparse product per
+block of JDs then scores every resume against every JD at once:
+
+- mandatory coverage: share of the JD's mandatory skills the resume has
+- optional overlap: share of the JD's optional skills the resume has
+- experience gate: resumes with fewer years (merged work-experience spans)
+  than the JD's `min_years_experience` score 0 for that JD
+
+score = MATCH_MANDATORY_WEIGHT * coverage + MATCH_OPTIONAL_WEIGHT * overlap,
+and the top-k resumes per JD are returned with the mandatory skills they miss.
+
+Usage:
+    python -m src.matching --resumes output/resumes/ --jds output/jd/ --top-k 20 --output matches.json
+    python -m src.matching --resumes output/resumes/ --jds output/jd/ --format parquet --min-coverage 0.8
+"""
+
+import json
+import re
+import time
+from dataclasses import dataclass
+from datetime import date
+from pathlib import Path
+
+import numpy as np
+from scipy import sparse
+
+from src.config import MATCH_MANDATORY_WEIGHT, MATCH_OPTIONAL_WEIGHT, MATCH_TOP_K, MATCH_JD_BLOCK
+from src.sinks import DATA, _is_object_list, _model_columns
+
+RESUME_SKILL_FIELDS = [
+    "programming_languages", "frameworks_and_libraries", "tools_and_platforms", "databases",
+    "cloud_and_infra", "soft_skills", "domain_skills", "certified_skills",
+]
+JD_SKILL_FIELDS = ["programming_languages", "frameworks_and_libraries", "tools", "databases", "cloud_and_infra"]
+
+# Spellings that name the same skill; keys and values are normalised forms
+SKILL_ALIASES = {
+    "js": "javascript",
+    "ts": "typescript",
+    "golang": "go",
+    "postgres": "postgresql",
+    "k8s": "kubernetes",
+    "amazon web services": "aws",
+    "google cloud": "gcp",
+    "google cloud platform": "gcp",
+    "microsoft azure": "azure",
+    "scikit learn": "scikit-learn",
+    "sklearn": "scikit-learn",
+    "node": "node.js",
+    "nodejs": "node.js",
+    "react.js": "react",
+    "reactjs": "react",
+    "ml": "machine learning",
+}
+
+YEAR_MONTH = re.compile(r"(\d{4})(?:-(\d{1,2}))?")
+# `is_current_role` answers and `end_date` wordings that mean the role is ongoing
+CURRENT_ROLE = re.compile(r"^\s*(yes|y|true|current)\b", re.IGNORECASE)
+ONGOING = re.compile(r"\b(present|current|now|ongoing|to date|till date)\b", re.IGNORECASE)
+
+# Files in an output folder that are not extraction results
+NON_RESULT_FILES = re.compile(r"^(manifest|profile-.*|results-.*)\.json$|\.error\.json$")
+
+
+def normalize_skill(skill: str) -> str:
+    skill = re.sub(r"\s+", " ", skill.strip().lower()).rstrip(".")
+    return SKILL_ALIASES.get(skill, skill)
+
+
+############## Extracted documents #####################
+
+@dataclass
+class Resume:
+    label: str
+    skills: set[str]
+    years: float
+
+
+@dataclass
+class Opening:
+    label: str
+    mandatory: set[str]
+    optional: set[str]
+    min_years: float | None
+
+
+def _skills(values) -> set[str]:
+    return {normalize_skill(v) for v in values or [] if v and v.strip()}
+
+
+def _month(value: str | None) -> int | None:
+    """Months since year 0 for 'YYYY-MM' / 'YYYY' strings, else None."""
+    match = YEAR_MONTH.search(value or "")
+    if not match:
+        return None
+    return int(match.group(1)) * 12 + int(match.group(2) or 1) - 1
+
+
+def _is_current(role: dict) -> bool:
+    return bool(CURRENT_ROLE.match(str(role.get("is_current_role") or "")) or ONGOING.search(role.get("end_date") or ""))
+
+
+def experience_years(work_experience: list[dict], today: date | None = None) -> float:
+    """Years covered by the work history, overlapping roles counted once.
+
+    A current role with no end date runs to today. Any other role with no end
+    date counts to the end of its start year; a role with no parseable start is
+    ignored.
+    """
+    today = today or date.today()
+    now = today.year * 12 + today.month - 1
+    spans = []
+    for role in work_experience or []:
+        start = _month(role.get("start_date"))
+        if start is None:
+            continue
+        end = _month(role.get("end_date"))
+        if end is None:
+            end = now if _is_current(role) else start - start % 12 + 12
+        spans.append((start, min(end, now)))
+
+    months, covered_to = 0, None
+    for start, end in sorted(spans):
+        if covered_to is not None:
+            start = max(start, covered_to)
+        if end > start:
+            months += end - start
+            covered_to = end
+    return round(months / 12, 2)
+
+
+def resume_from_data(label: str, data: dict) -> Resume:
+    skills_info = data.get("skills_info") or {}
+    return Resume(
+        label=label,
+        skills=set().union(*(_skills(skills_info.get(f)) for f in RESUME_SKILL_FIELDS)),
+        years=experience_years(data.get("work_experience_info")),
+    )
+
+
+def opening_from_data(label: str, data: dict) -> Opening:
+    mandatory_info = data.get("mandatory_skills") or {}
+    mandatory = set().union(*(_skills(mandatory_info.get(f)) for f in JD_SKILL_FIELDS))
+    return Opening(
+        label=label,
+        mandatory=mandatory,
+        # A skill listed as both is mandatory
+        optional=_skills(data.get("optional_skills")) - mandatory,
+        min_years=data.get("min_years_experience"),
+    )
+
+
+def _passed(judge_results: list[dict]) -> bool:
+    grades = [jr["grade"].upper() for jr in judge_results]
+    return bool(grades) and all(g == "PASS" for g in grades)
+
+
+def _unflatten(row: dict, kind: str) -> dict:
+    """Nested extraction dict from a flat sink row (dotted columns, object lists as JSON)."""
+    data_key, model_cls = DATA[kind]
+    # Decide from the schema, not the value: a title like "[Remote] Engineer" is just a string
+    json_columns = {c for c, annotation in _model_columns(model_cls).items() if _is_object_list(annotation)}
+    data = {}
+    for column, value in row.items():
+        if not column.startswith(f"{data_key}."):
+            continue
+        parts = column.split(".")[1:]
+        target = data
+        for part in parts[:-1]:
+            target = target.setdefault(part, {})
+        if isinstance(value, str) and ".".join(parts) in json_columns:
+            value = json.loads(value)
+        target[parts[-1]] = value
+    return data
+
+
+def load_extractions(folder: str, kind: str, fmt: str = "json", passed_only: bool = True) -> list[tuple[str, dict]]:
+    """(document label, extraction dict) for every result in a batch output folder.
+
+    `json` reads the per-file JSON sink; `parquet` reads `results-*.parquet`,
+    where the latest record per file wins. With `passed_only`, extractions the
+    judge failed are left out.
+    """
+    data_key = f"{kind}_data"
+    folder = Path(folder)
+    if fmt == "json":
+        results = []
+        for path in sorted(folder.glob("*.json")):
+            if NON_RESULT_FILES.search(path.name):
+                continue
+            with open(path, encoding="utf-8") as f:
+                output = json.load(f)
+            if data_key not in output or (passed_only and not _passed(output.get("judge_results", []))):
+                continue
+            results.append((path.stem, output[data_key]))
+        return results
+
+    import pyarrow.dataset as ds
+
+    paths = [str(p) for p in sorted(folder.glob("results-*.parquet"))]
+    if not paths:
+        return []
+    dataset = ds.dataset(paths)
+    # Only the extraction columns; skip the run metadata and profile columns
+    columns = ["file", "status", "started_at"] + [c for c in dataset.schema.names if c.startswith(f"{data_key}.")]
+    latest = {}
+    for row in dataset.to_table(columns=columns).to_pylist():
+        if row["file"] not in latest or row["started_at"] >= latest[row["file"]]["started_at"]:
+            latest[row["file"]] = row
+    return [
+        (Path(name).stem, _unflatten(row, kind))
+        for name, row in sorted(latest.items())
+        if row["status"] == "PASS" or (not passed_only and row["status"] == "FAIL")
+    ]
+
+
+############## Matrices #####################
+
+class Vocabulary:
+    def __init__(self):
+        self.index: dict[str, int] = {}
+
+    def ids(self, skills: set[str]) -> list[int]:
+        return [self.index.setdefault(skill, len(self.index)) for skill in sorted(skills)]
+
+    def words(self) -> list[str]:
+        return sorted(self.index, key=self.index.get)
+
+
+def _binary_matrix(rows: list[list[int]], width: int) -> sparse.csr_matrix:
+    indptr = np.zeros(len(rows) + 1, dtype=np.int64)
+    indptr[1:] = np.cumsum([len(r) for r in rows])
+    indices = np.fromiter((i for r in rows for i in r), dtype=np.int32, count=int(indptr[-1]))
+    data = np.ones(len(indices), dtype=np.float32)
+    return sparse.csr_matrix((data, indices, indptr), shape=(len(rows), width))
+
+
+@dataclass
+class MatchIndex:
+    resumes: list[Resume]
+    jobs: list[Opening]
+    vocabulary: list[str]
+    resume_skills: sparse.csr_matrix  # resumes x vocabulary
+    mandatory: sparse.csr_matrix      # jobs x vocabulary
+    optional: sparse.csr_matrix       # jobs x vocabulary
+    years: np.ndarray                 # (resumes,)
+    min_years: np.ndarray             # (jobs,), NaN when the JD sets no minimum
+
+
+def build_index(resumes: list[Resume], jobs: list[Opening]) -> MatchIndex:
+    vocab = Vocabulary()
+    resume_rows = [vocab.ids(r.skills) for r in resumes]
+    mandatory_rows = [vocab.ids(j.mandatory) for j in jobs]
+    optional_rows = [vocab.ids(j.optional) for j in jobs]
+    width = len(vocab.index)
+    return MatchIndex(
+        resumes=resumes,
+        jobs=jobs,
+        vocabulary=vocab.words(),
+        resume_skills=_binary_matrix(resume_rows, width),
+        mandatory=_binary_matrix(mandatory_rows, width),
+        optional=_binary_matrix(optional_rows, width),
+        years=np.array([r.years for r in resumes], dtype=np.float32),
+        min_years=np.array([np.nan if j.min_years is None else j.min_years for j in jobs], dtype=np.float32),
+    )
+
+
+def _share(hits: sparse.spmatrix, totals: np.ndarray, empty: float) -> np.ndarray:
+    """Dense hits / totals per column; columns with no skills get `empty`."""
+    hits = hits.toarray()
+    share = np.divide(hits, totals, out=np.full(hits.shape, empty, dtype=np.float32), where=totals > 0)
+    return share.astype(np.float32, copy=False)
+
+
+def score_block(index: MatchIndex, jobs: slice, mandatory_weight: float = MATCH_MANDATORY_WEIGHT,
+                optional_weight: float = MATCH_OPTIONAL_WEIGHT) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """(score, coverage, overlap) as dense resumes x jobs[block] arrays."""
+    mandatory = index.mandatory[jobs]
+    optional = index.optional[jobs]
+    # A JD with no mandatory skills is fully covered by anyone; one with no optional skills adds nothing
+    coverage = _share(index.resume_skills @ mandatory.T, np.asarray(mandatory.sum(axis=1)).ravel(), 1.0)
+    overlap = _share(index.resume_skills @ optional.T, np.asarray(optional.sum(axis=1)).ravel(), 0.0)
+
+    min_years = index.min_years[jobs]
+    gate = np.isnan(min_years)[None, :] | (index.years[:, None] >= min_years[None, :])
+    score = (mandatory_weight * coverage + optional_weight * overlap) * gate
+    return score, coverage, overlap
+
+
+def top_matches(index: MatchIndex, top_k: int = MATCH_TOP_K, min_coverage: float = 0.0,
+                block: int = MATCH_JD_BLOCK, mandatory_weight: float = MATCH_MANDATORY_WEIGHT,
+                optional_weight: float = MATCH_OPTIONAL_WEIGHT) -> dict[str, list[dict]]:
+    """Best `top_k` resumes per JD, scored `block` JDs at a time to bound memory."""
+    results = {}
+    n_resumes = len(index.resumes)
+    k = min(top_k, n_resumes)
+    if k == 0:
+        return {job.label: [] for job in index.jobs}
+
+    for first in range(0, len(index.jobs), block):
+        jobs = slice(first, min(first + block, len(index.jobs)))
+        score, coverage, overlap = score_block(index, jobs, mandatory_weight, optional_weight)
+        score[coverage < min_coverage] = 0.0
+
+        # Unordered top k per column, then sort just those
+        top = np.argpartition(-score, k - 1, axis=0)[:k] if k < n_resumes else np.tile(np.arange(n_resumes)[:, None], (1, score.shape[1]))
+        order = np.argsort(-np.take_along_axis(score, top, axis=0), axis=0, kind="stable")
+        top = np.take_along_axis(top, order, axis=0)
+
+        for col, j in enumerate(range(jobs.start, jobs.stop)):
+            job = index.jobs[j]
+            matches = []
+            for i in top[:, col]:
+                if score[i, col] <= 0:
+                    break
+                resume = index.resumes[i]
+                matches.append({
+                    "resume": resume.label,
+                    "score": round(float(score[i, col]), 4),
+                    "mandatory_coverage": round(float(coverage[i, col]), 4),
+                    "optional_overlap": round(float(overlap[i, col]), 4),
+                    "years": resume.years,
+                    "missing_mandatory": sorted(job.mandatory - resume.skills),
+                })
+            results[job.label] = matches
+    return results
+
+
+def match(resume_folder: str, jd_folder: str, fmt: str = "json", top_k: int = MATCH_TOP_K,
+          min_coverage: float = 0.0, passed_only: bool = True) -> dict:
+    started = time.perf_counter()
+    resumes = [resume_from_data(label, data) for label, data in load_extractions(resume_folder, "resume", fmt, passed_only)]
+    jobs = [opening_from_data(label, data) for label, data in load_extractions(jd_folder, "jd", fmt, passed_only)]
+    loaded = time.perf_counter()
+    index = build_index(resumes, jobs)
+    matches = top_matches(index, top_k, min_coverage)
+    done = time.perf_counter()
+    return {
+        "resumes": len(resumes),
+        "jds": len(jobs),
+        "vocabulary": len(index.vocabulary),
+        "load_s": round(loaded - started, 3),
+        "match_s": round(done - loaded, 3),
+        "matches": matches,
+    }
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Rank extracted resumes against extracted JDs by skills and experience.")
+    parser.add_argument("--resumes", required=True, help="Batch output folder of resume extractions")
+    parser.add_argument("--jds", required=True, help="Batch output folder of JD extractions")
+    parser.add_argument("--format", default="json", choices=["json", "parquet"],
+                        help="Read the per-file JSON sink or the results-*.parquet sink (default: json)")
+    parser.add_argument("--top-k", type=int, default=MATCH_TOP_K, help=f"Candidates per JD (default: {MATCH_TOP_K})")
+    parser.add_argument("--min-coverage", type=float, default=0.0,
+                        help="Drop candidates covering less than this share of the mandatory skills")
+    parser.add_argument("--include-failed", action="store_true", help="Also use extractions the judge failed")
+    parser.add_argument("--output", help="Write the matches to this JSON file")
+    args = parser.parse_args()
+
+    report = match(args.resumes, args.jds, args.format, args.top_k, args.min_coverage, not args.include_failed)
+    print(f"{report['resumes']} resumes x {report['jds']} JDs over {report['vocabulary']} skills: "
+          f"loaded in {report['load_s']}s, matched in {report['match_s']}s")
+    for jd, matches in report["matches"].items():
+        best = ", ".join(f"{m['resume']} ({m['score']:.2f})" for m in matches[:3]) or "no match"
+        print(f"  {jd:<40} {best}")
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=4, ensure_ascii=False)
+        print(f"Matches written to: {Path(args.output).resolve()}")
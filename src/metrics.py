@@ -0,0 +1,260 @@
+"""
+Per-document instrumentation for graph runs.
+
+`DocumentProfiler` is a LangChain callback handler. Pass one per document in
+the run config (`graph.invoke(state, config={"callbacks": [profiler]})`) and
+it records wall time per graph node, retries (LangChain and HTTP), reflection passes, prompt /
+completion tokens per model, bytes sent to Mistral OCR and OCR pages, and
+estimates the document's cost from the price table in `src.config`.
+
+`RunProfile` aggregates the documents of a run into a JSON report with
+p50/p95/p99 per stage and can write a Prometheus textfile.
+"""
+
+import json
+import math
+import os
+import threading
+import time
+from pathlib import Path
+
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.callbacks.manager import adispatch_custom_event, dispatch_custom_event
+
+from src.config import MODEL_PRICES, OCR_PRICE_PER_1K_PAGES
+
+QUANTILES = (0.5, 0.95, 0.99)
+
+# Nodes whose repeat runs are reflection passes
+PARSE_NODES = {"parse_resume": "resume", "parse_jd": "jd"}
+
+
+############## Events from inside nodes #####################
+# OCR and the rate-limited HTTP transport have no LangChain callback of their
+# own; they report through custom events.
+# Outside a graph run (CLI, notebooks) there is no parent run and the event
+# is dropped.
+
+def record_ocr(bytes_sent: int = 0, pages: int = 0):
+    try:
+        dispatch_custom_event("ocr_usage", {"bytes": bytes_sent, "pages": pages})
+    except RuntimeError:
+        pass
+
+
+async def arecord_ocr(bytes_sent: int = 0, pages: int = 0):
+    try:
+        await adispatch_custom_event("ocr_usage", {"bytes": bytes_sent, "pages": pages})
+    except RuntimeError:
+        pass
+
+
+def record_retry(status: int | None = None):
+    try:
+        dispatch_custom_event("http_retry", {"status": status})
+    except RuntimeError:
+        pass
+
+
+async def arecord_retry(status: int | None = None):
+    try:
+        await adispatch_custom_event("http_retry", {"status": status})
+    except RuntimeError:
+        pass
+
+
+############## Per document #####################
+
+def _price(model: str) -> tuple[float, float]:
+    """(input, output) USD per 1M tokens; provider model ids may carry a suffix."""
+    if model in MODEL_PRICES:
+        return MODEL_PRICES[model]
+    return next((p for name, p in MODEL_PRICES.items() if model.startswith(name)), (0.0, 0.0))
+
+
+class DocumentProfiler(BaseCallbackHandler):
+    # Bookkeeping is cheap and lock-protected, so skip the executor hop in async runs
+    run_inline = True
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._open = {}
+        self.stage_seconds = {}
+        self.stage_calls = {}
+        self.retries = 0
+        self.tokens = {}
+        self.bytes_uploaded = 0
+        self.ocr_pages = 0
+
+    def on_chain_start(self, serialized, inputs, *, run_id, parent_run_id=None, metadata=None, **kwargs):
+        # Only the node run itself, not the chains running inside it (a
+        # RunnableLambda node shows up as a run of the same name nested in the node)
+        name = kwargs.get("name")
+        if not (name and metadata and name == metadata.get("langgraph_node")):
+            return
+        with self._lock:
+            if self._open.get(parent_run_id, (None,))[0] != name:
+                self._open[run_id] = (name, time.perf_counter())
+
+    def on_chain_end(self, outputs, *, run_id, **kwargs):
+        self._close(run_id)
+
+    def on_chain_error(self, error, *, run_id, **kwargs):
+        self._close(run_id)
+
+    def _close(self, run_id):
+        with self._lock:
+            opened = self._open.pop(run_id, None)
+            if opened is None:
+                return
+            stage, started = opened
+            self.stage_seconds[stage] = self.stage_seconds.get(stage, 0.0) + time.perf_counter() - started
+            self.stage_calls[stage] = self.stage_calls.get(stage, 0) + 1
+
+    def on_retry(self, retry_state, *, run_id, **kwargs):
+        with self._lock:
+            self.retries += 1
+
+    def on_llm_end(self, response, *, run_id, **kwargs):
+        default_model = (response.llm_output or {}).get("model_name", "unknown")
+        with self._lock:
+            for generations in response.generations:
+                for generation in generations:
+                    message = getattr(generation, "message", None)
+                    usage = getattr(message, "usage_metadata", None)
+                    if not usage:
+                        continue
+                    model = message.response_metadata.get("model_name") or default_model
+                    counts = self.tokens.setdefault(model, {"input": 0, "output": 0})
+                    counts["input"] += usage.get("input_tokens", 0)
+                    counts["output"] += usage.get("output_tokens", 0)
+
+    def on_custom_event(self, name, data, *, run_id, **kwargs):
+        with self._lock:
+            if name == "ocr_usage":
+                self.bytes_uploaded += data.get("bytes", 0)
+                self.ocr_pages += data.get("pages", 0)
+            elif name == "http_retry":
+                self.retries += 1
+
+    def summary(self, wall_s: float) -> dict:
+        with self._lock:
+            llm_cost = sum(
+                (counts["input"] * _price(model)[0] + counts["output"] * _price(model)[1]) / 1e6
+                for model, counts in self.tokens.items()
+            )
+            ocr_cost = self.ocr_pages * OCR_PRICE_PER_1K_PAGES / 1000
+            return {
+                "wall_s": round(wall_s, 3),
+                "stage_seconds": {stage: round(s, 3) for stage, s in self.stage_seconds.items()},
+                "stage_calls": dict(self.stage_calls),
+                "retries": self.retries,
+                "reflections": {
+                    source: max(self.stage_calls.get(node, 0) - 1, 0) for node, source in PARSE_NODES.items()
+                    if node in self.stage_calls
+                },
+                "tokens": {model: dict(counts) for model, counts in self.tokens.items()},
+                "input_tokens": sum(c["input"] for c in self.tokens.values()),
+                "output_tokens": sum(c["output"] for c in self.tokens.values()),
+                "bytes_uploaded": self.bytes_uploaded,
+                "ocr_pages": self.ocr_pages,
+                "cost_usd": round(llm_cost + ocr_cost, 6),
+            }
+
+
+############## Per run #####################
+
+def percentile(values: list[float], q: float) -> float:
+    """Nearest-rank percentile."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[max(math.ceil(q * len(ordered)) - 1, 0)]
+
+
+def _distribution(values: list[float]) -> dict:
+    stats = {f"p{round(q * 100)}": round(percentile(values, q), 3) for q in QUANTILES}
+    stats.update(count=len(values), total=round(sum(values), 3), max=round(max(values, default=0.0), 3))
+    return stats
+
+
+class RunProfile:
+    """Collects document summaries from concurrent workers and builds the run report."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.documents = []
+
+    def add(self, file: str, status: str, profiler: DocumentProfiler, wall_s: float) -> dict:
+        summary = profiler.summary(wall_s)
+        with self._lock:
+            self.documents.append({"file": file, "status": status, **summary})
+        return summary
+
+    def report(self) -> dict:
+        with self._lock:
+            docs = list(self.documents)
+
+        stages, tokens, status = {}, {}, {}
+        for doc in docs:
+            status[doc["status"]] = status.get(doc["status"], 0) + 1
+            for stage, seconds in doc["stage_seconds"].items():
+                stages.setdefault(stage, []).append(seconds)
+            for model, counts in doc["tokens"].items():
+                total = tokens.setdefault(model, {"input": 0, "output": 0})
+                total["input"] += counts["input"]
+                total["output"] += counts["output"]
+
+        return {
+            "documents": len(docs),
+            "status": status,
+            "wall_s": _distribution([d["wall_s"] for d in docs]),
+            "stages": {stage: _distribution(values) for stage, values in sorted(stages.items())},
+            "retries": sum(d["retries"] for d in docs),
+            "reflections": sum(sum(d["reflections"].values()) for d in docs),
+            "tokens": tokens,
+            "bytes_uploaded": sum(d["bytes_uploaded"] for d in docs),
+            "ocr_pages": sum(d["ocr_pages"] for d in docs),
+            "cost_usd": {
+                "total": round(sum(d["cost_usd"] for d in docs), 6),
+                **{k: v for k, v in _distribution([d["cost_usd"] for d in docs]).items() if k.startswith("p")},
+            },
+        }
+
+    def write(self, path: Path) -> dict:
+        report = self.report()
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=4)
+        return report
+
+    def write_prometheus(self, path: Path, prefix: str = "resume_extraction"):
+        """Node-exporter textfile format, written atomically as the collector expects."""
+        report = self.report()
+        lines = [
+            f"# HELP {prefix}_stage_seconds Wall time per document spent in each graph node.",
+            f"# TYPE {prefix}_stage_seconds summary",
+        ]
+        for stage, stats in report["stages"].items():
+            for q in QUANTILES:
+                lines.append(f'{prefix}_stage_seconds{{stage="{stage}",quantile="{q}"}} {stats[f"p{round(q * 100)}"]}')
+            lines.append(f'{prefix}_stage_seconds_sum{{stage="{stage}"}} {stats["total"]}')
+            lines.append(f'{prefix}_stage_seconds_count{{stage="{stage}"}} {stats["count"]}')
+
+        lines += [f"# TYPE {prefix}_documents_total counter"]
+        lines += [f'{prefix}_documents_total{{status="{s}"}} {n}' for s, n in sorted(report["status"].items())]
+        lines += [f"# TYPE {prefix}_tokens_total counter"]
+        for model, counts in sorted(report["tokens"].items()):
+            for direction, n in counts.items():
+                lines.append(f'{prefix}_tokens_total{{model="{model}",direction="{direction}"}} {n}')
+        for name, value in (
+            ("retries_total", report["retries"]),
+            ("reflections_total", report["reflections"]),
+            ("ocr_bytes_uploaded_total", report["bytes_uploaded"]),
+            ("ocr_pages_total", report["ocr_pages"]),
+            ("cost_usd_total", report["cost_usd"]["total"]),
+        ):
+            lines += [f"# TYPE {prefix}_{name} counter", f"{prefix}_{name} {value}"]
+
+        tmp = Path(f"{path}.{os.getpid()}.tmp")
+        tmp.write_text("\n".join(lines) + "\n", encoding="utf-8")
+        os.replace(tmp, path)
@@ -1,32 +1,334 @@
-from src.config import get_mistral_client
+import asyncio
+import base64
+import hashlib
+import threading
+import time
+from pathlib import Path
+
+from mistralai.models import SDKError
+
+from src.config import (
+    get_mistral_client,
+    LOCAL_EXTRACTION,
+    OCR_IMAGE_DIR,
+    OCR_MODEL,
+    OCR_CACHE_DIR,
+    OCR_CACHE_MAX_BYTES,
+    OCR_CACHE_MAX_AGE_DAYS,
+    OCR_INLINE_MAX_BYTES,
+    OCR_SIGNED_URL_HOURS,
+    OCR_UPLOAD_REGISTRY,
+)
+from src.local_extract import extract_local
+from src.metrics import arecord_ocr, record_ocr
+from src.ocr_cache import OCRCache
+from src.upload_registry import UploadRegistry
 
 client = get_mistral_client()
 
+ocr_cache = OCRCache(OCR_CACHE_DIR, OCR_CACHE_MAX_BYTES, OCR_CACHE_MAX_AGE_DAYS) if OCR_CACHE_DIR else None
+
+upload_registry = UploadRegistry(OCR_UPLOAD_REGISTRY) if OCR_UPLOAD_REGISTRY else None
+
+MIME_TYPES = {
+    "pdf": "application/pdf",
+    "docx": "application/vnd.openxmlformats-officedocument.wordprocessingml.document",
+}
+
+# Documents served by the local extractor (never reached Mistral or the cache)
+_local_count = 0
+_local_lock = threading.Lock()
+
 
 def upload_file(file_path: str) -> str:
     """Upload PDF/DOCX to Mistral OCR storage, return signed URL."""
-    filename = file_path.split("\\")[-1]
+    return _upload(_read(file_path), _file_name(file_path))[1]
+
+
+def _file_name(file_path: str) -> str:
+    return file_path.replace("\\", "/").split("/")[-1]
+
+
+def inline_url(data: bytes, file_name: str) -> str:
+    """Base64 data URL, sent inside the OCR request itself (no upload)."""
+    mime = MIME_TYPES.get(file_name.lower().rsplit(".", 1)[-1], "application/octet-stream")
+    return f"data:{mime};base64,{base64.b64encode(data).decode('ascii')}"
+
+
+def document_url(data: bytes, file_name: str) -> str:
+    """URL to hand to the OCR call for this document.
+
+    Small documents are inlined as a data URL (one request total). Larger ones
+    are uploaded once and their signed URL reused from the upload registry
+    until it expires.
+    """
+    if len(data) <= OCR_INLINE_MAX_BYTES:
+        record_ocr(bytes_sent=len(data))
+        return inline_url(data, file_name)
+    if upload_registry is None:
+        return _upload(data, file_name)[1]
+
+    key = hashlib.sha256(data).hexdigest()
+    url = upload_registry.live_url(key)
+    if url:
+        return url
+
+    entry = upload_registry.get(key)
+    # Already in Mistral storage, only the signed URL went stale
+    url = _refresh_url(key, entry["file_id"]) if entry else None
+    if url:
+        file_id = entry["file_id"]
+    else:
+        file_id, url = _upload(data, file_name)
+    upload_registry.put(key, file_id, url, OCR_SIGNED_URL_HOURS)
+    return url
+
+
+def _refresh_url(key: str, file_id: str) -> str | None:
+    """New signed URL for a registered upload; None (entry dropped) if the file was deleted remotely."""
+    try:
+        return client.files.get_signed_url(file_id=file_id, expiry=OCR_SIGNED_URL_HOURS).url
+    except SDKError as e:
+        if e.status_code != 404:
+            raise
+    upload_registry.drop(key)
+    return None
+
 
+def _upload(data: bytes, file_name: str) -> tuple[str, str]:
     uploaded_file = client.files.upload(
-        file={
-            "file_name": filename,
-            "content": open(file_path, "rb"),
-        },
+        file={"file_name": file_name, "content": data},
         purpose="ocr",
     )
+    record_ocr(bytes_sent=len(data))
+    signed_url = client.files.get_signed_url(file_id=uploaded_file.id, expiry=OCR_SIGNED_URL_HOURS)
+    return uploaded_file.id, signed_url.url
+
+
+def cleanup_uploads(older_than_hours: float = 24) -> dict:
+    """Delete OCR uploads older than the cutoff from Mistral storage.
+
+    Covers registry entries and any other purpose="ocr" files (e.g. from
+    `upload_file()` or crashed runs). Returns the deleted count and the
+    file_id -> error of the ones that could not be deleted.
+    """
+    cutoff = time.time() - older_than_hours * 3600
+    file_ids = set(upload_registry.pop_stale(older_than_hours)) if upload_registry else set()
+
+    page = 0
+    while True:
+        listing = client.files.list(page=page, page_size=100, purpose="ocr")
+        if not listing.data:
+            break
+        file_ids.update(f.id for f in listing.data if f.created_at < cutoff)
+        page += 1
 
-    signed_url = client.files.get_signed_url(file_id=uploaded_file.id)
-    return signed_url.url
+    deleted, failed = 0, {}
+    for file_id in file_ids:
+        try:
+            client.files.delete(file_id=file_id)
+            deleted += 1
+        except Exception as e:
+            failed[file_id] = str(e)
+    return {"deleted": deleted, "failed": failed}
 
 
-def get_ocr_response(file_url: str):
-    """Process OCR on uploaded file URL, return OCRResponse with markdown pages."""
+def get_ocr_response(file_url: str, include_images: bool = False):
+    """Process OCR on uploaded file URL, return OCRResponse with markdown pages.
+
+    Embedded images are only requested with `include_images=True`; the pipeline
+    itself only reads `page.markdown`.
+    """
     ocr_response = client.ocr.process(
-        model="mistral-ocr-latest",
+        model=OCR_MODEL,
         document={
             "type": "document_url",
             "document_url": file_url,
         },
-        include_image_base64=True,
+        include_image_base64=include_images,
     )
     return ocr_response
+
+
+def _spill_images(page, image_dir: Path):
+    """Write a page's base64 images to disk and drop them from the response."""
+    image_dir.mkdir(parents=True, exist_ok=True)
+    for image in page.images or []:
+        if not image.image_base64:
+            continue
+        payload = image.image_base64
+        if payload.startswith("data:"):
+            payload = payload.split(",", 1)[1]
+        (image_dir / image.id).write_bytes(base64.b64decode(payload))
+        image.image_base64 = None
+
+
+def iter_ocr_pages(ocr_response, image_dir: Path | None = None):
+    """Yield page markdown one page at a time.
+
+    Each page is released from the response once yielded (after spilling its
+    images to `image_dir`, if given), so large documents are never held twice.
+    """
+    pages = ocr_response.pages
+    pages.reverse()
+    while pages:
+        page = pages.pop()
+        if image_dir is not None:
+            _spill_images(page, image_dir)
+        yield page.markdown
+
+
+def _image_dir(key: str) -> Path | None:
+    return Path(OCR_IMAGE_DIR) / key[:16] if OCR_IMAGE_DIR else None
+
+
+def _read(file_path: str) -> bytes:
+    with open(file_path, "rb") as f:
+        return f.read()
+
+
+def _local_pages(data: bytes, file_name: str) -> list[str] | None:
+    """Born-digital fast path: local text extraction, None if OCR is needed."""
+    global _local_count
+    if not LOCAL_EXTRACTION:
+        return None
+    pages = extract_local(data, file_name)
+    if pages is not None:
+        with _local_lock:
+            _local_count += 1
+    return pages
+
+
+def ocr_document(data: bytes, file_name: str) -> list[str]:
+    """Return the markdown of every page.
+
+    Tries local extraction first, then the OCR cache, and only then Mistral OCR.
+    """
+    pages = _local_pages(data, file_name)
+    if pages is not None:
+        return pages
+
+    key = OCRCache.key(data, OCR_MODEL)
+    pages = ocr_cache.get(key) if ocr_cache else None
+    if pages is None:
+        image_dir = _image_dir(key)
+        response = get_ocr_response(document_url(data, file_name), include_images=image_dir is not None)
+        pages = list(iter_ocr_pages(response, image_dir))
+        record_ocr(pages=len(pages))
+        if ocr_cache:
+            ocr_cache.put(key, pages, OCR_MODEL)
+    return pages
+
+
+def ocr_file(file_path: str) -> list[str]:
+    """ocr_document() for a file on disk."""
+    return ocr_document(_read(file_path), _file_name(file_path))
+
+
+################# Async variants #####################
+
+async def adocument_url(data: bytes, file_name: str) -> str:
+    """Async document_url()."""
+    if len(data) <= OCR_INLINE_MAX_BYTES:
+        await arecord_ocr(bytes_sent=len(data))
+        return inline_url(data, file_name)
+    if upload_registry is None:
+        return (await _aupload(data, file_name))[1]
+
+    key = hashlib.sha256(data).hexdigest()
+    url = upload_registry.live_url(key)
+    if url:
+        return url
+
+    entry = upload_registry.get(key)
+    url = await _arefresh_url(key, entry["file_id"]) if entry else None
+    if url:
+        file_id = entry["file_id"]
+    else:
+        file_id, url = await _aupload(data, file_name)
+    await asyncio.to_thread(upload_registry.put, key, file_id, url, OCR_SIGNED_URL_HOURS)
+    return url
+
+
+async def _arefresh_url(key: str, file_id: str) -> str | None:
+    try:
+        return (await client.files.get_signed_url_async(file_id=file_id, expiry=OCR_SIGNED_URL_HOURS)).url
+    except SDKError as e:
+        if e.status_code != 404:
+            raise
+    await asyncio.to_thread(upload_registry.drop, key)
+    return None
+
+
+async def _aupload(data: bytes, file_name: str) -> tuple[str, str]:
+    uploaded_file = await client.files.upload_async(
+        file={"file_name": file_name, "content": data},
+        purpose="ocr",
+    )
+    await arecord_ocr(bytes_sent=len(data))
+    signed_url = await client.files.get_signed_url_async(file_id=uploaded_file.id, expiry=OCR_SIGNED_URL_HOURS)
+    return uploaded_file.id, signed_url.url
+
+
+async def aget_ocr_response(file_url: str, include_images: bool = False):
+    """Async get_ocr_response()."""
+    return await client.ocr.process_async(
+        model=OCR_MODEL,
+        document={
+            "type": "document_url",
+            "document_url": file_url,
+        },
+        include_image_base64=include_images,
+    )
+
+
+async def aocr_document(data: bytes, file_name: str) -> list[str]:
+    """Async ocr_document(); local extraction and cache I/O run in worker threads."""
+    pages = await asyncio.to_thread(_local_pages, data, file_name)
+    if pages is not None:
+        return pages
+
+    key = OCRCache.key(data, OCR_MODEL)
+    pages = await asyncio.to_thread(ocr_cache.get, key) if ocr_cache else None
+    if pages is None:
+        image_dir = _image_dir(key)
+        response = await aget_ocr_response(await adocument_url(data, file_name), include_images=image_dir is not None)
+        if image_dir is None:
+            pages = list(iter_ocr_pages(response))
+        else:
+            pages = await asyncio.to_thread(lambda: list(iter_ocr_pages(response, image_dir)))
+        await arecord_ocr(pages=len(pages))
+        if ocr_cache:
+            await asyncio.to_thread(ocr_cache.put, key, pages, OCR_MODEL)
+    return pages
+
+
+async def aocr_file(file_path: str) -> list[str]:
+    """Async ocr_file()."""
+    return await aocr_document(await asyncio.to_thread(_read, file_path), _file_name(file_path))
+
+#####################################################
+
+
+def ocr_stats() -> dict:
+    """Documents served locally, from the OCR cache (hits) and by Mistral (misses)."""
+    cache = ocr_cache.stats() if ocr_cache else {"hits": 0, "misses": 0}
+    with _local_lock:
+        return {"local": _local_count, **cache}
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Mistral OCR storage maintenance.")
+    parser.add_argument("--cleanup-uploads", action="store_true", help="Delete stale OCR uploads from Mistral storage")
+    parser.add_argument("--older-than-hours", type=float, default=24, help="Age cutoff for --cleanup-uploads (default: 24)")
+    args = parser.parse_args()
+
+    if args.cleanup_uploads:
+        result = cleanup_uploads(args.older_than_hours)
+        for file_id, error in result["failed"].items():
+            print(f"Could not delete {file_id}: {error}")
+        print(f"Deleted {result['deleted']} uploaded file(s)")
+    else:
+        parser.print_help()
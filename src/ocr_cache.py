@@ -0,0 +1,136 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from pathlib import Path
+
+
+class OCRCache:
+    """Content-addressed on-disk cache of OCR page markdown.
+
+    Entries are keyed by SHA-256 of (OCR model name, file bytes) and stored as
+    one JSON file each under `directory/<key[:2]>/<key>.json`. Entries expire
+    `max_age_days` after they were written (the `created` field, mirrored in
+    the file's mtime) and are dropped on read; when the cache grows past
+    `max_bytes` the least recently read entries (by atime) are evicted.
+    """
+
+    def __init__(self, directory: str, max_bytes: int, max_age_days: float):
+        self.directory = Path(directory)
+        self.max_bytes = max_bytes
+        self.max_age_seconds = max_age_days * 24 * 3600
+        self.hits = 0
+        self.misses = 0
+        self._size = None  # computed lazily on first write
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(data: bytes, model: str) -> str:
+        digest = hashlib.sha256(model.encode("utf-8"))
+        digest.update(b"\0")
+        digest.update(data)
+        return digest.hexdigest()
+
+    def _path(self, key: str) -> Path:
+        return self.directory / key[:2] / f"{key}.json"
+
+    def _expired(self, created: float, now: float) -> bool:
+        return self.max_age_seconds > 0 and now - created > self.max_age_seconds
+
+    def get(self, key: str) -> list[str] | None:
+        """Return cached page markdown, or None on a miss."""
+        path = self._path(key)
+        try:
+            stat = path.stat()
+            with open(path, encoding="utf-8") as f:
+                entry = json.load(f)
+            now = time.time()
+            if self._expired(entry.get("created", stat.st_mtime), now):
+                self._remove(path, stat.st_size)
+                raise FileNotFoundError(path)
+            pages = entry["pages"]
+            # Bump atime only: mtime stays the write time, so reads never extend an entry's age
+            os.utime(path, (now, stat.st_mtime))
+        except (FileNotFoundError, ValueError, KeyError):
+            with self._lock:
+                self.misses += 1
+            return None
+
+        with self._lock:
+            self.hits += 1
+        return pages
+
+    def put(self, key: str, pages: list[str], model: str):
+        path = self._path(key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        payload = json.dumps(
+            {"model": model, "created": time.time(), "pages": pages},
+            ensure_ascii=False,
+        ).encode("utf-8")
+
+        try:
+            replaced = path.stat().st_size
+        except FileNotFoundError:
+            replaced = 0
+
+        # Write to a temp file first so concurrent readers never see a partial entry
+        tmp = path.with_suffix(f".{os.getpid()}.{threading.get_ident()}.tmp")
+        tmp.write_bytes(payload)
+        os.replace(tmp, path)
+
+        with self._lock:
+            if self._size is None:
+                self._size = self._scan_size()
+            else:
+                self._size += len(payload) - replaced
+            over_budget = self._size > self.max_bytes
+        if over_budget:
+            self.evict()
+
+    def evict(self):
+        """Drop expired entries (by mtime, the write time), then least recently
+        read ones (by atime) until under max_bytes."""
+        now = time.time()
+        entries = []
+        for path in self.directory.glob("*/*.json"):
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                continue
+            if self._expired(stat.st_mtime, now):
+                self._remove(path, stat.st_size)
+            else:
+                entries.append((stat.st_atime, stat.st_size, path))
+
+        with self._lock:
+            self._size = sum(size for _, size, _ in entries)
+
+        entries.sort()
+        for _, size, path in entries:
+            with self._lock:
+                if self._size <= self.max_bytes:
+                    break
+            self._remove(path, size)
+
+    def _remove(self, path: Path, size: int):
+        try:
+            path.unlink()
+        except FileNotFoundError:
+            return
+        with self._lock:
+            if self._size is not None:
+                self._size -= size
+
+    def _scan_size(self) -> int:
+        total = 0
+        for path in self.directory.glob("*/*.json"):
+            try:
+                total += path.stat().st_size
+            except FileNotFoundError:
+                pass
+        return total
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses}
@@ -0,0 +1,337 @@
+"""
+Process-wide rate limiting for the Mistral and OpenRouter HTTP clients.
+
+Every request made through the shared clients in `src.config` goes through a
+`RateLimitedTransport`, which holds one `Limiter` per (provider, model):
+
+- a token bucket for requests/sec and, optionally, one for tokens/min
+  (request tokens estimated from the body size)
+- AIMD adaptive concurrency: the in-flight limit grows by ~1 per window of
+  successful requests and is halved on 429/503. A request holds its slot
+  until its response is closed, not just until the headers arrive
+- retries with full-jitter exponential backoff on 429/5xx and connection
+  errors, honouring Retry-After. A 429 also pauses the whole limiter for the
+  Retry-After period, so other workers back off too instead of piling on.
+  Each retry is reported to the document's profiler (`src.metrics`).
+
+Threads and event loops share the same limiters, so a thread-pool batch and
+an async batch in one process see the same budget.
+"""
+
+import asyncio
+import json
+import random
+import re
+import threading
+import time
+from email.utils import parsedate_to_datetime
+
+import httpx
+
+from src.config import (
+    RATE_LIMITS,
+    RATE_LIMIT_CONCURRENCY_INITIAL,
+    RATE_LIMIT_CONCURRENCY_MAX,
+    RATE_LIMIT_MAX_RETRIES,
+    RATE_LIMIT_BACKOFF_BASE,
+    RATE_LIMIT_BACKOFF_MAX,
+)
+from src.metrics import arecord_retry, record_retry
+
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+# Statuses that mean "you are sending too much", as opposed to a flaky server
+OVERLOAD_STATUSES = {429, 503}
+# At most one multiplicative decrease per this many seconds
+DECREASE_COOLDOWN = 1.0
+# How often async waiters re-check for a free concurrency slot
+ASYNC_POLL_SECONDS = 0.02
+
+
+class TokenBucket:
+    """Reservation-style bucket: `reserve()` takes tokens now and returns how
+    long the caller must wait before using them."""
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self, amount: float = 1.0) -> float:
+        with self._lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            self.tokens -= amount
+            return max(0.0, -self.tokens / self.rate)
+
+
+class AdaptiveConcurrency:
+    """AIMD limit on requests in flight."""
+
+    def __init__(self, initial: int, maximum: int, minimum: int = 1):
+        self.limit = float(initial)
+        self.minimum = minimum
+        self.maximum = maximum
+        self.in_flight = 0
+        self._last_decrease = 0.0
+        self._cond = threading.Condition()
+
+    def try_acquire(self) -> bool:
+        with self._cond:
+            if self.in_flight >= int(self.limit):
+                return False
+            self.in_flight += 1
+            return True
+
+    def acquire(self):
+        with self._cond:
+            while self.in_flight >= int(self.limit):
+                self._cond.wait()
+            self.in_flight += 1
+
+    async def aacquire(self):
+        while not self.try_acquire():
+            await asyncio.sleep(ASYNC_POLL_SECONDS)
+
+    def release(self, status: int | None):
+        """Free a slot. `status` is None when the request never got a response."""
+        with self._cond:
+            self.in_flight -= 1
+            # Latency is not a congestion signal here: an OCR call on a 50-page
+            # PDF is legitimately many times slower than a one-page one
+            if status in OVERLOAD_STATUSES:
+                self._decrease(0.5)
+            elif status is not None:
+                self.limit = min(self.maximum, self.limit + 1 / self.limit)
+            self._cond.notify_all()
+
+    def _decrease(self, factor: float):
+        now = time.monotonic()
+        if now - self._last_decrease >= DECREASE_COOLDOWN:
+            self.limit = max(self.minimum, self.limit * factor)
+            self._last_decrease = now
+
+
+class Limiter:
+    def __init__(self, rps: float, tpm: float = 0):
+        self.requests = TokenBucket(rps, max(1.0, rps)) if rps > 0 else None
+        self.tokens = TokenBucket(tpm / 60, tpm) if tpm > 0 else None
+        self.concurrency = AdaptiveConcurrency(RATE_LIMIT_CONCURRENCY_INITIAL, RATE_LIMIT_CONCURRENCY_MAX)
+        self.paused_until = 0.0
+        self.retries = 0
+        self.throttled = 0
+        self._lock = threading.Lock()
+
+    def _delay(self, tokens: int) -> float:
+        delay = self.paused_until - time.monotonic()
+        if self.requests:
+            delay = max(delay, self.requests.reserve())
+        if self.tokens and tokens:
+            delay = max(delay, self.tokens.reserve(tokens))
+        return max(delay, 0.0)
+
+    def acquire(self, tokens: int = 0):
+        delay = self._delay(tokens)
+        if delay:
+            time.sleep(delay)
+        self.concurrency.acquire()
+
+    async def aacquire(self, tokens: int = 0):
+        delay = self._delay(tokens)
+        if delay:
+            await asyncio.sleep(delay)
+        await self.concurrency.aacquire()
+
+    def release(self, status: int | None):
+        self.concurrency.release(status)
+
+    def backoff(self, attempt: int, response: httpx.Response | None) -> float:
+        """Seconds to wait before retry `attempt` (0-based)."""
+        delay = random.uniform(0, min(RATE_LIMIT_BACKOFF_MAX, RATE_LIMIT_BACKOFF_BASE * 2 ** attempt))
+        retry_after = _retry_after(response)
+        with self._lock:
+            self.retries += 1
+            if response is not None and response.status_code == 429:
+                self.throttled += 1
+            if retry_after is not None:
+                # Everyone sharing this limit waits out the provider's cool-down
+                self.paused_until = max(self.paused_until, time.monotonic() + retry_after)
+                delay = retry_after + random.uniform(0, RATE_LIMIT_BACKOFF_BASE)
+        return delay
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "concurrency_limit": round(self.concurrency.limit, 1),
+                "retries": self.retries,
+                "throttled": self.throttled,
+            }
+
+
+def _retry_after(response: httpx.Response | None) -> float | None:
+    value = response.headers.get("retry-after") if response is not None else None
+    if not value:
+        return None
+    try:
+        return min(max(float(value), 0.0), RATE_LIMIT_BACKOFF_MAX)
+    except ValueError:
+        pass
+    try:
+        return min(max(parsedate_to_datetime(value).timestamp() - time.time(), 0.0), RATE_LIMIT_BACKOFF_MAX)
+    except (TypeError, ValueError):
+        return None
+
+
+_limiters = {}
+_limiters_lock = threading.Lock()
+
+
+def get_limiter(provider: str, model: str) -> Limiter:
+    with _limiters_lock:
+        key = (provider, model)
+        if key not in _limiters:
+            settings = RATE_LIMITS.get(provider, {})
+            _limiters[key] = Limiter(settings.get("rps", 0), settings.get("tpm", 0))
+        return _limiters[key]
+
+
+def rate_limit_stats() -> dict:
+    with _limiters_lock:
+        limiters = dict(_limiters)
+    return {f"{provider}/{model}": limiter.stats() for (provider, model), limiter in limiters.items()}
+
+
+def _route(path: str) -> str:
+    """Resource a request path belongs to, ignoring API prefixes and ids:
+    `/v1/files`, `/v1/files/<id>` and `/v1/files/<id>/url` are all `files`."""
+    segments = [segment for segment in path.split("/") if segment]
+    while segments and (segments[0] == "api" or re.fullmatch(r"v\d+", segments[0])):
+        segments.pop(0)
+    return segments[0] if segments else "default"
+
+
+def _describe(request: httpx.Request) -> tuple[str, int]:
+    """(model, estimated prompt tokens) for a request; requests without a model
+    are keyed by route, so per-file calls share one limiter."""
+    if request.headers.get("content-type", "").startswith("application/json"):
+        try:
+            body = request.content
+            model = json.loads(body).get("model")
+            if model:
+                return model, len(body) // 4
+        except (httpx.RequestNotRead, ValueError, AttributeError):
+            pass
+    return _route(request.url.path), 0
+
+
+class _ReleasingStream(httpx.SyncByteStream):
+    """Response body that gives the concurrency slot back once it is closed."""
+
+    def __init__(self, stream: httpx.SyncByteStream, release):
+        self._stream = stream
+        self._release = release
+
+    def __iter__(self):
+        yield from self._stream
+
+    def close(self):
+        try:
+            self._stream.close()
+        finally:
+            self._release()
+
+
+class _AsyncReleasingStream(httpx.AsyncByteStream):
+    def __init__(self, stream: httpx.AsyncByteStream, release):
+        self._stream = stream
+        self._release = release
+
+    async def __aiter__(self):
+        async for chunk in self._stream:
+            yield chunk
+
+    async def aclose(self):
+        try:
+            await self._stream.aclose()
+        finally:
+            self._release()
+
+
+def _hold_slot(response: httpx.Response, limiter: Limiter, wrapper):
+    """Keep `response`'s concurrency slot until its body is closed."""
+    released = threading.Event()
+
+    def release():
+        if not released.is_set():
+            released.set()
+            limiter.release(response.status_code)
+
+    if response.is_closed:
+        # Body already read into memory (e.g. a transport that buffers it)
+        release()
+    else:
+        response.stream = wrapper(response.stream, release)
+
+
+class RateLimitedTransport(httpx.BaseTransport):
+    def __init__(self, provider: str, transport: httpx.BaseTransport):
+        self.provider = provider
+        self._transport = transport
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        model, tokens = _describe(request)
+        limiter = get_limiter(self.provider, model)
+        for attempt in range(RATE_LIMIT_MAX_RETRIES + 1):
+            limiter.acquire(tokens)
+            try:
+                response = self._transport.handle_request(request)
+            except httpx.TransportError:
+                limiter.release(None)
+                if attempt == RATE_LIMIT_MAX_RETRIES:
+                    raise
+                record_retry()
+                time.sleep(limiter.backoff(attempt, None))
+                continue
+            _hold_slot(response, limiter, _ReleasingStream)
+            if response.status_code not in RETRY_STATUSES or attempt == RATE_LIMIT_MAX_RETRIES:
+                return response
+            delay = limiter.backoff(attempt, response)
+            response.close()
+            record_retry(response.status_code)
+            time.sleep(delay)
+
+    def close(self):
+        self._transport.close()
+
+
+class AsyncRateLimitedTransport(httpx.AsyncBaseTransport):
+    def __init__(self, provider: str, transport: httpx.AsyncBaseTransport):
+        self.provider = provider
+        self._transport = transport
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        model, tokens = _describe(request)
+        limiter = get_limiter(self.provider, model)
+        for attempt in range(RATE_LIMIT_MAX_RETRIES + 1):
+            await limiter.aacquire(tokens)
+            try:
+                response = await self._transport.handle_async_request(request)
+            except httpx.TransportError:
+                limiter.release(None)
+                if attempt == RATE_LIMIT_MAX_RETRIES:
+                    raise
+                await arecord_retry()
+                await asyncio.sleep(limiter.backoff(attempt, None))
+                continue
+            _hold_slot(response, limiter, _AsyncReleasingStream)
+            if response.status_code not in RETRY_STATUSES or attempt == RATE_LIMIT_MAX_RETRIES:
+                return response
+            delay = limiter.backoff(attempt, response)
+            await response.aclose()
+            await arecord_retry(response.status_code)
+            await asyncio.sleep(delay)
+
+    async def aclose(self):
+        await self._transport.aclose()
@@ -0,0 +1,206 @@
+"""
+Deterministic pre-judge for extractions.
+
+Mechanically checks the facts the LLM judge is asked to verify - emails,
+phones, names, companies, YYYY-MM dates and technical skills - against the
+source markdown. Clear passes and clear failures return a `judgeJson` and skip
+the LLM judge; anything in between returns None and goes to the LLM.
+"""
+
+import re
+
+from src.config import RULE_JUDGE_MIN_SKILL_GROUNDING
+from src.validation_models.jd import JobDescription
+from src.validation_models.judge import judgeJson
+from src.validation_models.resume import ResumeData
+
+EMAIL = re.compile(r"[\w.+-]+@[\w-]+(\.[\w-]+)+")
+YEAR_MONTH = re.compile(r"^(\d{4})-(\d{2})$")
+MONTHS = [
+    ("jan", "january"), ("feb", "february"), ("mar", "march"), ("apr", "april"), ("may", "may"), ("jun", "june"),
+    ("jul", "july"), ("aug", "august"), ("sep", "sept", "september"), ("oct", "october"), ("nov", "november"),
+    ("dec", "december"),
+]
+# Word characters for boundary checks; + and # keep "C", "C++" and "C#" apart
+WORD_CHARS = "a-z0-9+#"
+# Names this short are only grounded by an identical token ("Go", "R", "C")
+SHORT_NAME = 3
+
+# Skill categories that must be stated in the text (soft/domain skills may be inferred)
+RESUME_TECH_SKILLS = ["programming_languages", "frameworks_and_libraries", "tools_and_platforms", "databases", "cloud_and_infra"]
+JD_TECH_SKILLS = ["programming_languages", "frameworks_and_libraries", "tools", "databases", "cloud_and_infra"]
+
+
+class _Source:
+    """Normalised views of the source markdown for whole-word checks."""
+
+    def __init__(self, markdown: str):
+        self.text = re.sub(r"\s+", " ", markdown.lower())
+        self.digits = re.sub(r"\D", "", markdown)
+        words = re.findall(rf"[{WORD_CHARS}]+", self.text)
+        self.tokens = set(words)
+        # Words separated by single spaces, for spelling variants like "Node.js" / "NodeJS" / "node js"
+        self.spaced = " " + " ".join(words) + " "
+
+    def contains(self, value: str) -> bool:
+        """`value` appears as whole words: "Java" is not found in "JavaScript"."""
+        value = re.sub(r"\s+", " ", value.lower().strip())
+        words = re.findall(rf"[{WORD_CHARS}]+", value)
+        if not words:
+            return False
+        if len("".join(words)) <= SHORT_NAME:
+            return len(words) == 1 and words[0] in self.tokens
+        if re.search(rf"(?<![{WORD_CHARS}]){re.escape(value)}(?![{WORD_CHARS}])", self.text):
+            return True
+        # Same characters split at different places: word runs may be joined or split by punctuation
+        chars = "".join(words)
+        pattern = " ?".join(re.escape(c) for c in chars)
+        return re.search(rf" {pattern} ", self.spaced) is not None
+
+    def contains_tokens(self, value: str) -> bool:
+        """Every word of `value` is a word of the text (tolerates reordering like "Doe, John")."""
+        words = re.findall(rf"[{WORD_CHARS}]+", value.lower())
+        return bool(words) and all(w in self.tokens for w in words)
+
+    def contains_phone(self, value: str) -> bool:
+        digits = re.sub(r"\D", "", value)
+        # Compare the national number so "+91 98..." matches "98..."
+        return len(digits) >= 7 and digits[-10:] in self.digits
+
+    def date_support(self, value: str) -> str:
+        """'exact' if the month+year is found, 'year' if only the year is, else 'none'."""
+        m = YEAR_MONTH.match(value.strip())
+        if not m:
+            return "exact" if self.contains(value) else "none"
+        year, month = m.group(1), int(m.group(2))
+        if not re.search(rf"\b{year}\b", self.text):
+            return "none"
+        if not 1 <= month <= 12:
+            return "year"
+        names = "|".join(MONTHS[month - 1])
+        patterns = [
+            rf"\b({names})\b\.?,?\s?['’]?({year}|{year[2:]})\b",
+            rf"\b0?{month}\s*[/.-]\s*{year}\b",
+            rf"\b{year}\s*[/.-]\s*0?{month}\b",
+        ]
+        return "exact" if any(re.search(p, self.text) for p in patterns) else "year"
+
+
+class _Checks:
+    def __init__(self):
+        self.failures = []
+        self.uncertain = []
+        self.verified = 0
+
+    def hard(self, ok: bool, message: str):
+        if ok:
+            self.verified += 1
+        else:
+            self.failures.append(message)
+
+    def soft(self, ok: bool, message: str):
+        if ok:
+            self.verified += 1
+        else:
+            self.uncertain.append(message)
+
+    def skills(self, source: _Source, skills: list[str], label: str):
+        if not skills:
+            return
+        # Only a contiguous whole-word match counts; words scattered over the text are partial evidence
+        ungrounded = [s for s in skills if not source.contains(s)]
+        grounded_ratio = 1 - len(ungrounded) / len(skills)
+        if grounded_ratio < 0.5:
+            self.failures.append(f"{label} not found in the text: {', '.join(ungrounded)}")
+        elif grounded_ratio < RULE_JUDGE_MIN_SKILL_GROUNDING:
+            self.uncertain.append(f"{label} not found in the text: {', '.join(ungrounded)}")
+        else:
+            self.verified += len(skills) - len(ungrounded)
+
+    def verdict(self) -> judgeJson | None:
+        if self.failures:
+            return judgeJson(grade="FAIL", grade_summary="Rule check: " + "; ".join(self.failures))
+        if not self.uncertain:
+            return judgeJson(grade="PASS", grade_summary=f"Rule check: all {self.verified} checked facts found in the source text")
+        return None
+
+
+def check_resume(markdown: str, data: ResumeData) -> judgeJson | None:
+    source = _Source(markdown)
+    checks = _Checks()
+
+    contact = data.contact_info
+    for label, email in (("primary email", contact.primary_email), ("secondary email", contact.secondary_email)):
+        if email:
+            checks.hard(source.contains(email), f"{label} '{email}' not in the text")
+    if not contact.primary_email and EMAIL.search(markdown):
+        checks.failures.append("primary email is null but an email is visible in the text")
+
+    for label, phone in (("primary phone", contact.primary_phone_number), ("secondary phone", contact.secondary_phone_number)):
+        if phone:
+            checks.hard(source.contains_phone(phone), f"{label} '{phone}' not in the text")
+
+    name = data.personal_info.full_name
+    checks.hard(bool(name and name.strip()), "full_name is empty")
+    if name and name.strip():
+        checks.soft(source.contains_tokens(name), f"name '{name}' not found verbatim")
+
+    dates = []
+    for job in data.work_experience_info:
+        if job.company_name:
+            checks.soft(source.contains(job.company_name) or source.contains_tokens(job.company_name),
+                        f"company '{job.company_name}' not found verbatim")
+        dates += [("work", job.start_date), ("work", job.end_date)]
+    for edu in data.education_info:
+        if edu.institution_name:
+            checks.soft(source.contains(edu.institution_name) or source.contains_tokens(edu.institution_name),
+                        f"institution '{edu.institution_name}' not found verbatim")
+        dates += [("education", edu.start_date), ("education", edu.end_date)]
+
+    for label, date in dates:
+        if not date:
+            continue
+        support = source.date_support(date)
+        checks.hard(support != "none", f"{label} date '{date}' not supported by the text")
+        if support == "year":
+            checks.uncertain.append(f"{label} date '{date}': only the year was found")
+
+    if not data.work_experience_info and not data.education_info:
+        checks.uncertain.append("no education or work experience extracted")
+
+    for field in RESUME_TECH_SKILLS:
+        checks.skills(source, getattr(data.skills_info, field), field)
+
+    return checks.verdict()
+
+
+def check_jd(markdown: str, data: JobDescription) -> judgeJson | None:
+    source = _Source(markdown)
+    checks = _Checks()
+
+    checks.soft(source.contains_tokens(data.role_title), f"role title '{data.role_title}' not found verbatim")
+    if data.company_name:
+        checks.soft(source.contains(data.company_name) or source.contains_tokens(data.company_name),
+                    f"company '{data.company_name}' not found verbatim")
+    if data.salary_range:
+        numbers = re.findall(r"\d+", data.salary_range)
+        checks.hard(all(re.search(rf"(?<!\d){n}(?!\d)", source.text) for n in numbers), f"salary '{data.salary_range}' not in the text")
+    if data.min_years_experience is not None:
+        years = re.search(rf"\b{data.min_years_experience}\s*\+?\s*(-\s*\d+\s*)?(years?|yrs?)", source.text)
+        checks.soft(bool(years), f"'{data.min_years_experience} years' not found")
+
+    mandatory = [getattr(data.mandatory_skills, field) for field in JD_TECH_SKILLS]
+    if not any(mandatory):
+        checks.uncertain.append("no mandatory skills extracted")
+    for field in JD_TECH_SKILLS:
+        checks.skills(source, getattr(data.mandatory_skills, field), f"mandatory {field}")
+    checks.skills(source, data.optional_skills, "optional_skills")
+
+    return checks.verdict()
+
+
+def rule_judge(source: str, markdown: str, data) -> judgeJson | None:
+    """Deterministic verdict for a "resume"/"jd" extraction, or None to defer to the LLM judge."""
+    if source == "resume":
+        return check_resume(markdown, data)
+    return check_jd(markdown, data)
@@ -0,0 +1,339 @@
+"""
+Output sinks for batch runs.
+
+- `json`    one pretty-printed `<name>.json` / `<name>.error.json` per document
+- `jsonl`   one flat record per line, appended in buffered writes
+- `parquet` the same flat records as columnar files, one complete file per buffer
+
+The streaming sinks write `results-<run id>.jsonl` / `results-<run id>-<part>.parquet`
+so reruns never rewrite earlier files; the `results-*` files of a folder load
+in a single sequential read (one `pyarrow.dataset.dataset(paths)`). A later
+record for the same `file` supersedes an earlier one.
+
+`write(record, on_written)` calls `on_written()` once the record is on disk in
+every sink, i.e. after the buffer holding it was flushed. Callers record
+progress (manifest, work queue) from there, so a crash never marks a document
+done whose row was still buffered.
+"""
+
+import abc
+import json
+import os
+import threading
+import time
+import traceback
+import types
+import typing
+from pathlib import Path
+
+from pydantic import BaseModel
+
+from src.config import SINK_BUFFER_ROWS
+from src.validation_models.jd import JobDescription
+from src.validation_models.resume import ResumeData
+
+SINK_NAMES = ("json", "jsonl", "parquet")
+
+# kind -> (result key, extraction model)
+DATA = {
+    "resume": ("resume_data", ResumeData),
+    "jd": ("jd_data", JobDescription),
+}
+
+
+############## Per-document record #####################
+
+def document_record(kind: str, file: Path, started_at: float, result: dict | None = None,
+                    error: Exception | None = None) -> dict:
+    """Everything the sinks need about one processed document."""
+    data_key, _ = DATA[kind]
+    record = {
+        "file": file.name,
+        "path": str(file),
+        "kind": kind,
+        "started_at": started_at,
+        "duration_s": round(time.time() - started_at, 3),
+        "status": "ERROR",
+        "error": None,
+        "traceback": None,
+        "output": None,
+        "metrics": None,
+    }
+    if error is not None:
+        record["error"] = str(error)
+        record["traceback"] = "".join(traceback.format_exception(error))
+        return record
+
+    output = {
+        data_key: result[data_key].model_dump(),
+        "judge_results": result.get("judge_results", []),
+        "reflection_loop": result.get("reflection_loop", 0),
+        "compaction_stats": result.get("compaction_stats", []),
+        "duplicate_of": result.get(f"{kind}_duplicate_of"),
+    }
+    grades = [jr["grade"].upper() for jr in output["judge_results"]]
+    record["status"] = "PASS" if grades and all(g == "PASS" for g in grades) else "FAIL"
+    record["output"] = output
+    return record
+
+
+def flat_record(record: dict) -> dict:
+    """One flat row: run metadata, judge outcome, token stats, profile and the extracted fields."""
+    data_key, model_cls = DATA[record["kind"]]
+    output = record["output"] or {}
+    metrics = record.get("metrics") or {}
+    judge_results = output.get("judge_results", [])
+    compaction = output.get("compaction_stats", [])
+    duplicate = output.get("duplicate_of") or {}
+
+    flat = {
+        "file": record["file"],
+        "kind": record["kind"],
+        "status": record["status"],
+        "error": record["error"],
+        "started_at": record["started_at"],
+        "duration_s": record["duration_s"],
+        "reflection_loop": output.get("reflection_loop"),
+        "judge_grades": [jr["grade"] for jr in judge_results],
+        "judge_results": json.dumps(judge_results, ensure_ascii=False),
+        "tokens_before": sum(s.get("tokens_before", 0) for s in compaction) if compaction else None,
+        "tokens_after": sum(s.get("tokens_after", 0) for s in compaction) if compaction else None,
+        "duplicate_of": duplicate.get("document"),
+        "duplicate_similarity": duplicate.get("similarity"),
+        "duplicate_action": duplicate.get("action"),
+        # Only filled when the run is profiled (batch.py --profile)
+        "input_tokens": metrics.get("input_tokens"),
+        "output_tokens": metrics.get("output_tokens"),
+        "bytes_uploaded": metrics.get("bytes_uploaded"),
+        "retries": metrics.get("retries"),
+        "cost_usd": metrics.get("cost_usd"),
+        "stage_seconds": json.dumps(metrics["stage_seconds"]) if metrics else None,
+    }
+    data = output.get(data_key) or {}
+    for column, annotation in _model_columns(model_cls).items():
+        value = data
+        for part in column.split("."):
+            value = value.get(part) if isinstance(value, dict) else None
+        if value is not None and _is_object_list(annotation):
+            value = json.dumps(value, ensure_ascii=False)
+        flat[f"{data_key}.{column}"] = value
+    return flat
+
+
+def _model_columns(model_cls: type[BaseModel], prefix: str = "") -> dict:
+    """Dotted column name -> field annotation; nested models are flattened."""
+    columns = {}
+    for name, field in model_cls.model_fields.items():
+        if isinstance(field.annotation, type) and issubclass(field.annotation, BaseModel):
+            columns.update(_model_columns(field.annotation, f"{prefix}{name}."))
+        else:
+            columns[f"{prefix}{name}"] = field.annotation
+    return columns
+
+
+def _is_object_list(annotation) -> bool:
+    """Lists of objects (education, work experience) are stored as JSON strings."""
+    return typing.get_origin(annotation) is list and typing.get_args(annotation) != (str,)
+
+
+############## Sinks #####################
+
+class JsonFileSink:
+    """The original layout: one indented JSON file per document."""
+
+    def __init__(self, output_path: Path):
+        self.output_path = output_path
+
+    def write(self, record: dict, on_written=None):
+        stem = Path(record["file"]).stem
+        if record["output"] is None:
+            with open(self.output_path / f"{stem}.error.json", "w", encoding="utf-8") as f:
+                json.dump({"file": record["path"], "error": record["error"], "traceback": record["traceback"]}, f, indent=4)
+        else:
+            output = record["output"] if record["metrics"] is None else {**record["output"], "metrics": record["metrics"]}
+            with open(self.output_path / f"{stem}.json", "w", encoding="utf-8") as f:
+                json.dump(output, f, indent=4, ensure_ascii=False)
+            # A success supersedes the error file of an earlier run
+            (self.output_path / f"{stem}.error.json").unlink(missing_ok=True)
+        if on_written is not None:
+            on_written()
+
+    def close(self):
+        pass
+
+
+class _BufferedSink(abc.ABC):
+    """Collects flat records and hands them to `_flush` every `buffer_rows`.
+
+    The `on_written` callbacks of a buffer run after it was flushed (outside
+    the lock). If a flush fails, its rows are dropped and their callbacks never
+    run, so those documents are not marked done and get processed again.
+    """
+
+    def __init__(self, buffer_rows: int):
+        self.buffer_rows = buffer_rows
+        self._buffer = []
+        self._callbacks = []
+        self._lock = threading.Lock()
+
+    def write(self, record: dict, on_written=None):
+        row = flat_record(record)
+        with self._lock:
+            self._buffer.append(row)
+            if on_written is not None:
+                self._callbacks.append(on_written)
+            written = self._drain() if len(self._buffer) >= self.buffer_rows else []
+        for callback in written:
+            callback()
+
+    def close(self):
+        with self._lock:
+            try:
+                written = self._drain() if self._buffer else []
+            finally:
+                self._close()
+        for callback in written:
+            callback()
+
+    def _drain(self) -> list:
+        rows, callbacks = self._buffer, self._callbacks
+        self._buffer, self._callbacks = [], []
+        self._flush(rows)
+        return callbacks
+
+    @abc.abstractmethod
+    def _flush(self, rows: list[dict]):
+        """Write `rows` durably; a later crash must not lose them."""
+
+    def _close(self):
+        pass
+
+
+class JsonlSink(_BufferedSink):
+    def __init__(self, path: Path, buffer_rows: int = SINK_BUFFER_ROWS):
+        super().__init__(buffer_rows)
+        self.path = path
+        self._file = open(path, "a", encoding="utf-8")
+
+    def _flush(self, rows: list[dict]):
+        self._file.write("".join(json.dumps(row, ensure_ascii=False) + "\n" for row in rows))
+        self._file.flush()
+
+    def _close(self):
+        self._file.close()
+
+
+def _arrow_type(annotation):
+    import pyarrow as pa
+
+    args = [a for a in typing.get_args(annotation) if a is not type(None)]
+    if isinstance(annotation, types.UnionType) or typing.get_origin(annotation) is typing.Union:
+        return _arrow_type(args[0])
+    if typing.get_origin(annotation) is list:
+        return pa.string() if _is_object_list(annotation) else pa.list_(pa.string())
+    return {int: pa.int64(), float: pa.float64(), bool: pa.bool_()}.get(annotation, pa.string())
+
+
+def arrow_schema(kind: str):
+    """Fixed schema per kind so every row group (and every run) has the same columns."""
+    import pyarrow as pa
+
+    data_key, model_cls = DATA[kind]
+    fields = [
+        ("file", pa.string()),
+        ("kind", pa.string()),
+        ("status", pa.string()),
+        ("error", pa.string()),
+        ("started_at", pa.float64()),
+        ("duration_s", pa.float64()),
+        ("reflection_loop", pa.int64()),
+        ("judge_grades", pa.list_(pa.string())),
+        ("judge_results", pa.string()),
+        ("tokens_before", pa.int64()),
+        ("tokens_after", pa.int64()),
+        ("duplicate_of", pa.string()),
+        ("duplicate_similarity", pa.float64()),
+        ("duplicate_action", pa.string()),
+        ("input_tokens", pa.int64()),
+        ("output_tokens", pa.int64()),
+        ("bytes_uploaded", pa.int64()),
+        ("retries", pa.int64()),
+        ("cost_usd", pa.float64()),
+        ("stage_seconds", pa.string()),
+    ]
+    fields += [(f"{data_key}.{name}", _arrow_type(annotation)) for name, annotation in _model_columns(model_cls).items()]
+    return pa.schema(fields)
+
+
+class ParquetSink(_BufferedSink):
+    """One complete Parquet file per flush (`<prefix>-00001.parquet`, ...).
+
+    A single long-lived ParquetWriter only gets its footer on close, so a
+    killed run would leave every row it had already flushed unreadable.
+    """
+
+    def __init__(self, output_path: Path, prefix: str, kind: str, buffer_rows: int = SINK_BUFFER_ROWS):
+        super().__init__(buffer_rows)
+        self.output_path = output_path
+        self.prefix = prefix
+        self.schema = arrow_schema(kind)
+        self.parts = 0
+
+    def _flush(self, rows: list[dict]):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        self.parts += 1
+        path = self.output_path / f"{self.prefix}-{self.parts:05d}.parquet"
+        # Outside the results-* glob until complete
+        tmp = self.output_path / f".{path.name}.{os.getpid()}.tmp"
+        pq.write_table(pa.Table.from_pylist(rows, schema=self.schema), tmp, compression="zstd")
+        os.replace(tmp, path)
+
+
+class Sinks:
+    """Fan each record out to every configured sink."""
+
+    def __init__(self, sinks: list):
+        self.sinks = sinks
+
+    def write(self, record: dict, on_written=None):
+        """Hand `record` to every sink; `on_written()` runs once all of them have it on disk."""
+        if on_written is None or not self.sinks:
+            for sink in self.sinks:
+                sink.write(record)
+            if on_written is not None:
+                on_written()
+            return
+
+        pending = [len(self.sinks)]
+        lock = threading.Lock()
+
+        def written():
+            with lock:
+                pending[0] -= 1
+                last = pending[0] == 0
+            if last:
+                on_written()
+
+        for sink in self.sinks:
+            sink.write(record, written)
+
+    def close(self):
+        for sink in self.sinks:
+            sink.close()
+
+
+def open_sinks(names: list[str], kind: str, output_path: Path, run_id: str | None = None) -> Sinks:
+    run_id = run_id or time.strftime("%Y%m%dT%H%M%S")
+    sinks = []
+    for name in names:
+        if name == "json":
+            sinks.append(JsonFileSink(output_path))
+        elif name == "jsonl":
+            sinks.append(JsonlSink(output_path / f"results-{run_id}.jsonl"))
+        elif name == "parquet":
+            sinks.append(ParquetSink(output_path, f"results-{run_id}", kind))
+        else:
+            raise ValueError(f"Unknown sink '{name}' (expected one of: {', '.join(SINK_NAMES)})")
+    return Sinks(sinks)
@@ -0,0 +1,72 @@
+import json
+import os
+import threading
+import time
+from pathlib import Path
+
+
+class UploadRegistry:
+    """Persistent map of file content hash -> Mistral file_id + signed URL.
+
+    Lets large documents be uploaded once and reused across runs: a live
+    signed URL is reused as-is, an expired one only needs a fresh
+    `get_signed_url` for the existing file_id.
+    """
+
+    # Don't hand out URLs that could expire before Mistral fetches them
+    EXPIRY_MARGIN_SECONDS = 600
+
+    def __init__(self, path: str):
+        self.path = Path(path)
+        self._lock = threading.Lock()
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                self._entries = json.load(f)
+        except (FileNotFoundError, ValueError):
+            self._entries = {}
+
+    def get(self, key: str) -> dict | None:
+        with self._lock:
+            entry = self._entries.get(key)
+            return dict(entry) if entry else None
+
+    def live_url(self, key: str) -> str | None:
+        entry = self.get(key)
+        if entry and entry["expires_at"] - time.time() > self.EXPIRY_MARGIN_SECONDS:
+            return entry["url"]
+        return None
+
+    def put(self, key: str, file_id: str, url: str, expiry_hours: int):
+        now = time.time()
+        with self._lock:
+            uploaded_at = self._entries.get(key, {}).get("uploaded_at", now)
+            self._entries[key] = {
+                "file_id": file_id,
+                "url": url,
+                "uploaded_at": uploaded_at,
+                "expires_at": now + expiry_hours * 3600,
+            }
+            self._save()
+
+    def drop(self, key: str):
+        """Forget an entry whose file no longer exists in Mistral storage."""
+        with self._lock:
+            if self._entries.pop(key, None) is not None:
+                self._save()
+
+    def pop_stale(self, older_than_hours: float) -> list[str]:
+        """Forget entries uploaded before the cutoff; return their file_ids."""
+        cutoff = time.time() - older_than_hours * 3600
+        with self._lock:
+            stale = [k for k, e in self._entries.items() if e["uploaded_at"] < cutoff]
+            file_ids = [self._entries.pop(k)["file_id"] for k in stale]
+            if stale:
+                self._save()
+        return file_ids
+
+    def _save(self):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_suffix(f".{os.getpid()}.{threading.get_ident()}.tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(self._entries, f)
+        os.replace(tmp, self.path)
@@ -84,3 +84,18 @@ class ResumeData(BaseModel):
     education_info: list[educationInfo] = Field(..., description="Education information of the candidate")
     work_experience_info: list[workExperienceInfo] = Field(..., description="Work experience information of the candidate")
     skills_info: skillsInfo = Field(..., description="Skills information of the candidate")
+
+
+# --- Per-section models for sectioned extraction (merged back into ResumeData) ---
+
+class identityInfo(BaseModel):
+    personal_info: personalInfo = Field(..., description="Personal information of the candidate")
+    contact_info: contactInfo = Field(..., description="Contact information of the candidate")
+
+
+class educationList(BaseModel):
+    education_info: list[educationInfo] = Field(default=[], description="Education information of the candidate")
+
+
+class workExperienceList(BaseModel):
+    work_experience_info: list[workExperienceInfo] = Field(default=[], description="Work experience information of the candidate")
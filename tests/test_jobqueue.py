@@ -0,0 +1,15 @@
+from src.jobqueue import JobQueue
+
+
+def test_same_content_under_another_name_maps_to_the_existing_job(tmp_path):
+    queue = JobQueue(str(tmp_path / "jobs.sqlite"))
+    output = tmp_path / "out"
+
+    added, skipped = queue.enqueue("resume", [(tmp_path / "a.pdf", "sha-a"), (tmp_path / "b.pdf", "sha-b")], "v1", output)
+    assert (added, skipped) == (2, [])
+
+    added, skipped = queue.enqueue("resume", [(tmp_path / "copy_of_a.pdf", "sha-a")], "v1", output)
+    assert added == 0
+    assert [(s["file"], s["id"], s["path"], s["status"]) for s in skipped] == [
+        (str(tmp_path / "copy_of_a.pdf"), 1, str(tmp_path / "a.pdf"), "queued")
+    ]
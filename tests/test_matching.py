@@ -0,0 +1,26 @@
+from datetime import date
+
+from src.matching import experience_years
+
+TODAY = date(2026, 1, 1)
+
+
+def test_only_the_current_role_runs_to_today():
+    roles = [
+        {"start_date": "2015-01", "end_date": None, "is_current_role": "No"},
+        {"start_date": "2024-01", "end_date": None, "is_current_role": "Yes"},
+    ]
+    # 2015 counts to the end of its start year, the current role 2024-01..today
+    assert experience_years(roles, TODAY) == 3.0
+
+
+def test_present_end_date_means_current():
+    assert experience_years([{"start_date": "2025-01", "end_date": "Present"}], TODAY) == 1.0
+
+
+def test_overlapping_roles_counted_once():
+    roles = [
+        {"start_date": "2020-01", "end_date": "2022-01"},
+        {"start_date": "2021-01", "end_date": "2023-01"},
+    ]
+    assert experience_years(roles, TODAY) == 3.0
@@ -0,0 +1,50 @@
+import asyncio
+
+import httpx
+from langchain_core.runnables import RunnableLambda
+
+from src.metrics import DocumentProfiler
+from src.ratelimit import AsyncRateLimitedTransport, RateLimitedTransport
+
+
+def _throttle_once():
+    """Answers 429 (Retry-After: 0) to the first request and 200 afterwards."""
+    calls = []
+
+    def handler(request):
+        calls.append(request)
+        if len(calls) == 1:
+            return httpx.Response(429, headers={"retry-after": "0"})
+        return httpx.Response(200, json={"ok": True})
+
+    return handler, calls
+
+
+def test_http_429_counts_as_document_retry():
+    handler, calls = _throttle_once()
+    client = httpx.Client(transport=RateLimitedTransport("test-sync", httpx.MockTransport(handler)))
+    profiler = DocumentProfiler()
+
+    status = RunnableLambda(lambda _: client.post("http://api.test/v1/chat", json={"model": "m"}).status_code).invoke(
+        None, config={"callbacks": [profiler]}
+    )
+
+    assert status == 200
+    assert len(calls) == 2
+    assert profiler.retries == 1
+
+
+def test_http_429_counts_as_document_retry_async():
+    handler, calls = _throttle_once()
+    client = httpx.AsyncClient(transport=AsyncRateLimitedTransport("test-async", httpx.MockTransport(handler)))
+    profiler = DocumentProfiler()
+
+    async def call(_):
+        response = await client.post("http://api.test/v1/chat", json={"model": "m"})
+        return response.status_code
+
+    status = asyncio.run(RunnableLambda(call).ainvoke(None, config={"callbacks": [profiler]}))
+
+    assert status == 200
+    assert len(calls) == 2
+    assert profiler.retries == 1
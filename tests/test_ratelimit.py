@@ -0,0 +1,39 @@
+import httpx
+
+from src.ratelimit import RateLimitedTransport, _describe, get_limiter
+
+
+def test_requests_without_model_are_keyed_by_route():
+    keys = {
+        _describe(httpx.Request("POST", "https://api.mistral.ai/v1/files", files={"file": b"x"})),
+        _describe(httpx.Request("GET", "https://api.mistral.ai/v1/files/abc-123/url")),
+        _describe(httpx.Request("DELETE", "https://api.mistral.ai/v1/files/def-456")),
+    }
+    assert keys == {("files", 0)}
+    assert _describe(httpx.Request("POST", "https://api.mistral.ai/v1/ocr", json={"model": "mistral-ocr"}))[0] == "mistral-ocr"
+
+
+def test_slot_is_held_until_the_body_is_read():
+    # A generator body, so the response is streamed rather than buffered by the mock
+    transport = RateLimitedTransport(
+        "test-slot", httpx.MockTransport(lambda request: httpx.Response(200, content=iter([b"o", b"k"])))
+    )
+    concurrency = get_limiter("test-slot", "chat").concurrency
+
+    with httpx.Client(transport=transport) as client:
+        with client.stream("GET", "http://api.test/v1/chat") as response:
+            assert concurrency.in_flight == 1
+            response.read()
+            assert concurrency.in_flight == 0
+
+
+def test_slow_responses_do_not_shrink_the_limit():
+    concurrency = get_limiter("test-aimd", "m").concurrency
+    start = concurrency.limit
+    for _ in range(3):
+        concurrency.acquire()
+        concurrency.release(200)
+    assert concurrency.limit > start
+    concurrency.acquire()
+    concurrency.release(429)
+    assert concurrency.limit < start
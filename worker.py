@@ -0,0 +1,209 @@
+"""
+Batch extraction spread over any number of worker processes and hosts.
+
+Documents are enqueued once into a SQLite work queue (src/jobqueue.py); each
+worker claims a few at a time under a lease, runs them through the graph and
+writes the results to the job's output folder. Point every worker at the same
+queue file (shared storage across hosts: set JOBQUEUE_JOURNAL_MODE=DELETE).
+
+Usage:
+    python worker.py enqueue --kind resume --input data/ --output output/resumes/
+    python worker.py work --workers 8                    # start as many of these as the quotas allow
+    python worker.py work --workers 8 --exit-when-empty --sink json,parquet
+    python worker.py status
+    python worker.py requeue-failed
+
+A job is completed in the queue only once its record is on disk in every
+sink, so rows still buffered when a worker dies are redone. A crashed
+worker's jobs are picked up by the others once its leases expire
+(JOBQUEUE_LEASE_SECONDS). Ctrl-C stops claiming and drains the documents in
+flight; a second Ctrl-C writes out what has finished, hands the unfinished
+jobs back to the queue and exits without waiting for them.
+"""
+
+import argparse
+import os
+import socket
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from pathlib import Path
+
+from batch import KINDS, SUPPORTED_EXTENSIONS, process_file
+from src.config import JOBQUEUE_PATH, JOBQUEUE_LEASE_SECONDS
+from src.graph.workflow import build_graph
+from src.jobqueue import JobQueue
+from src.manifest import file_sha256, pipeline_version
+from src.sinks import SINK_NAMES, Sinks, open_sinks
+
+# How often an idle worker asks the queue for work
+POLL_SECONDS = 2.0
+
+
+def enqueue(queue: JobQueue, kind: str, input_folder: str, output_folder: str):
+    input_path = Path(input_folder)
+    found = sorted(f for f in input_path.iterdir() if f.suffix.lower() in SUPPORTED_EXTENSIONS)
+    if not found:
+        print(f"No PDF/DOCX files found in: {input_path.resolve()}")
+        return
+    version = pipeline_version()
+    added, skipped = queue.enqueue(kind, [(f, file_sha256(f)) for f in found], version, Path(output_folder))
+    # Same content under another name: its result is the earlier job's
+    for dup in skipped:
+        if dup["file"] != dup["path"]:
+            print(f"  {Path(dup['file']).name}: same content as job {dup['id']} ({dup['path']}, {dup['status']})")
+    print(f"Enqueued {added} of {len(found)} files (pipeline {version}); "
+          f"{len(skipped)} already queued or done")
+
+
+def work(queue: JobQueue, workers: int, lease_seconds: float = JOBQUEUE_LEASE_SECONDS,
+         sink_names: tuple[str, ...] = ("json",), llm_cache: bool = True, exit_when_empty: bool = False):
+    owner = f"{socket.gethostname()}:{os.getpid()}"
+    # Per-process result files, so workers never append to the same JSONL/Parquet file
+    run_id = f"{time.strftime('%Y%m%dT%H%M%S')}-{socket.gethostname()}-{os.getpid()}"
+    graph = build_graph()
+    config = {"configurable": {"llm_cache_bypass": not llm_cache}}
+    heartbeat_every = lease_seconds / 3
+
+    sinks: dict[tuple[str, str], Sinks] = {}
+
+    def sinks_for(job: dict) -> Sinks:
+        key = (job["kind"], job["output"])
+        if key not in sinks:
+            output_path = Path(job["output"])
+            output_path.mkdir(parents=True, exist_ok=True)
+            sinks[key] = open_sinks(sink_names, job["kind"], output_path, run_id)
+        return sinks[key]
+
+    print(f"Worker {owner}: {workers} slots, lease {lease_seconds:.0f}s, sinks {', '.join(sink_names)}")
+    counts = {"PASS": 0, "FAIL": 0, "ERROR": 0, "lost": 0}
+    in_flight = {}
+    # Finished documents whose record may still be buffered in a sink; their leases are kept alive
+    unwritten = {}
+    # (job, outcome) once the record is on disk in every sink; appended from pool threads
+    written = deque()
+
+    def on_written(job: dict):
+        return lambda outcome: written.append((job, outcome))
+
+    def settle():
+        while written:
+            job, outcome = written.popleft()
+            unwritten.pop(job["id"], None)
+            kept = queue.complete(owner, job["id"], outcome["verdict"], outcome["error"])
+            counts[outcome["verdict"] if kept else "lost"] += 1
+            line = f"{Path(job['path']).name:<50}  {outcome['verdict']} (attempt {job['attempts']})"
+            if outcome["verdict"] == "ERROR":
+                line += f": {outcome['error']}"
+            if not kept:
+                line += "  [lease lost, reassigned]"
+            print(line, flush=True)
+
+    draining = abandoned = False
+    next_heartbeat = time.monotonic() + heartbeat_every
+    pool = ThreadPoolExecutor(max_workers=workers)
+    try:
+        while True:
+            try:
+                if not draining and len(in_flight) < workers:
+                    for job in queue.claim(owner, workers - len(in_flight), lease_seconds):
+                        future = pool.submit(process_file, graph, job["kind"], Path(job["path"]), sinks_for(job),
+                                             config, None, on_written(job))
+                        in_flight[future] = job
+                if not in_flight:
+                    if draining or exit_when_empty:
+                        break
+                    time.sleep(POLL_SECONDS)
+                    continue
+
+                timeout = max(0.0, min(POLL_SECONDS, next_heartbeat - time.monotonic()))
+                done, _ = wait(in_flight, timeout=timeout, return_when=FIRST_COMPLETED)
+                for future in done:
+                    job = in_flight.pop(future)
+                    unwritten[job["id"]] = job
+                    try:
+                        future.result()
+                    except Exception as e:
+                        # process_file records pipeline and sink failures itself; nothing else may
+                        # take the worker down while it holds leases
+                        written.append((job, {"verdict": "ERROR", "error": f"{type(e).__name__}: {e}"}))
+                settle()
+
+                if time.monotonic() >= next_heartbeat:
+                    held = [job["id"] for job in in_flight.values()] + list(unwritten)
+                    lost = queue.heartbeat(owner, held, lease_seconds)
+                    if lost:
+                        print(f"Lost {len(lost)} lease(s); another worker has those jobs now", flush=True)
+                    next_heartbeat = time.monotonic() + heartbeat_every
+            except KeyboardInterrupt:
+                if draining:
+                    abandoned = True
+                    raise
+                draining = True
+                print(f"Stopping: draining {len(in_flight)} document(s) in flight (Ctrl-C again to quit now)", flush=True)
+    finally:
+        if abandoned:
+            queue.release(owner, [job["id"] for job in in_flight.values()])
+            print(f"Quitting: handed {len(in_flight)} unfinished document(s) back to the queue", flush=True)
+        pool.shutdown(wait=not in_flight, cancel_futures=True)
+        # Flushes the buffered rows, which completes their jobs
+        for job_sinks in sinks.values():
+            job_sinks.close()
+        settle()
+        print("-" * 60)
+        print(f"Worker {owner}: PASS: {counts['PASS']}  |  FAIL: {counts['FAIL']}  |  ERROR: {counts['ERROR']}"
+              f"  |  lost leases: {counts['lost']}")
+
+
+def status(queue: JobQueue):
+    stats = queue.stats()
+    print(f"queued: {stats['queued']}  |  leased: {stats['leased']} ({stats['expired_leases']} expired)  |  "
+          f"done: {stats['done']}  |  failed: {stats['failed']}")
+    if stats["verdicts"]:
+        print("Verdicts: " + "  |  ".join(f"{v}: {n}" for v, n in sorted(stats["verdicts"].items())))
+    for owner, n in sorted(stats["workers"].items()):
+        print(f"  {owner:<40} {n} leased")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Batch extraction over a shared SQLite work queue.")
+    parser.add_argument("--queue", default=JOBQUEUE_PATH, help=f"Queue database (default: {JOBQUEUE_PATH})")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    p = commands.add_parser("enqueue", help="Add a folder of documents to the queue")
+    p.add_argument("--kind", required=True, choices=sorted(KINDS), help="Document type in the input folder")
+    p.add_argument("--input", required=True, help="Folder containing PDFs/DOCXs")
+    p.add_argument("--output", required=True, help="Folder the workers write the results to")
+
+    p = commands.add_parser("work", help="Claim and process documents until stopped")
+    p.add_argument("--workers", type=int, default=4, help="Documents processed concurrently (default: 4)")
+    p.add_argument("--lease", type=float, default=JOBQUEUE_LEASE_SECONDS,
+                   help=f"Lease length in seconds, renewed every third of it (default: {JOBQUEUE_LEASE_SECONDS:.0f})")
+    p.add_argument("--sink", default="json",
+                   help=f"Comma-separated output sinks: {', '.join(SINK_NAMES)} (default: json)")
+    p.add_argument("--no-llm-cache", dest="llm_cache", action="store_false",
+                   help="Ignore cached LLM responses (fresh responses are still cached)")
+    p.add_argument("--exit-when-empty", action="store_true", help="Exit once nothing is left to claim")
+
+    commands.add_parser("status", help="Show queue counts and active workers")
+    commands.add_parser("requeue-failed", help="Give jobs that ran out of attempts another round")
+    args = parser.parse_args()
+
+    queue = JobQueue(args.queue)
+    if args.command == "enqueue":
+        enqueue(queue, args.kind, args.input, args.output)
+    elif args.command == "work":
+        sink_names = tuple(name.strip() for name in args.sink.split(",") if name.strip())
+        if unknown := set(sink_names) - set(SINK_NAMES):
+            parser.error(f"unknown sink(s): {', '.join(sorted(unknown))}")
+        try:
+            work(queue, args.workers, args.lease, sink_names, args.llm_cache, args.exit_when_empty)
+        except KeyboardInterrupt:
+            queue.close()
+            # The abandoned documents keep running in pool threads, which a normal exit would wait for
+            os._exit(130)
+    elif args.command == "status":
+        status(queue)
+    else:
+        print(f"Requeued {queue.requeue_failed()} failed job(s)")
+    queue.close()